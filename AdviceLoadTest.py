@@ -0,0 +1,138 @@
+# ADVICE SERVER LOAD TEST
+#
+# Opens many concurrent clients against AdviceServer, each sending batches of
+# random queries back to back for a fixed time, and reports queries per second and
+# request latency percentiles along with the server's coalescing counters. A
+# server is started in a subprocess unless --connect points at a running one.
+#
+#   python AdviceLoadTest.py --clients 32 --batch 16 --seconds 10
+#   python AdviceLoadTest.py --composition 0.1 --connect --port 8765
+
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+from AdviceServer import AsyncAdviceClient, AdviceClient, HOST, PORT
+
+
+def random_query(rng, composition, decks=6):
+    # A random first decision: a pair a tenth of the time, sometimes against a depleted shoe
+    up = rng.randint(2, 11)
+    if rng.random() < 0.1:
+        pair = rng.randint(2, 11)
+        query = {"total": 12 if pair == 11 else 2 * pair, "soft": pair == 11, "pair": pair, "up": up}
+    elif rng.random() < 0.3:
+        query = {"total": rng.randint(13, 21), "soft": True, "up": up}
+    else:
+        query = {"total": rng.randint(5, 20), "up": up}
+    if rng.random() < composition:
+        seen = rng.randint(0, 3 * decks) # Cards gone beyond the ones in play
+        counts = [4 * decks] * 8 + [16 * decks, 4 * decks]
+        for _ in range(seen):
+            i = rng.randrange(10)
+            if counts[i] > 1:
+                counts[i] -= 1
+        query["counts"] = counts
+    return query
+
+
+async def run_client(address, batch, deadline, composition, seed, latencies):
+    rng = random.Random(seed)
+    client = await AsyncAdviceClient.connect(*address)
+    queries = 0
+    try:
+        while time.perf_counter() < deadline:
+            request = [random_query(rng, composition) for _ in range(batch)]
+            start = time.perf_counter()
+            await client.advise_batch(request)
+            latencies.append(time.perf_counter() - start)
+            queries += batch
+    finally:
+        await client.close()
+    return queries
+
+
+async def load_test(address, clients, batch, seconds, composition, seed):
+    latencies = []
+    start = time.perf_counter()
+    deadline = start + seconds
+    counts = await asyncio.gather(*(run_client(address, batch, deadline, composition, seed + i, latencies)
+                                    for i in range(clients)))
+    return sum(counts), latencies, time.perf_counter() - start
+
+
+def percentile(values, p):
+    return values[min(len(values) - 1, int(p * len(values)))] if values else 0.0
+
+
+def wait_for_server(address, process, timeout=30.0):
+    # The server loads its table before it listens, so retry until it accepts
+    deadline = time.perf_counter() + timeout
+    while True:
+        try:
+            AdviceClient(*address, timeout=1.0).close()
+            return
+        except OSError:
+            if process.poll() is not None or time.perf_counter() > deadline:
+                raise RuntimeError("advice server did not start")
+            time.sleep(0.05)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the advice server")
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--batch", type=int, default=16, help="Queries per request")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--composition", type=float, default=0.0,
+                        help="Fraction of queries with a shoe composition")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--unix", default=None)
+    parser.add_argument("--connect", action="store_true", help="Use a running server instead of starting one")
+    args = parser.parse_args()
+
+    address = (args.host, args.port, args.unix)
+    process = None
+    if not args.connect:
+        if not args.unix:
+            with socket.socket() as probe: # A free port for the server
+                probe.bind((args.host, 0))
+                address = (args.host, probe.getsockname()[1], None)
+        command = [sys.executable, "AdviceServer.py", "--host", address[0], "--port", str(address[1])]
+        if args.unix:
+            command += ["--unix", args.unix]
+        process = subprocess.Popen(command, cwd=os.path.dirname(os.path.abspath(__file__)), stdout=subprocess.DEVNULL)
+    try:
+        if process is not None:
+            wait_for_server(address, process)
+        with AdviceClient(*address) as client:
+            before = client.stats()
+        queries, latencies, elapsed = asyncio.run(
+            load_test(address, args.clients, args.batch, args.seconds, args.composition, args.seed))
+        with AdviceClient(*address) as client:
+            after = client.stats()
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    latencies.sort()
+    requests = len(latencies)
+    answered = after["answered"] - before["answered"]
+    print(f"{args.clients} clients x {args.batch} queries/request for {elapsed:.1f}s")
+    print(f"Queries:   {queries:,} ({queries / elapsed:,.0f}/s)")
+    print(f"Requests:  {requests:,} ({requests / elapsed:,.0f}/s)")
+    print(f"Latency:   p50 {percentile(latencies, 0.5) * 1000:.2f} ms | p99 {percentile(latencies, 0.99) * 1000:.2f} ms"
+          f" | max {latencies[-1] * 1000 if latencies else 0.0:.2f} ms")
+    print(f"Batches:   {after['batches'] - before['batches']:,}, "
+          f"{answered:,} distinct queries answered ({1 - answered / queries if queries else 0.0:.0%} coalesced)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,394 @@
+# STRATEGY ADVICE SERVER
+#
+# Keeps the bot's strategy table, solver and composition analyser hot in one
+# process and answers queries over localhost TCP or a Unix socket, so tools get
+# advice without loading or solving anything themselves. The protocol is one JSON
+# object per line each way. Requests that arrive while a batch is being answered
+# are coalesced into the next batch, where each distinct query is answered once;
+# chart answers are kept as ready-encoded JSON, so a repeat costs a dict lookup.
+#
+#   python AdviceServer.py --port 8765
+#   python AdviceServer.py --unix /tmp/advice.sock --decks 6 --h17
+#
+# Request:  {"id": 1, "queries": [{"total": 16, "up": 10}, {"total": 16, "pair": 8, "up": 10},
+#                                  {"total": 12, "up": 3, "counts": [24, 24, 24, 24, 24, 24, 24, 24, 96, 24]}]}
+# Response: {"id": 1, "results": [{"decision": "surrender", "evs": {"hit": -0.54, ...}}, ...]}
+#
+# A query is the player's total and upcard (2-11), plus optionally soft, pair (the
+# value of a pair that may be split), can_double and can_surrender (default true),
+# and counts: the unseen cards per value 2-11, hole card included, to advise on
+# that exact shoe instead of the chart (exact: true also removes the player's
+# draws from the dealer's shoe, at far greater cost). soft, can_double, can_surrender
+# and exact are JSON booleans. A query that can't be answered gets {"error": "..."}
+# in its place without failing the others. {"stats": true} returns the server's
+# counters.
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+from concurrent.futures import ThreadPoolExecutor
+
+from BasicStrategyBot import BasicStrategyBot
+from Cards import Hand
+from CompositionAnalyser import CompositionAnalyser, NUM_VALUES, MASK
+from Rules import RuleSet, DEFAULT_RULES
+from StrategySolver import SURRENDER_EV
+
+
+HOST = '127.0.0.1'
+PORT = 8765
+MAX_QUERIES = 4096 # Per request
+LINE_LIMIT = 1 << 20 # Longest request line in bytes
+
+
+
+def flag(query, name, default):
+    # A JSON true or false; bool() would read the string "false" as true
+    value = query.get(name, default)
+    if not isinstance(value, bool):
+        raise ValueError(f"{name} must be true or false: {value!r}")
+    return value
+
+
+def parse_query(query):
+    """
+    A query dict -> a hashable key (total, soft, up, pair, can_double, can_surrender,
+    counts, exact). Raises ValueError on anything the service can't answer.
+    """
+    try:
+        total = int(query['total'])
+        up = int(query['up'])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError(f"query needs an integer total and up: {query!r}")
+    soft = flag(query, 'soft', False)
+    if not 2 <= up <= 11:
+        raise ValueError(f"up must be 2-11 (11 for an ace): {up}")
+    if soft and not 12 <= total <= 21:
+        raise ValueError(f"a soft total is 12-21: {total}")
+    if not 4 <= total <= 31:
+        raise ValueError(f"total out of range: {total}")
+    pair = query.get('pair')
+    if pair is not None:
+        try:
+            pair = int(pair)
+        except (TypeError, ValueError):
+            raise ValueError(f"pair must be a card value 2-11: {pair!r}")
+        if not 2 <= pair <= 11:
+            raise ValueError(f"pair must be a card value 2-11: {pair}")
+        if (total, soft) != ((12, True) if pair == 11 else (2 * pair, False)):
+            raise ValueError(f"a pair of {pair}s is not {'soft' if soft else 'hard'} {total}")
+    counts = query.get('counts')
+    if counts is not None:
+        try:
+            counts = tuple(int(count) for count in counts)
+        except (TypeError, ValueError):
+            raise ValueError(f"counts must be {NUM_VALUES} card counts (values 2-11) of 0-{MASK}")
+        if len(counts) != NUM_VALUES or not all(0 <= count <= MASK for count in counts) or not any(counts):
+            raise ValueError(f"counts must be {NUM_VALUES} card counts (values 2-11) of 0-{MASK}")
+    return (total, soft, up, pair, flag(query, 'can_double', True),
+            flag(query, 'can_surrender', True), counts, flag(query, 'exact', False))
+
+
+
+# ---ANSWERING---
+class AdviceService:
+    """
+    Answers parsed queries with the same sources as the game: the bot's table for
+    chart queries, the composition analyser for a given shoe (with splits from the
+    infinite-deck solver, as in the advice box). Not thread-safe; the server calls
+    it from a single worker thread.
+    """
+    def __init__(self, rules=DEFAULT_RULES):
+        self.rules = rules
+        self.bot = BasicStrategyBot(rules)
+        self.analyser = CompositionAnalyser(rules=rules)
+        self.encoded = {} # Chart query key -> encoded answer
+
+    def answer(self, key):
+        # One query as (decision, {action: ev})
+        total, soft, up, pair, can_double, can_surrender, counts, exact = key
+        if self.rules.max_split_hands < 2:
+            pair = None # No splitting at this table: advise on the total
+        if counts is None:
+            return self.bot.analyse_all(Hand(total, soft), Hand(up, up == 11), pair, can_double, can_surrender)
+        if total > 21:
+            return "bust", {}
+        _, evs = self.analyser.analyse_all(counts, total, soft, up, can_double, exact)
+        if pair is not None:
+            evs['split'] = self.bot.get_solver().split_ev(pair, up)
+        if can_surrender and self.rules.late_surrender:
+            evs['surrender'] = SURRENDER_EV
+        return max(evs, key=evs.get), evs
+
+    def encode(self, key):
+        # The answer as a JSON fragment; chart answers never change, so they are kept. A query that fails gets its own error
+        encoded = self.encoded.get(key)
+        if encoded is not None:
+            return encoded
+        try:
+            decision, evs = self.answer(key)
+        except Exception as e:
+            return json.dumps({"error": str(e)})
+        encoded = json.dumps({"decision": decision, "evs": evs})
+        if key[6] is None:
+            self.encoded[key] = encoded
+        return encoded
+
+    def encode_all(self, keys):
+        return [self.encode(key) for key in keys]
+
+
+
+# ---SERVING---
+class AdviceServer:
+    def __init__(self, service):
+        self.service = service
+        self.executor = ThreadPoolExecutor(1) # The service's caches stay single-threaded
+        self.pending = [] # (keys, future) waiting for the next batch
+        self.wakeup = None
+        self.server = None
+        self.stats = {"connections": 0, "requests": 0, "queries": 0, "batches": 0, "answered": 0, "errors": 0,
+                      "cache_hits": 0, "cache_misses": 0} # Only ever updated on the event loop
+
+    async def start(self, host=HOST, port=PORT, unix=None):
+        self.wakeup = asyncio.Event()
+        self.batcher = asyncio.create_task(self._batcher())
+        if unix:
+            if os.path.exists(unix):
+                os.unlink(unix) # A stale socket from a server that didn't shut down cleanly
+            self.server = await asyncio.start_unix_server(self.handle, unix, limit=LINE_LIMIT)
+        else:
+            self.server = await asyncio.start_server(self.handle, host, port, limit=LINE_LIMIT)
+        return self.server
+
+    async def serve_forever(self, host=HOST, port=PORT, unix=None):
+        server = await self.start(host, port, unix)
+        async with server:
+            await server.serve_forever()
+
+    async def submit(self, keys):
+        # Encoded answers for keys, from the next batch
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((keys, future))
+        self.wakeup.set()
+        return await future
+
+    async def _batcher(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self.wakeup.wait()
+            self.wakeup.clear()
+            batch, self.pending = self.pending, []
+            if not batch:
+                continue
+            # Everything that queued up while the last batch ran, each distinct query once
+            unique = dict.fromkeys(key for keys, _ in batch for key in keys)
+            # Kept answers are read on the loop; only the rest take the trip to the worker thread
+            encoded = self.service.encoded
+            answers = {key: encoded[key] for key in unique if key in encoded}
+            missing = [key for key in unique if key not in answers]
+            self.stats["cache_hits"] += len(answers)
+            self.stats["cache_misses"] += len(missing)
+            try:
+                if missing:
+                    answers.update(zip(missing, await loop.run_in_executor(self.executor, self.service.encode_all, missing)))
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.stats["batches"] += 1
+            self.stats["answered"] += len(unique)
+            for keys, future in batch:
+                if not future.done(): # The client may have gone away
+                    future.set_result([answers[key] for key in keys])
+
+    async def handle(self, reader, writer):
+        # Requests on one connection are answered concurrently and may be pipelined; ids match them up
+        self.stats["connections"] += 1
+        tasks = set()
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ValueError, ConnectionError): # Over LINE_LIMIT, or reset
+                    break
+                if not line:
+                    break
+                task = asyncio.create_task(self.respond(line, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            writer.close()
+
+    async def respond(self, line, writer):
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get('id')
+            if request.get('stats'):
+                response = json.dumps({"id": request_id, "stats": self.snapshot()})
+            else:
+                queries = request['queries']
+                if len(queries) > MAX_QUERIES:
+                    raise ValueError(f"at most {MAX_QUERIES} queries per request")
+                # Invalid queries are answered with their error here; only the rest join a batch
+                answers = [None] * len(queries)
+                keys = []
+                for i, query in enumerate(queries):
+                    try:
+                        keys.append(parse_query(query))
+                    except (ValueError, TypeError, AttributeError) as e:
+                        answers[i] = json.dumps({"error": str(e)})
+                        self.stats["errors"] += 1
+                self.stats["requests"] += 1
+                self.stats["queries"] += len(keys)
+                batched = iter(await self.submit(keys)) if keys else iter(())
+                answers = [answer if answer is not None else next(batched) for answer in answers]
+                response = f'{{"id": {json.dumps(request_id)}, "results": [{", ".join(answers)}]}}'
+        except Exception as e: # A bad request or a failed batch still gets an answer
+            self.stats["errors"] += 1
+            response = json.dumps({"id": request_id, "error": str(e)})
+        if not writer.is_closing():
+            writer.write(response.encode() + b"\n")
+            await writer.drain()
+
+    def snapshot(self):
+        stats = dict(self.stats)
+        stats["coalesced"] = 1 - stats["answered"] / stats["queries"] if stats["queries"] else 0.0
+        stats["cached_answers"] = len(self.service.encoded)
+        return stats
+
+
+
+# ---CLIENTS---
+def _request(request_id, queries):
+    return (json.dumps({"id": request_id, "queries": queries}) + "\n").encode()
+
+
+def _results(line, strict=True):
+    # (decision, evs) per query; a query the server couldn't answer raises ValueError, or is None unless strict
+    response = json.loads(line)
+    if 'error' in response:
+        raise ValueError(response['error'])
+    results = []
+    for i, result in enumerate(response['results']):
+        if 'error' in result:
+            if strict:
+                raise ValueError(f"query {i}: {result['error']}")
+            results.append(None)
+        else:
+            results.append((result['decision'], result['evs']))
+    return results
+
+
+class AdviceClient:
+    """
+    Blocking client, one request at a time:
+
+        with AdviceClient() as client:
+            decision, evs = client.advise(16, up=10)
+            answers = client.advise_batch([{"total": 12, "up": 3}, {"total": 18, "soft": True, "up": 9}])
+    """
+    def __init__(self, host=HOST, port=PORT, unix=None, timeout=None):
+        if unix:
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.socket.settimeout(timeout)
+            self.socket.connect(unix)
+        else:
+            self.socket = socket.create_connection((host, port), timeout)
+            self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.file = self.socket.makefile('rwb')
+        self.next_id = 0
+
+    def advise_batch(self, queries, strict=True):
+        # [(decision, {action: ev})] in query order; raises ValueError if the server rejects a query, or gives None for it unless strict
+        self.next_id += 1
+        self.file.write(_request(self.next_id, queries))
+        self.file.flush()
+        line = self.file.readline()
+        if not line:
+            raise ConnectionError("advice server closed the connection")
+        return _results(line, strict)
+
+    def advise(self, total, soft=False, up=10, **options):
+        return self.advise_batch([dict(options, total=total, soft=soft, up=up)])[0]
+
+    def stats(self):
+        self.file.write(b'{"stats": true}\n')
+        self.file.flush()
+        return json.loads(self.file.readline())['stats']
+
+    def close(self):
+        self.file.close()
+        self.socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class AsyncAdviceClient:
+    # The asyncio counterpart of AdviceClient; open one per concurrent caller
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.next_id = 0
+
+    @classmethod
+    async def connect(cls, host=HOST, port=PORT, unix=None):
+        if unix:
+            reader, writer = await asyncio.open_unix_connection(unix, limit=LINE_LIMIT)
+        else:
+            reader, writer = await asyncio.open_connection(host, port, limit=LINE_LIMIT)
+            writer.get_extra_info('socket').setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return cls(reader, writer)
+
+    async def advise_batch(self, queries, strict=True):
+        self.next_id += 1
+        self.writer.write(_request(self.next_id, queries))
+        await self.writer.drain()
+        line = await self.reader.readline()
+        if not line:
+            raise ConnectionError("advice server closed the connection")
+        return _results(line, strict)
+
+    async def advise(self, total, soft=False, up=10, **options):
+        return (await self.advise_batch([dict(options, total=total, soft=soft, up=up)]))[0]
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve basic strategy advice over a local socket")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--unix", default=None, help="Listen on this Unix socket instead of TCP")
+    parser.add_argument("--decks", type=int, default=DEFAULT_RULES.num_decks)
+    parser.add_argument("--h17", action="store_true", help="Dealer hits soft 17")
+    parser.add_argument("--peek", action="store_true", help="Dealer peeks for blackjack")
+    args = parser.parse_args()
+
+    rules = RuleSet(num_decks=args.decks, hit_soft_17=args.h17, dealer_peek=args.peek)
+    server = AdviceServer(AdviceService(rules))
+    print(f"Serving advice for {rules.describe()} on {args.unix or f'{args.host}:{args.port}'}", flush=True)
+    try:
+        asyncio.run(server.serve_forever(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if args.unix and os.path.exists(args.unix):
+            os.unlink(args.unix)
+
+
+if __name__ == "__main__":
+    main()
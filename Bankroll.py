@@ -0,0 +1,285 @@
+# BANKROLL AND RISK OF RUIN
+#
+# Wagering on top of the rules, which settle in units of the original bet: a bet
+# ramp turns the true count into units, the table limits and the bankroll cap the
+# stake, and a Bankroll is paid stake times the units won. simulate_sessions plays
+# independent sessions with the bot through GameState, each until its rounds run
+# out or the bankroll can no longer cover the table minimum, and run_sessions
+# shards them across a process pool the way ParallelRunner does. Every aggregate is
+# a running count, mean and sum of squared deviations (Welford), merged pairwise,
+# so memory stays the same however many sessions are played.
+#
+#   python Bankroll.py 10000 --rounds 1000 --bankroll 1000 --unit 10
+#   python Bankroll.py 10000 --decks 6 --payout 1.5 --count hi-lo --spread 8
+
+import argparse
+import math
+import os
+import random
+import time
+from multiprocessing import Pool
+from typing import NamedTuple
+
+from CardCounter import CardCounter, bet_units
+from GameState import GameState, Deck, SETTLE, bot_policy, play_round
+from ParallelRunner import make_tasks
+from Rules import RuleSet, DEFAULT_RULES
+
+
+CHUNK_SESSIONS = 100 # Sessions per task
+ROUNDS_PER_HOUR = 100 # Heads up against the dealer
+
+
+
+# ---WAGERING---
+class BetRamp(NamedTuple):
+    unit: float = 10.0 # Money per betting unit
+    spread: int = 1 # Most units bet, at high true counts (CardCounter.bet_units); 1 bets flat
+    table_min: float = 10.0
+    table_max: float = 1000.0
+
+    def stake(self, true_count=0.0, balance=math.inf):
+        # Money on the next round, or 0 once the balance can't cover the table minimum
+        if balance < self.table_min:
+            return 0.0
+        units = bet_units(true_count, self.spread) if self.spread > 1 else 1
+        return min(max(self.unit * units, self.table_min), self.table_max, balance)
+
+
+class Bankroll:
+    """
+    One player's money. Doubles and splits are settled in full even when the
+    balance could not have covered them, so a balance can end a little below zero.
+    """
+    def __init__(self, balance, ramp=BetRamp()):
+        self.start = self.balance = balance
+        self.ramp = ramp
+        self.rebuys = 0
+
+    @property
+    def ruined(self):
+        return self.balance < self.ramp.table_min
+
+    def wager(self, true_count=0.0):
+        return self.ramp.stake(true_count, self.balance)
+
+    def settle(self, stake, net_units):
+        # net_units as GameState.seat_nets gives them; returns the money won
+        won = stake * net_units
+        self.balance += won
+        return won
+
+    def rebuy(self):
+        self.balance = self.start
+        self.rebuys += 1
+
+
+
+# ---RESULTS---
+class RunningStats:
+    # Count, mean and sum of squared deviations, updated one value at a time (Welford)
+    __slots__ = ('count', 'mean', 'm2')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, x):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+
+    def merge(self, other):
+        # Chan et al.'s pairwise update: the same result as adding other's values one by one
+        if not other.count:
+            return self
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        return self
+
+    @property
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std(self):
+        return math.sqrt(max(self.variance, 0.0))
+
+
+class SessionResult:
+    def __init__(self, rounds_per_hour=ROUNDS_PER_HOUR):
+        self.sessions = 0
+        self.ruined = 0
+        self.round_nets = RunningStats() # Money won per round, every session's rounds pooled
+        self.session_nets = RunningStats() # Final balance less the starting bankroll
+        self.ruin_rounds = RunningStats() # Rounds played by the sessions that went broke
+        self.wagered = 0.0
+        self.rounds_per_hour = rounds_per_hour
+        self.elapsed = 0.0
+
+    def merge(self, other):
+        self.sessions += other.sessions
+        self.ruined += other.ruined
+        self.round_nets.merge(other.round_nets)
+        self.session_nets.merge(other.session_nets)
+        self.ruin_rounds.merge(other.ruin_rounds)
+        self.wagered += other.wagered
+        self.elapsed += other.elapsed
+        return self
+
+    @property
+    def risk_of_ruin(self):
+        return self.ruined / self.sessions if self.sessions else 0.0
+
+    @property
+    def ruin_stderr(self):
+        p = self.risk_of_ruin
+        return math.sqrt(p * (1 - p) / self.sessions) if self.sessions else 0.0
+
+    @property
+    def hourly_ev(self):
+        return self.round_nets.mean * self.rounds_per_hour
+
+    @property
+    def hourly_std(self):
+        # Rounds are close enough to independent for the spread to grow with the square root
+        return self.round_nets.std * math.sqrt(self.rounds_per_hour)
+
+    def __str__(self):
+        if not self.sessions:
+            return "No sessions played"
+        rounds = self.round_nets.count
+        return (f"Sessions: {self.sessions:,} ({rounds:,} rounds)\n"
+                f"Risk of ruin: {self.risk_of_ruin:.2%} ± {1.96 * self.ruin_stderr:.2%} (95% CI)"
+                + (f", after {self.ruin_rounds.mean:,.0f} rounds on average\n" if self.ruined else "\n")
+                + f"Hourly EV: {self.hourly_ev:+,.2f} | Hourly std: {self.hourly_std:,.2f} "
+                f"({self.rounds_per_hour} rounds/hour)\n"
+                f"Per round: {self.round_nets.mean:+.4f} ± {self.round_nets.std:.4f} | "
+                f"Edge: {self.round_nets.mean * rounds / self.wagered if self.wagered else 0.0:+.4%} of {self.wagered:,.0f} wagered\n"
+                f"Session result: {self.session_nets.mean:+,.2f} ± {self.session_nets.std:,.2f}")
+
+
+
+# ---SIMULATION---
+_policies = {} # Rule set -> bot policy, built once per process
+
+def _policy(rules):
+    policy = _policies.get(rules)
+    if policy is None:
+        from BasicStrategyBot import BasicStrategyBot
+        policy = _policies[rules] = bot_policy(BasicStrategyBot(rules))
+    return policy
+
+
+def simulate_sessions(n_sessions, session_rounds=1000, bankroll=1000.0, ramp=BetRamp(), rules=DEFAULT_RULES,
+                      seed=None, penetration=0.75, count_system='hi-lo', rounds_per_hour=ROUNDS_PER_HOUR):
+    """
+    Plays n_sessions independent sessions of up to session_rounds rounds, each from
+    a fresh bankroll and shoe, and returns a SessionResult. A session ends early
+    once the bankroll can't cover the table minimum, which counts as ruin. The
+    count (count_system) only matters with a bet ramp whose spread is above 1.
+    """
+    rng = random.Random(seed)
+    policy = _policy(rules)
+    result = SessionResult(rounds_per_hour)
+    round_nets = result.round_nets
+    wagered = 0.0
+    start = time.perf_counter()
+
+    for _ in range(n_sessions):
+        counter = CardCounter(count_system, rules.num_decks) if ramp.spread > 1 else None
+        state = GameState(rules, Deck(rules.num_decks, penetration, counter=counter, seed=rng.getrandbits(63)))
+        roll = Bankroll(bankroll, ramp)
+        played = 0
+        while played < session_rounds:
+            if state.phase == SETTLE:
+                state.new_round() # Before betting, so the bet sees the count after any reshuffle
+            stake = roll.wager(counter.true_count() if counter is not None else 0.0)
+            if not stake:
+                break
+            round_nets.add(roll.settle(stake, play_round(state, policy)))
+            wagered += stake
+            played += 1
+        result.sessions += 1
+        result.session_nets.add(roll.balance - bankroll)
+        if roll.ruined:
+            result.ruined += 1
+            result.ruin_rounds.add(played)
+
+    result.wagered = wagered
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+def _run_chunk(args):
+    sessions, seed, options = args
+    return simulate_sessions(sessions, seed=seed, **options)
+
+
+def run_sessions(n_sessions, seed=None, workers=None, chunk_sessions=CHUNK_SESSIONS, progress=None, **options):
+    """
+    simulate_sessions across a process pool; options are passed through. Every
+    chunk of sessions has its own seed derived from (seed, shard, chunk) and the
+    partial results are merged in task order, so a seed and worker count always
+    give the same result. progress, if given, sees the running merged result.
+    """
+    workers = workers or os.cpu_count() or 1
+    if seed is None:
+        seed = random.randrange(2**32)
+    tasks = [(sessions, task_seed, options) for sessions, task_seed in make_tasks(n_sessions, workers, seed, chunk_sessions)]
+
+    merged = SessionResult(options.get('rounds_per_hour', ROUNDS_PER_HOUR))
+    start = time.perf_counter()
+    with Pool(workers) as pool:
+        for partial in pool.imap(_run_chunk, tasks):
+            merged.merge(partial)
+            if progress:
+                progress(merged)
+
+    merged.elapsed = time.perf_counter() - start # Wall time rather than summed worker time
+    merged.seed = seed
+    return merged
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bankroll and risk of ruin simulation")
+    parser.add_argument("sessions", type=int, nargs="?", default=10_000)
+    parser.add_argument("--rounds", type=int, default=1000, help="Most rounds per session")
+    parser.add_argument("--bankroll", type=float, default=1000.0)
+    parser.add_argument("--unit", type=float, default=10.0, help="Money per betting unit")
+    parser.add_argument("--spread", type=int, default=1, help="Top of the count-based bet ramp, in units")
+    parser.add_argument("--min", type=float, default=None, help="Table minimum, one unit by default")
+    parser.add_argument("--max", type=float, default=None, help="Table maximum, 100 units by default")
+    parser.add_argument("--count", default='hi-lo', help="Tag system the bet ramp follows")
+    parser.add_argument("--decks", type=int, default=DEFAULT_RULES.num_decks)
+    parser.add_argument("--penetration", type=float, default=0.75)
+    parser.add_argument("--h17", action="store_true", help="Dealer hits soft 17")
+    parser.add_argument("--peek", action="store_true", help="Dealer peeks for blackjack")
+    parser.add_argument("--payout", type=float, default=DEFAULT_RULES.blackjack_payout, help="Blackjack payout, e.g. 1.5")
+    parser.add_argument("--per-hour", type=int, default=ROUNDS_PER_HOUR, help="Rounds played per hour")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    rules = RuleSet(num_decks=args.decks, hit_soft_17=args.h17, dealer_peek=args.peek, blackjack_payout=args.payout)
+    ramp = BetRamp(args.unit, args.spread, args.min if args.min is not None else args.unit,
+                   args.max if args.max is not None else 100 * args.unit)
+    print(f"{rules.describe()}; bankroll {args.bankroll:,.0f}, bets {ramp.table_min:,.0f}-{ramp.table_max:,.0f}"
+          f"{f', ramp to {args.spread} units on {args.count}' if args.spread > 1 else ', flat'}")
+    result = run_sessions(args.sessions, args.seed, args.workers,
+                          progress=lambda r: print(f"{r.sessions:,} sessions, risk of ruin {r.risk_of_ruin:.2%}", end="\r"),
+                          session_rounds=args.rounds, bankroll=args.bankroll, ramp=ramp, rules=rules,
+                          penetration=args.penetration, count_system=args.count, rounds_per_hour=args.per_hour)
+    print()
+    print(result)
+    print(f"Seed: {result.seed} | {result.sessions / result.elapsed:,.1f} sessions/s")
+
+
+if __name__ == "__main__":
+    main()
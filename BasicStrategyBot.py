@@ -1,8 +1,14 @@
 # BASIC STRATEGY BOT
 
 import json
-import pandas as pd
-from collections import defaultdict
+import os
+
+from Cards import Hand # Shared with the game: running totals, scored in constant time
+from CardCounter import DeviationTable
+from DealerProbabilities import dealer_table
+from Rules import DEFAULT_RULES
+from StrategySolver import StrategySolver
+from StrategyTable import StrategyTable, load_json_chart, write_table, JSON_CHART, BINARY_CHART, HARD, SOFT, PAIR
 
 
 
@@ -11,132 +17,124 @@ RANKS = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A']
 VALUES = {'2': 2, '3': 3, '4': 4, '5': 5, '6': 6, '7': 7, '8': 8, '9': 9, '10': 10, 'J': 10, 'Q': 10, 'K': 10, 'A': 11}
 
 
-class Hand:
-    def __init__(self, total=0, soft=False):
-        self.total = total
-        self.soft = soft
-
-    def __str__(self):
-        softness = "Soft" if self.soft else "Hard"
-        return f"{softness} {self.total}"
+def rules_table_path(rules):
+    # The default rules keep the original chart files; other rule sets are cached by digest
+    if rules.strategy_key() == DEFAULT_RULES.strategy_key():
+        return BINARY_CHART
+    return rules.table_path()
 
-    def copy(self):
-        # Create a new Hand object with the same attributes
-        new_hand = Hand(self.total, self.soft)
-        return new_hand
 
-    def add_card(self, rank):
-        self.total += VALUES[rank]
-        if rank == 'A':
-            self.soft = True
-        if self.total > 21 and self.soft:
-            self.total -= 10
-            self.soft = False
+def build_rules_table(rules, force=False):
+    # Solve and write the binary table for a rule set, unless it is already cached
+    path = rules_table_path(rules)
+    if force or not os.path.exists(path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        write_table(path, [StrategySolver(rules=rules).chart()])
+    return path
 
 
 
 class BasicStrategyBot:
-    def __init__(self):
+    def __init__(self, rules=DEFAULT_RULES):
+        self.set_rules(rules)
+
+    def set_rules(self, rules):
+        """
+        Switches to another rule set. Its table is mapped from the on-disk cache,
+        which is only solved and written the first time a rule set is used.
+        """
         # Memorization for expensive calculations
-        self.dealer_probabilities = {}
+        self.rules = rules
         self.stand_evs = {}
         self.hit_evs = {}
+        # [hits, misses]; 'table' counts queries answered by a mapped table rather than the solver
+        self.cache_stats = {'table': [0, 0], 'stand_evs': [0, 0], 'hit_evs': [0, 0]}
+        self.solver = None
+        if getattr(self, 'table', None) is not None:
+            self.table.close()
+        if getattr(self, 'deviation_table', None) is not None:
+            self.deviation_table.close()
+        self.table = None
+        self.deviation_table = None
+        self._decision_chart = None
+
+        # Prefer the memory-mapped binary table: no parsing and integer-indexed lookups
+        try:
+            self.table = StrategyTable(rules_table_path(rules))
+            print("SUCCESSFULLY LOADED TABLE")
+            return
+        except (OSError, ValueError):
+            pass
+
+        if rules_table_path(rules) != BINARY_CHART:
+            self.table = StrategyTable(build_rules_table(rules, force=True)) # Missing or stale cache
+            print("SUCCESSFULLY BUILT TABLE")
+            return
+
         try:
-            with open('basic_strategy_chart.json', 'r') as f:
-                json_data = json.load(f)
-                self.decision_chart = {}
-                for keystring, decisionArray in json_data.items():
-                    key = eval(keystring)
-                    self.decision_chart[key] = decisionArray
-                for (player_hand, dealer_hand), decisionArray in  self.decision_chart.items():
-                    self.hit_evs[player_hand, dealer_hand] = decisionArray[1]
-                    self.stand_evs[player_hand, dealer_hand] = decisionArray[2]
-                print("SUCCESSFULLY LOADED JSON")
-        except:
+            self._decision_chart = load_json_chart(JSON_CHART)
+            for (player_hand, dealer_hand), decisionArray in  self._decision_chart.items():
+                self.hit_evs[player_hand, dealer_hand] = decisionArray[1]
+                self.stand_evs[player_hand, dealer_hand] = decisionArray[2]
+            print("SUCCESSFULLY LOADED JSON")
+        except (OSError, ValueError, SyntaxError):
             self.stand_evs = {}
             self.hit_evs = {}
-            self.decisionchart = {}
+            self._decision_chart = {}
+
+    @property
+    def decision_chart(self):
+        # Only built from the binary table when something asks for the string-keyed chart
+        if self._decision_chart is None:
+            self._decision_chart = self.table.chart() if self.table is not None else {}
+        return self._decision_chart
+
+    @decision_chart.setter
+    def decision_chart(self, chart):
+        self._decision_chart = chart
+
+    def get_solver(self):
+        # The full table solves in a few milliseconds, so build it on first use
+        if self.solver is None:
+            self.solver = StrategySolver(rules=self.rules)
+        return self.solver
+
+    def get_deviation_table(self, system='hi-lo'):
+        # Count-indexed charts, mapped from the on-disk cache on first use
+        if self.deviation_table is None or self.deviation_table.system != system:
+            self.deviation_table = DeviationTable(system, self.rules)
+        return self.deviation_table
 
     def dealer_outcomes(self, dealer_hand):
-        # Check cache
-        if str(dealer_hand) in self.dealer_probabilities:
-            return self.dealer_probabilities[str(dealer_hand)]
-
-        # Calculate if not in cache
-        def calc_outcomes(self, dealer_hand):
-            # Dealer busts
-            if dealer_hand.total > 21:
-                return{"bust": 1.0}
-            
-            # Dealer stands
-            if dealer_hand.total >= 17:
-                return {dealer_hand.total: 1.0}
-            
-            # Dealer must hit
-            outcomes = defaultdict(float) # Initialize outcomes dictionary
-            for rank in RANKS:
-                # Create a new hand
-                new_hand = dealer_hand.copy()
-                probability = 1/13 # Basic strategy assumes no change in probability (No card-counting)
-                new_hand.add_card(rank)
-                suboutcomes = calc_outcomes(self, new_hand)
-                for outcome, prob in suboutcomes.items():
-                    outcomes[outcome] += probability*prob
-
-            return dict(outcomes)
-    
-        result = calc_outcomes(self, dealer_hand)
-        self.dealer_probabilities[dealer_hand] = result
-        return result
-    
+        # Read straight from the shared dealer table, solved once per rule set
+        return dealer_table(self.rules).outcomes(dealer_hand.total, dealer_hand.soft)
+
 
 
     def stand_expected_value(self, player_hand, dealer_hand):
         # Check cache
         if (str(player_hand), str(dealer_hand)) in self.stand_evs:
+            self.cache_stats['stand_evs'][0] += 1
             return self.stand_evs[(str(player_hand), str(dealer_hand))]
-        
+
         # If not in cache
         else:
-            player_value = player_hand.total
-            dealer_probs = self.dealer_outcomes(dealer_hand)
-
-            ev = 0.0
-
-            for dealer_outcome, probability in dealer_probs.items():
-                if dealer_outcome == "bust":
-                    ev += probability * 1.0 # Player wins
-                else:
-                    if player_value > dealer_outcome: 
-                        ev += probability * 1.0 # Player wins
-                    elif dealer_outcome > player_value:
-                        ev += probability * -1.0 # Dealer wins
-                    else:
-                        ev += probability * 0.0 # Push
+            self.cache_stats['stand_evs'][1] += 1
+            ev = self.get_solver().stand_ev(player_hand.total, player_hand.soft, dealer_hand.total)
             self.stand_evs[(str(player_hand), str(dealer_hand))] = ev
             return ev
-    
+
 
     def hit_expected_value(self, player_hand, dealer_hand):
         # Check cache
         if (str(player_hand), str(dealer_hand)) in self.hit_evs:
+            self.cache_stats['hit_evs'][0] += 1
             return self.hit_evs[(str(player_hand), str(dealer_hand))]
-        
+
         # Not in cache
         else:
-            ev = 0.0
-            for rank in RANKS: # For every possible hit option
-                new_hand = player_hand.copy()
-                new_hand.add_card(rank)
-                probability = 1/13
-
-                if new_hand.total > 21: # Player busts
-                    ev += probability * -1.0
-
-                else:
-                    decision, hit_ev, stand_ev = self.analyse(new_hand, dealer_hand)
-                    optimal_ev = max(hit_ev, stand_ev)
-                    ev += probability * optimal_ev
+            self.cache_stats['hit_evs'][1] += 1
+            ev = self.get_solver().hit_ev(player_hand.total, player_hand.soft, dealer_hand.total)
             self.hit_evs[(str(player_hand), str(dealer_hand))] = ev
             return ev
 
@@ -145,7 +143,14 @@ class BasicStrategyBot:
     def analyse(self, player_hand, dealer_hand):
         if player_hand.total > 21:
             return "bust", -1.0, -1.0
-        
+
+        if self.table is not None:
+            result = self.table.lookup(player_hand.total, player_hand.soft, dealer_hand.total)
+            if result[0] is not None: # Hands outside the chart fall through to the solver
+                self.cache_stats['table'][0] += 1
+                return result
+        self.cache_stats['table'][1] += 1
+
         stand_ev = self.stand_expected_value(player_hand, dealer_hand)
         hit_ev = self.hit_expected_value(player_hand, dealer_hand)
         
@@ -155,27 +160,54 @@ class BasicStrategyBot:
             return 'stand', hit_ev, stand_ev
         
 
+    def analyse_all(self, player_hand, dealer_hand, pair_value=None, can_double=True, can_surrender=True,
+                    true_count=None, system='hi-lo'):
+        """
+        Best action among hit, stand, double, split (when pair_value is given) and
+        surrender, as (decision, {action: ev}). Two-card pairs and first decisions
+        are read straight from the binary table when one is loaded. With a true
+        count the EVs come from that count's deviation chart instead.
+        """
+        if player_hand.total > 21:
+            return "bust", {}
+
+        if true_count is not None:
+            if pair_value is not None:
+                _, evs = self.get_deviation_table(system).lookup_all(pair_value, PAIR, dealer_hand.total, true_count)
+            else:
+                _, evs = self.get_deviation_table(system).lookup_all(
+                    player_hand.total, SOFT if player_hand.soft else HARD, dealer_hand.total, true_count)
+            if not can_double:
+                evs.pop('double', None)
+            if not can_surrender:
+                evs.pop('surrender', None)
+            self.cache_stats['table'][0] += 1
+            return max(evs, key=evs.get), evs
+
+        if self.table is not None and can_double and can_surrender:
+            if pair_value is not None:
+                decision, evs = self.table.lookup_all(pair_value, PAIR, dealer_hand.total)
+            else:
+                decision, evs = self.table.lookup_all(player_hand.total, SOFT if player_hand.soft else HARD, dealer_hand.total)
+            if decision is not None:
+                self.cache_stats['table'][0] += 1
+                return decision, evs
+
+        self.cache_stats['table'][1] += 1
+        return self.get_solver().analyse_all(player_hand.total, player_hand.soft, dealer_hand.total,
+                                             pair_value, can_double, can_surrender)
+
+    def insurance_expected_value(self):
+        # Per unit of insurance; never worth taking off the top of an infinite deck
+        return self.get_solver().insurance_ev()
+
     def create_json(self):
 
         print("CREATING JSON")
 
-        decision_chart = {}
-
-        # HARD HAND CHART
-        for player_total in range(4, 22): # For every possible soft hand from 4 to 21
-            player_hand = Hand(player_total, soft=False)
-            for dealer_rank in RANKS:
-                dealer_hand = Hand(VALUES[dealer_rank], soft = True if dealer_rank == 'A' else False) # Dealer hand can be soft or hard
-                decision, hit_ev, stand_ev = self.analyse(player_hand, dealer_hand)
-                decision_chart[(str(player_hand), str(dealer_hand))] = [decision, hit_ev, stand_ev]
-        
-        # SOFT HAND CHART
-        for player_total in range(12, 22): # For every possible soft hand from A,A to A,10
-            player_hand = Hand(player_total, soft=True)
-            for dealer_rank in RANKS:
-                dealer_hand = Hand(VALUES[dealer_rank], soft = True if dealer_rank == 'A' else False) # Dealer hand can be soft or hard
-                decision, hit_ev, stand_ev = self.analyse(player_hand, dealer_hand)
-                decision_chart[(str(player_hand), str(dealer_hand))] = [decision, hit_ev, stand_ev]
+        # Every hard (4-21), soft (12-21) and pair hand against every upcard, solved bottom-up in one pass
+        decision_chart = self.get_solver().chart()
+        self.decision_chart = decision_chart
 
         json_chart = {}
         for key, value in decision_chart.items():
@@ -183,8 +215,17 @@ class BasicStrategyBot:
             json_chart[str(key)] = value
         
 
-        with open('basic_strategy_chart.json', 'w') as f:
-            json.dump(json_chart, f, indent=4)
+        # The JSON chart is only kept for the default rules
+        path = rules_table_path(self.rules)
+        if path == BINARY_CHART:
+            with open(JSON_CHART, 'w') as f:
+                json.dump(json_chart, f, indent=4)
+
+        # The binary table may be mapped, so release it before rewriting the file
+        if self.table is not None:
+            self.table.close()
+        write_table(path, [decision_chart])
+        self.table = StrategyTable(path)
 
 
 
@@ -196,16 +237,19 @@ class BasicStrategyBot:
             print("Decision chart is empty. Please run create_json() first.")
             return
 
-        # Separate hard and soft hands
+        # Separate hard, soft and pair hands
         hard_hands = {}
         soft_hands = {}
+        pair_hands = {}
 
         for (player_hand_str, dealer_hand_str), decisionArray in self.decision_chart.items():
             player_hand_type = player_hand_str.split()[0]
             if player_hand_type == 'Hard':
                 hard_hands[(player_hand_str, dealer_hand_str)] = decisionArray
-            else:
+            elif player_hand_type == 'Soft':
                 soft_hands[(player_hand_str, dealer_hand_str)] = decisionArray
+            else:
+                pair_hands[(player_hand_str, dealer_hand_str)] = decisionArray
 
         # Display Hard Hands
         print("\n--- Hard Hands Chart ---")
@@ -219,10 +263,19 @@ class BasicStrategyBot:
         print(df_soft)
         print("\n" + "-"*30)
 
+        # Display Pairs
+        if pair_hands:
+            print("\n--- Pairs Chart ---")
+            df_pairs = self._create_dataframe(pair_hands)
+            print(df_pairs)
+            print("\n" + "-"*30)
+
     def _create_dataframe(self, data):
         """
         Helper method to create a pandas DataFrame from the data.
         """
+        import pandas as pd # Only needed to display charts, so the bot imports without it
+
         player_totals = sorted(list(set(key[0] for key in data.keys())),
                                     key=lambda x: -1*(int(x.split()[-1])))
         
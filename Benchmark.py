@@ -0,0 +1,362 @@
+# BENCHMARKS
+#
+# Times the hot paths: chart generation, strategy queries (cold and warm), headless
+# play, deck construction and the pygame draw loop on a dummy video driver. Each
+# benchmark is timed over several repeats and the results are written as JSON,
+# tagged with the current commit, so numbers can be compared across commits.
+#
+#   python Benchmark.py --out bench.json
+#   python Benchmark.py --only analyse --repeat 10
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+BENCHMARKS = {}
+
+
+def benchmark(name, unit="call"):
+    # Registers fn() -> (calls, elapsed) under name; unit is what one call measures
+    def register(fn):
+        BENCHMARKS[name] = (fn, unit)
+        return fn
+    return register
+
+
+def time_calls(fn, number):
+    start = time.perf_counter()
+    for _ in range(number):
+        fn()
+    return number, time.perf_counter() - start
+
+
+
+# ---SOLVER AND BOT---
+@benchmark("chart_generation")
+def bench_chart_generation():
+    from StrategySolver import StrategySolver
+    return time_calls(lambda: StrategySolver().chart(), 5)
+
+
+@benchmark("create_json")
+def bench_create_json():
+    # Writes the chart files into a scratch directory so the committed ones are untouched
+    from BasicStrategyBot import BasicStrategyBot
+    bot = BasicStrategyBot()
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as scratch:
+        os.chdir(scratch)
+        try:
+            calls, elapsed = time_calls(bot.create_json, 3)
+            bot.table.close()
+        finally:
+            os.chdir(cwd)
+    return calls, elapsed
+
+
+def _queries():
+    # Every hard and soft total against every upcard
+    return [(total, soft, up) for total in range(4, 22) for soft in (False, True)
+            for up in range(2, 12) if not soft or total >= 12]
+
+
+@benchmark("analyse_table", unit="query")
+def bench_analyse_table():
+    # Warm path: lookups in the mapped binary table
+    from BasicStrategyBot import BasicStrategyBot, Hand
+    bot = BasicStrategyBot()
+    hands = [(Hand(total, soft), Hand(up, up == 11)) for total, soft, up in _queries()]
+    calls, elapsed = time_calls(lambda: [bot.analyse(player, dealer) for player, dealer in hands], 20)
+    return calls * len(hands), elapsed
+
+
+@benchmark("analyse_solver_cold")
+def bench_analyse_solver_cold():
+    # No table: the first query solves the whole chart
+    from BasicStrategyBot import BasicStrategyBot, Hand
+    bot = BasicStrategyBot()
+    bot.table = None
+    def query():
+        bot.solver = None
+        bot.hit_evs.clear()
+        bot.stand_evs.clear()
+        bot.analyse(Hand(16, False), Hand(10, False))
+    return time_calls(query, 10)
+
+
+@benchmark("analyse_composition_cold")
+def bench_analyse_composition_cold():
+    # The game's advice path with an empty cache, as after a new card
+    from CompositionAnalyser import CompositionAnalyser
+    analyser = CompositionAnalyser()
+    counts = [4] * 8 + [16, 4]
+    def query():
+        analyser.clear()
+        analyser.analyse(counts, 12, False, 3, exact=False)
+    return time_calls(query, 10)
+
+
+@benchmark("analyse_composition_warm")
+def bench_analyse_composition_warm():
+    from CompositionAnalyser import CompositionAnalyser
+    analyser = CompositionAnalyser()
+    counts = [4] * 8 + [16, 4]
+    analyser.analyse(counts, 12, False, 3, exact=False)
+    return time_calls(lambda: analyser.analyse(counts, 12, False, 3, exact=False), 10_000)
+
+
+def _dealt_values(cards=150):
+    # Card values in the order a seeded six-deck shoe deals them
+    from Shoe import Shoe, CODE_VALUE
+    shoe = Shoe(6, seed=1)
+    return [CODE_VALUE[shoe.deal()] for _ in range(cards)]
+
+
+@benchmark("dealer_shoe_remove", unit="card")
+def bench_dealer_shoe_remove():
+    # Keeping every upcard's exact dealer distribution in step with a shoe as it is dealt
+    from DealerProbabilities import ShoeDealerTable
+    table = ShoeDealerTable([24] * 8 + [96, 24])
+    values = _dealt_values()
+    start = time.perf_counter()
+    for value in values:
+        table.remove(value)
+        table.stand
+    return len(values), time.perf_counter() - start
+
+
+@benchmark("dealer_shoe_resolve", unit="card")
+def bench_dealer_shoe_resolve():
+    # The same, re-solving the dealer tree for every upcard after each card
+    from CompositionAnalyser import CompositionAnalyser, pack
+    analyser = CompositionAnalyser()
+    counts = [24] * 8 + [96, 24]
+    values = _dealt_values()
+    start = time.perf_counter()
+    for value in values:
+        counts[value - 2] -= 1
+        packed = pack(counts)
+        analyser.clear()
+        for up in range(2, 12):
+            analyser.dealer_outcomes(packed, up, up == 11)
+    return len(values), time.perf_counter() - start
+
+
+
+@benchmark("startup_bot", unit="process")
+def bench_startup_bot():
+    # A fresh interpreter importing the bot and loading its table, as each worker process does
+    command = [sys.executable, "-c", "from BasicStrategyBot import BasicStrategyBot; BasicStrategyBot()"]
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    return time_calls(lambda: subprocess.run(command, cwd=cwd, capture_output=True, check=True), 5)
+
+
+
+# ---HEADLESS PLAY---
+@benchmark("simulate_rounds", unit="round")
+def bench_simulate():
+    from Simulator import simulate, chart_strategy
+    table = chart_strategy()
+    rounds = 200_000
+    start = time.perf_counter()
+    simulate(rounds, table, seed=1)
+    return rounds, time.perf_counter() - start
+
+
+@benchmark("state_machine_rounds", unit="round")
+def bench_state_machine():
+    # Full rounds through GameState.step with the bot choosing, as in turbo mode
+    from BasicStrategyBot import BasicStrategyBot
+    from GameState import GameState, bot_policy, play_round
+    state = GameState()
+    policy = bot_policy(BasicStrategyBot())
+    return time_calls(lambda: play_round(state, policy), 20_000)
+
+
+@benchmark("state_machine_table7", unit="hand")
+def bench_state_machine_table():
+    # A full table: seven bot seats against one dealer hand per round
+    from BasicStrategyBot import BasicStrategyBot
+    from GameState import GameState, Deck, bot_policy, play_round
+    state = GameState(deck=Deck(6, 0.75), num_seats=7)
+    policy = bot_policy(BasicStrategyBot())
+    calls, elapsed = time_calls(lambda: play_round(state, policy), 5_000)
+    return calls * 7, elapsed
+
+
+@benchmark("bankroll_sessions", unit="round")
+def bench_bankroll_sessions():
+    # Bankroll sessions on one core: bets, full rounds through GameState and the streaming aggregates
+    from Bankroll import simulate_sessions
+    result = simulate_sessions(20, session_rounds=500, bankroll=10_000, seed=1)
+    return result.round_nets.count, result.elapsed
+
+
+@benchmark("history_write", unit="round")
+def bench_history_write():
+    # Packing and bulk-writing one settled seven-seat round, over and over
+    from GameState import GameState, Deck
+    from HandHistory import HandHistoryWriter
+    state = GameState(deck=Deck(6, 0.75, seed=1), num_seats=7)
+    with tempfile.TemporaryDirectory() as scratch:
+        with HandHistoryWriter(os.path.join(scratch, "history.bin")) as writer:
+            state.history = writer
+            writer.begin(state)
+            while state.phase != "settle":
+                state.step('stand')
+            return time_calls(lambda: (writer.begin(state), writer.end(state)), 100_000)
+
+
+@benchmark("history_read", unit="round")
+def bench_history_read():
+    # Streaming a mapped log, as summary() does
+    from GameState import GameState, Deck, bot_advisor, play_round
+    from BasicStrategyBot import BasicStrategyBot
+    from HandHistory import HandHistory, HandHistoryWriter
+    advise = bot_advisor(BasicStrategyBot())
+    state = GameState(deck=Deck(6, 0.75, seed=1), num_seats=7)
+    with tempfile.TemporaryDirectory() as scratch:
+        path = os.path.join(scratch, "history.bin")
+        with HandHistoryWriter(path, advisor=advise) as writer:
+            state.history = writer
+            writer.begin(state)
+            for _ in range(20_000):
+                play_round(state, lambda state: advise(state)[0])
+        history = HandHistory(path)
+        start = time.perf_counter()
+        history.summary()
+        elapsed = time.perf_counter() - start
+        history.close()
+    return len(history), elapsed
+
+
+@benchmark("shoe_construction")
+def bench_shoe():
+    from Shoe import Shoe
+    return time_calls(lambda: Shoe(6), 1_000)
+
+
+@benchmark("hand_score")
+def bench_hand_score():
+    # Headless cards and hands, no sprites behind them
+    from Cards import Card, Hand
+    hand = Hand()
+    for code in (48, 0, 20, 49, 33): # A, 2, 7, A, 10: soft totals and aces demoted
+        hand.add_card(Card(code))
+    return time_calls(hand.score, 100_000)
+
+
+
+# ---RENDERER---
+def _game_module():
+    # Offscreen: the dummy driver needs no display
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    import Blackjack
+    return Blackjack
+
+
+def _dealt_game(game_module):
+    game_module.BlackjackGame.show_reshuffle_screen = lambda self: None # No 1.5s wait
+    game = game_module.BlackjackGame()
+    for _ in range(4): # The initial deal
+        game.step()
+    return game
+
+
+@benchmark("deck_construction")
+def bench_deck():
+    game_module = _game_module()
+    return time_calls(lambda: game_module.Deck(), 1_000)
+
+
+@benchmark("draw_full", unit="frame")
+def bench_draw_full():
+    # Every frame redrawn from scratch
+    game_module = _game_module()
+    game = _dealt_game(game_module)
+    def frame():
+        game.dirty.mark_all()
+        game.draw()
+    return time_calls(frame, 300)
+
+
+@benchmark("draw_idle", unit="frame")
+def bench_draw_idle():
+    # Nothing changed: the dirty-rect check alone
+    game_module = _game_module()
+    game = _dealt_game(game_module)
+    for _ in range(200): # Let the deal animations settle
+        game.draw()
+    return time_calls(game.draw, 3_000)
+
+
+
+# ---RUNNER---
+def run_benchmark(name, repeat):
+    fn, unit = BENCHMARKS[name]
+    per_call = []
+    for _ in range(repeat):
+        calls, elapsed = fn()
+        per_call.append(elapsed / calls)
+    best = min(per_call)
+    return {
+        "unit": unit,
+        "repeat": repeat,
+        "mean": statistics.mean(per_call),
+        "min": best,
+        "stdev": statistics.stdev(per_call) if repeat > 1 else 0.0,
+        "per_second": 1 / best if best else None,
+    }
+
+
+def commit_id():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the blackjack hot paths")
+    parser.add_argument("--out", default=None, help="Write the results as JSON to this file")
+    parser.add_argument("--only", default=None, help="Only run benchmarks whose name contains this")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    report = {
+        "commit": commit_id(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": {},
+        "skipped": {},
+    }
+    for name in BENCHMARKS:
+        if args.only and args.only not in name:
+            continue
+        try:
+            result = run_benchmark(name, args.repeat)
+        except (ImportError, OSError) as e: # e.g. pygame or its fonts not available here
+            report["skipped"][name] = str(e)
+            print(f"{name:<26} skipped: {e}")
+            continue
+        report["results"][name] = result
+        print(f"{name:<26} {result['min'] * 1e6:>12.2f} µs/{result['unit']}  ({result['per_second']:,.0f}/s)")
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=4)
+        print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,46 +1,245 @@
-import random
+import argparse
+import os
+import sys
+import time
 import pygame
 import math
+from collections import OrderedDict
+from Bankroll import Bankroll, BetRamp
 from BasicStrategyBot import BasicStrategyBot, Hand as BotHand # Import the bot and its Hand class
+from CardCounter import CardCounter
+from CompositionAnalyser import CompositionAnalyser
+from Instrumentation import metrics
+from Cards import Card as CoreCard, Hand as CoreHand
+from GameState import GameState, Deck as CoreDeck, DEAL, PLAYER, DEALER, SETTLE, bot_advisor, bot_policy, play_round
+from HandHistory import HandHistory, HandHistoryWriter, RecordedShoe
+from Shoe import CODE_RANK, CODE_SUIT
+from Rules import RuleSet
+from StrategySolver import SURRENDER_EV
 
 
 # ---INITIALIZING PYGAME---
-pygame.init()
+# Nothing is initialised on import: the window and fonts are created by init_display
 WIDTH, HEIGHT = 800, 600
 CARD_WIDTH, CARD_HEIGHT = 60, 87
-screen = pygame.display.set_mode((WIDTH, HEIGHT), pygame.RESIZABLE)
-pygame.display.set_caption("Blackjack")
-big_font = pygame.font.Font("C:\\Windows\\Fonts\\seguisym.ttf", 36)
-small_font = pygame.font.Font("C:\\Windows\\Fonts\\seguisym.ttf", 24)
+FONT_PATH = "C:\\Windows\\Fonts\\seguisym.ttf" # Segoe UI Symbol, for the suit glyphs
+screen = None
+big_font = small_font = tiny_font = None
+
+
+def load_font(size):
+    try:
+        return pygame.font.Font(FONT_PATH, size)
+    except (FileNotFoundError, OSError):
+        return pygame.font.SysFont("segoeuisymbol,dejavusans", size) # Not on Windows: a system font with the suits
+
+
+def init_display():
+    # Opens the window and loads the fonts, once; called by the menu and the game before they draw
+    global screen, big_font, small_font, tiny_font
+    if screen is not None:
+        return
+    pygame.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT), pygame.RESIZABLE)
+    pygame.display.set_caption("Blackjack")
+    big_font = load_font(36)
+    small_font = load_font(24)
+    tiny_font = load_font(16)
 
 
 
 # ---GLOBAL VARIABLES---
-suits = ['hearts', 'diamonds', 'clubs', 'spades']
-ranks = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A']
-values = {'2': 2, '3': 3, '4': 4, '5': 5, '6': 6, '7': 7, '8': 8, 
-          '9': 9, '10': 10, 'J': 10, 'Q': 10, 'K': 10, 'A': 11}
-suit_symbols = {
-    'hearts': '♥',
-    'diamonds': '♦',
-    'clubs': '♣',
-    'spades': '♠'
-}
+name_map = {'J': 'jack', 'Q': 'queen', 'K': 'king', 'A': 'ace'}
+CODE_FILENAME = [f"{name_map.get(rank, rank)}_of_{suit}.png" for rank, suit in zip(CODE_RANK, CODE_SUIT)] # Image per card code
+
+
+# ---SHOE AND RULES---
+NUM_DECKS = 1
+PENETRATION = 0.5 # Reshuffle once half the shoe is dealt (fewer than 26 cards in a single deck)
+CONTINUOUS_SHUFFLE = False
+RULES = RuleSet(num_decks=NUM_DECKS) # e.g. RuleSet(num_decks=6, hit_soft_17=True, blackjack_payout=1.5, dealer_peek=True)
+SEATS = ['human'] # One entry per seat, left to right, up to seven: 'human' or 'bot', e.g. ['bot', 'human', 'bot']
+
+
+# ---COUNTING---
+COUNT_SYSTEM = 'hi-lo' # Any CardCounter tag system
+COUNT_ADVICE = False # Advise from the true count's deviation chart instead of the exact shoe composition
+
+
+# ---CONTROLS---
+CONTROL_KEYS = {'hit': 'H', 'stand': 'S', 'double': 'D', 'split': 'P', 'surrender': 'R', 'insurance': 'I', 'decline': 'N'}
+KEY_ACTIONS = {getattr(pygame, f"K_{key.lower()}"): action for action, key in CONTROL_KEYS.items()}
+
+# ---ROUND PACING---
+DEAL_DELAY = 0.5 # Seconds between the initial cards
+DEALER_DELAY = 1.0 # Seconds between the dealer's draws
+BOT_DELAY = 0.75 # Seconds between a bot seat's actions
+TURBO_FRAME_BUDGET = 0.015 # Seconds of bot play per frame in turbo mode (T), leaving time for the event loop
+
+
+# ---HAND HISTORY---
+HISTORY_FILE = None # e.g. "history.bin" to record every round played, turbo rounds included
+
+
+# ---WAGERING---
+BANKROLL = 1000 # Every seat's starting money, bought again if it can't cover the table minimum
+BET_RAMP = BetRamp(unit=10, spread=1, table_min=10, table_max=500) # e.g. spread=8 to raise bets with the true count
+
+
+# ---METRICS---
+METRICS = False # Instrument from the start; F3 toggles the overlay (and instrumentation) in game
+METRICS_FILE = "metrics.jsonl"
+METRICS_INTERVAL = 10.0 # Seconds between dumps while instrumented
 
 
 # ---ANIMATION---
 ANIMATION_SPEED = 0.8
 FLIP_SPEED = 0.2
 
+# ---TEXTURE CACHE---
+class TextureCache:
+    """
+    Process-wide card images. Each PNG is decoded once and every card shares the
+    scaled surfaces; scaled copies are only rebuilt when the card size changes.
+    """
+    def __init__(self, directory="Playing-Cards"):
+        self.directory = directory
+        self.originals = {} # Filename -> decoded surface
+        self.scaled = {} # Filename -> surface scaled to self.size
+        self.size = None
+
+    def get(self, filename, size=None):
+        size = size or (CARD_WIDTH, CARD_HEIGHT)
+        if size != self.size:
+            self.scaled.clear()
+            self.size = size
+
+        surface = self.scaled.get(filename)
+        if surface is None:
+            original = self.originals.get(filename)
+            if original is None:
+                original = pygame.image.load(f"{self.directory}/{filename}").convert_alpha()
+                self.originals[filename] = original
+            surface = pygame.transform.scale(original, size)
+            self.scaled[filename] = surface
+        return surface
+
+    def preload(self):
+        # Decode the whole directory up front, e.g. before the first deal
+        for filename in os.listdir(self.directory):
+            if filename.endswith(".png"):
+                self.get(filename)
+
+textures = TextureCache()
+
+
+class FlipFrameCache:
+    """
+    Pre-scaled frames of the flip animation, keyed on (image, quantised flip progress,
+    card size) and shared by every card, so a flipping card costs a blit instead of
+    a resample. Bounded by LRU eviction and emptied when the card size changes.
+    """
+    def __init__(self, steps=32, max_entries=256):
+        self.steps = steps
+        self.max_entries = max_entries
+        self.frames = OrderedDict()
+        self.size = None
+
+    def get(self, filename, progress, size=None):
+        size = size or (CARD_WIDTH, CARD_HEIGHT)
+        if size != self.size:
+            self.clear()
+            self.size = size
+
+        step = round(progress * self.steps)
+        key = (filename, step, size)
+        frame = self.frames.get(key)
+        if frame is None:
+            scale_x = abs(math.cos(step / self.steps * math.pi))
+            frame = pygame.transform.scale(textures.get(filename, size), (int(size[0] * scale_x), size[1]))
+            self.frames[key] = frame
+            if len(self.frames) > self.max_entries:
+                self.frames.popitem(last=False)
+        else:
+            self.frames.move_to_end(key)
+        return frame
+
+    def clear(self):
+        self.frames.clear()
+
+flip_frames = FlipFrameCache()
+
+
+# ---TEXT CACHE---
+class TextCache:
+    """
+    Rendered text surfaces keyed on (text, font, color). Labels repeat every frame,
+    so font.render only runs when a string is new; bounded by LRU eviction.
+    """
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.surfaces = OrderedDict()
+
+    def render(self, text, font, color):
+        key = (text, font, color)
+        surface = self.surfaces.get(key)
+        if surface is None:
+            surface = font.render(text, True, color)
+            self.surfaces[key] = surface
+            if len(self.surfaces) > self.max_entries:
+                self.surfaces.popitem(last=False)
+        else:
+            self.surfaces.move_to_end(key)
+        return surface
+
+text_cache = TextCache()
+
+
+
+# ---DIRTY RECTANGLES---
+class DirtyTracker:
+    """
+    Collects the screen regions that changed since the last frame, so a frame can
+    be skipped entirely when nothing changed and otherwise only the changed
+    regions are redrawn and pushed with pygame.display.update(rects).
+    """
+    def __init__(self):
+        self.rects = []
+        self.full = True # First frame draws everything
+
+    def mark(self, rect):
+        if rect is not None:
+            self.rects.append(pygame.Rect(rect).inflate(4, 4)) # Allow for sub-pixel card positions
+
+    def mark_all(self):
+        self.full = True
+
+    def is_dirty(self):
+        return self.full or bool(self.rects)
+
+    def clip_rect(self):
+        # Region to redraw, None meaning the whole screen
+        if self.full:
+            return None
+        return self.rects[0].unionall(self.rects[1:])
+
+    def flush(self):
+        if self.full:
+            pygame.display.flip()
+        else:
+            pygame.display.update(self.rects)
+        self.rects = []
+        self.full = False
+
+
+
 # ---CLASSES FOR BLACKJACK---
-class Card:
-    def __init__(self, suit, rank, visible=True):
-        self.suit = suit
-        self.rank = rank
-        self.value = values[rank]
-        self.visible = visible
-        self.image = self.load_image()
-        self.back_image = pygame.transform.scale(pygame.image.load("Playing-Cards/back.png"), (CARD_WIDTH, CARD_HEIGHT))
+class Card(CoreCard):
+    # The game state lives in Cards.Card; this adds the sprite's position and animation
+    __slots__ = ('x', 'y', 'target_x', 'target_y', 'animating', 'flip_progress', 'flipping')
+
+    def __init__(self, code, visible=True):
+        super().__init__(code, visible)
 
         # Animation properties
         self.x = 0
@@ -51,19 +250,24 @@ class Card:
         self.flip_progress = 0.0
         self.flipping = False
 
-    def __str__(self):
-        return f"{self.rank}{suit_symbols[self.suit]}"
+    @property
+    def filename(self):
+        return CODE_FILENAME[self.code]
+
+    # Images are looked up in the shared cache so they follow the current card size
+    @property
+    def image(self):
+        return self.load_image()
+
+    @property
+    def back_image(self):
+        return textures.get("back.png")
     
     def load_image(self):
-        name_map = {'J': 'jack', 'Q': 'queen', 'K': 'king', 'A': 'ace'}
-        rank_str = name_map.get(self.rank, self.rank)
-        filename = f"{rank_str}_of_{self.suit}.png"
-        path = f"Playing-Cards/{filename}"
         try:
-            image = pygame.image.load(path)
-            return pygame.transform.scale(image, (CARD_WIDTH, CARD_HEIGHT))
-        except pygame.error:
-            print(f"Error loading image: {path}")
+            return textures.get(self.filename)
+        except (pygame.error, FileNotFoundError):
+            print(f"Error loading image: Playing-Cards/{self.filename}")
             return None
         
     def set_position(self, x, y):
@@ -106,14 +310,9 @@ class Card:
     def draw(self, surface, x, y):
         # If flipping
         if self.flipping:
-            # Scale the card image based on flip progress
-            scale_x = abs(math.cos(self.flip_progress * math.pi)) 
-            if self.flip_progress < 0.5:
-                # Back side
-                scaled_image = pygame.transform.scale(self.back_image, (int(CARD_WIDTH * scale_x), CARD_HEIGHT))
-            else:
-                # Front side
-                scaled_image = pygame.transform.scale(self.image, (int(CARD_WIDTH * scale_x), CARD_HEIGHT))
+            # Pre-scaled frame for the flip progress, back side first then front
+            filename = "back.png" if self.flip_progress < 0.5 else self.filename
+            scaled_image = flip_frames.get(filename, self.flip_progress)
             
             # Centre the card image
             offset_x = (CARD_WIDTH - scaled_image.get_width()) // 2
@@ -125,42 +324,43 @@ class Card:
 
 
 
-class Deck:
-    def __init__(self):
-        self.cards = [Card(suit, rank) for suit in suits for rank in ranks]
-        random.shuffle(self.cards)
+class Deck(CoreDeck):
+    # Deals the game's sprite cards, starting from the deck's position on the table
+    card_class = Card
+
+    def __init__(self, num_decks=NUM_DECKS, penetration=PENETRATION, continuous=CONTINUOUS_SHUFFLE, counter=None):
+        super().__init__(num_decks, penetration, continuous, counter)
         self.x = 50
         self.y = 50
-    
 
     def deal(self, visible=True):
-        card = self.cards.pop()
-        card.visible = visible
+        card = super().deal(visible)
         card.set_position(self.x, self.y) # Starts at deck position
         return card
-    
-    def reset(self):
-        self.__init__()
 
     def draw(self, surface):
         # Draw the deck at its position
-        if len(self.cards) > 0:
+        if len(self.shoe) > 0:
             # Draw the stacked deck
-            for i in range(min(3, len(self.cards))):
+            for i in range(min(3, len(self.shoe))):
                 offset = i*2
-                surface.blit(self.cards[0].back_image, (self.x + offset, self.y + offset))
-            
+                surface.blit(textures.get("back.png"), (self.x + offset, self.y + offset))
+
             # Draw the deck count
-            draw_text(f"{len(self.cards)}", self.x + CARD_WIDTH + 25, self.y + 50, font=small_font, color=(255, 255, 255))
+            draw_text(f"{len(self.shoe)}", self.x + CARD_WIDTH + 25, self.y + 50, font=small_font, color=(255, 255, 255))
+
+class Hand(CoreHand):
+    # Running totals, scoring and bets come from Cards.Hand; this adds the layout
+    __slots__ = ('x', 'y', 'card_spacing')
 
-class Hand:
     def __init__(self):
-        self.cards = []
+        super().__init__()
         self.x = 0
         self.y = 0
+        self.card_spacing = 80
     
     def add_card(self, card):
-        self.cards.append(card)
+        super().add_card(card)
         self.update_positions()
 
     def set_position(self, x, y):
@@ -169,7 +369,7 @@ class Hand:
         self.update_positions()
     
     def update_positions(self):
-        card_spacing = 80
+        card_spacing = self.card_spacing
         start_x = self.x - (len(self.cards) - 1) * card_spacing // 2
 
         # Update the position of each card in the hand
@@ -179,26 +379,6 @@ class Hand:
                 card.set_position(card.x, card.y) # Animate from deck
             card.animate_to(target_x, self.y)
 
-    def score(self):
-        total = sum(card.value for card in self.cards)
-        # Adjust for Aces
-        softaces = sum(1 for card in self.cards if card.rank == 'A')
-        while total > 21 and softaces:
-            total -= 10
-            softaces -= 1
-        return total
-    
-    def soft(self):
-        total = sum(card.value for card in self.cards)
-        softaces = sum(1 for card in self.cards if card.rank == 'A')
-        while total > 21 and softaces:
-            total -= 10
-            softaces -= 1
-        soft = True if softaces else False
-        return soft
-    
-
-    
     def update(self):
         # Update each card's position animation
         for card in self.cards:
@@ -211,23 +391,55 @@ class Hand:
 
 
 
-class BlackjackGame:
-    def __init__(self):
-        self.deck = Deck()
-        self.player_hand = Hand()
-        self.dealer_hand = Hand()
-        self.player_turn = True
-        self.game_over = False
-        self.waiting_to_continue = False
+class BlackjackGame(GameState):
+    # The pygame front-end: steps the round on a clock so each card animates, and draws it
+    hand_class = Hand
+
+    def __init__(self, rules=RULES, penetration=PENETRATION, continuous=CONTINUOUS_SHUFFLE, seats=SEATS):
+        init_display()
+        textures.preload() # Decode every card image once, before the first deal
+        self.counter = CardCounter(COUNT_SYSTEM, rules.num_decks)
+        # Read by new_round, which the base class runs first
+        self.bankrolls = [Bankroll(BANKROLL, BET_RAMP) for _ in seats]
+        self.stakes = [0.0] * len(seats)
+        self.replay = None # Recorded round being replayed, with the live table's state to go back to
+        super().__init__(rules, Deck(rules.num_decks, penetration, continuous, self.counter), len(seats))
+        self.seat_kinds = list(seats)
+        self.human_seat = seats.index('human') if 'human' in seats else 0 # Whose result is shown
+        self.next_step_at = time.perf_counter() + DEAL_DELAY
         self.WIDTH, self.HEIGHT = screen.get_size()
-        self.dealer_started = False
-        self.basic_strategy_bot = BasicStrategyBot()
+        self.basic_strategy_bot = BasicStrategyBot(rules)
+        self.bot_advice = bot_advisor(self.basic_strategy_bot)
+        self.bot_play = bot_policy(self.basic_strategy_bot) # Bot seats and turbo mode
+        self.composition_analyser = CompositionAnalyser(rules=rules)
+        self.dirty = DirtyTracker()
+        self.card_states = {} # id(card) -> (rect, visible, flip progress) when last drawn
+        self.region_states = {} # Region name -> (value, rect) when last drawn
+        self.static_layer = None # Background and fixed labels, rebuilt on resize
+        self.advice_panel = None
+        self.advice_panel_key = None
+        self.advice = None # Last get_bot_advice result, until the game state changes
+        self.advice_version = None
+        self.show_metrics = False
+        self.metrics_lines = () # Overlay text, refreshed a few times a second
+        self.metrics_updated = 0.0
+        self.turbo = False
+        self.turbo_stats = [0, 0.0, 0.0] # Hands (seat rounds), net units, start time
+        self.turbo_updated = 0.0
+        self.replay_step = 0
+        self.replay_source = None
+        self.replay_index = 0
+        self.live_table = None
+        if HISTORY_FILE:
+            self.history = HandHistoryWriter(HISTORY_FILE, advisor=self.history_advice)
+            self.history.begin(self) # The round dealt on construction
+        self.register_metrics()
         self.setup_positions()
-        self.reset_round()
+        self.dirty.mark_all()
 
     def get_bot_hand(self, hand):
-            total, soft = hand.score(), hand.soft()
-            return BotHand(total, soft)
+        # Game hands are bot hands too; the bot only reads the total and softness
+        return hand
 
     def setup_positions(self):
         self.WIDTH, self.HEIGHT = screen.get_size()
@@ -237,110 +449,326 @@ class BlackjackGame:
         dealer_y = 100
         self.dealer_hand.set_position(dealer_x, dealer_y)
 
-        # Player hand position
-        player_x = self.WIDTH // 2
+        # Player hand positions: seats spread across the table, split hands within their seat
         player_y = self.HEIGHT - 150
-        self.player_hand.set_position(player_x, player_y)
+        single = self.num_seats == 1 and len(self.seats[0]) == 1
+        for seat, hands in enumerate(self.seats):
+            for i, hand in enumerate(hands):
+                hand.card_spacing = 80 if single else 30 if self.num_seats <= 3 else 16
+                hand.set_position(self.hand_x(seat, i), player_y)
 
         # Deck position
         self.deck.x = 50
         self.deck.y = 50
+
+    # ---METRICS---
+    def register_metrics(self):
+        # Hit rates of the caches advice is served from, read from their own counters when the metrics are sampled:
+        # the bot's mapped tables (chart or count deviations) and the composition analyser's LRU
+        bot = self.basic_strategy_bot
+        metrics.register_cache("table", lambda: tuple(bot.cache_stats['table']))
+        analyser = self.composition_analyser
+        metrics.register_cache("composition", lambda: (analyser.hits, analyser.misses))
+        if METRICS:
+            metrics.enable()
+
+    def toggle_metrics(self):
+        self.show_metrics = not self.show_metrics
+        if self.show_metrics:
+            metrics.enable()
+        elif not METRICS:
+            metrics.disable()
+        self.metrics_updated = 0.0
+
+    def metrics_rect(self):
+        return pygame.Rect(10, self.HEIGHT // 2 - 110, 420, 22 + 18 * max(len(self.metrics_lines), 1))
+
+    def update_metrics_lines(self):
+        now = time.perf_counter()
+        if now - self.metrics_updated < 0.25:
+            return
+        self.metrics_updated = now
+        lines = metrics.summary_lines()
+        dealt = metrics.timers.get("Deck.deal")
+        if dealt:
+            lines.append(f"Cards dealt/s: {dealt[0] / max(now - metrics.started, 1e-9):.2f}")
+        self.metrics_lines = tuple(lines)
+
+    def draw_metrics_overlay(self):
+        rect = self.metrics_rect()
+        overlay = pygame.Surface(rect.size, pygame.SRCALPHA)
+        overlay.fill((0, 0, 0, 170))
+        for i, line in enumerate(self.metrics_lines):
+            img = text_cache.render(line, tiny_font, (255, 255, 255))
+            overlay.blit(img, (10, 10 + 18 * i))
+        screen.blit(overlay, rect)
+
+    def seat_x(self, seat):
+        return self.WIDTH * (seat + 1) // (self.num_seats + 1)
+
+    def hand_x(self, seat, i=0):
+        # A lone seat has the whole table for its split hands, otherwise each seat has its own slot
+        slot_width = self.WIDTH if self.num_seats == 1 else self.WIDTH / (self.num_seats + 1)
+        return int(self.seat_x(seat) + slot_width * ((i + 1) / (len(self.seats[seat]) + 1) - 0.5))
+
+    def human_turn(self):
+        return self.phase == PLAYER and self.seat_kinds[self.active_seat] == 'human'
+
+    def human_actions(self):
+        # The actions offered on screen; bot seats act on their own
+        return self.available_actions() if self.human_turn() else []
     
     # Reset the table for a new round
     def reset_round(self):
-        # Reset the game state for a new round
-        # If the deck has less than 26 cards, reshuffle
-        if len(self.deck.cards) < 26:
-            self.deck.reset()
+        # Reshuffle once the cut card is reached (every round for a continuous shuffler)
+        if self.new_round():
+            metrics.count("reshuffles")
             self.show_reshuffle_screen()
-        
-        self.player_hand.cards.clear()
-        self.dealer_hand.cards.clear()
-        
-        self.player_turn = True
-        self.game_over = False
-        self.waiting_to_continue = False
-        self.dealer_started = False
         self.setup_positions()
-
+        self.dirty.mark_all()
         # Start the round by dealing cards
-        self.deal_initial_cards()
-
-    def deal_initial_cards(self):
-        # Deal new cards with animation delay
-        pygame.time.set_timer(pygame.USEREVENT+1, 500)  # Player Card 1
-        pygame.time.set_timer(pygame.USEREVENT+2, 1000)  # Dealer Card 1
-        pygame.time.set_timer(pygame.USEREVENT+3, 1500)  # Player Card 2
-        pygame.time.set_timer(pygame.USEREVENT+4, 2000)  # Dealer Card 2
-
-    def handle_deal_event(self, event):
-        if event.type == pygame.USEREVENT+1:  # Player Card 1
-            card = self.deck.deal(visible=True)
-            self.player_hand.add_card(card)
-            pygame.time.set_timer(pygame.USEREVENT + 1, 0)  # Cancel timer
-
-        elif event.type == pygame.USEREVENT+2:  # Dealer Card 1
-            card = self.deck.deal(visible=True)
-            self.dealer_hand.add_card(card)
-            pygame.time.set_timer(pygame.USEREVENT + 2, 0)
-    
-        elif event.type == pygame.USEREVENT+3:  # Player Card 2
-            card = self.deck.deal(visible=True)
-            self.player_hand.add_card(card)
-            pygame.time.set_timer(pygame.USEREVENT + 3, 0)
-
-        elif event.type == pygame.USEREVENT+4:  # Dealer Card 2 (hidden)
-            card = self.deck.deal(visible=False)
-            self.dealer_hand.add_card(card)
-            pygame.time.set_timer(pygame.USEREVENT + 4, 0)
-
-
-    # Dealer's play logic
-    def dealer_play(self):
-        # Flip the dealer's second card
-        if len(self.dealer_hand.cards) > 1:
-            print("Dealer flipping")
-            self.dealer_hand.cards[1].flip()
-        
-        print("Queuing dealer hit")
-        # Deal additional cards as needed
-        pygame.time.set_timer(pygame.USEREVENT + 5, 1000)  # Start dealer hitting
-    
-    def dealer_hit(self):
-        print("Dealer hitting")
-        if self.dealer_hand.score() < 17:
-            card = self.deck.deal(visible=True)
-            self.dealer_hand.add_card(card)
-            pygame.time.set_timer(pygame.USEREVENT + 5, 1000)  # Continue hitting
+        self.next_step_at = time.perf_counter() + DEAL_DELAY
+
+    # ---WAGERING---
+    def new_round(self):
+        reshuffled = super().new_round()
+        self.place_bets()
+        return reshuffled
+
+    def place_bets(self):
+        # Each seat's stake from its bankroll and the count, before the first card; replayed rounds bet nothing
+        if self.replay is not None:
+            self.stakes = [0.0] * self.num_seats
+            return
+        true_count = self.counter.true_count()
+        for bankroll in self.bankrolls:
+            if bankroll.ruined:
+                bankroll.rebuy()
+        self.stakes = [bankroll.wager(true_count) for bankroll in self.bankrolls]
+
+    def settle(self):
+        super().settle()
+        if self.replay is None:
+            for bankroll, stake, net in zip(self.bankrolls, self.stakes, self.seat_nets()):
+                bankroll.settle(stake, net)
+
+    def bankroll_text(self):
+        bankroll = self.bankrolls[self.human_seat]
+        stake = self.stakes[self.human_seat]
+        return (f"Bankroll: {bankroll.balance:,.0f}" + (f" | Bet: {stake:,.0f}" if stake else "")
+                + (f" | Rebuys: {bankroll.rebuys}" if bankroll.rebuys else ""))
+
+    def advance(self, now):
+        # Steps the deal, bot seats and the dealer's turn on the clock, leaving time for each card's animation
+        if now < self.next_step_at:
+            return
+        if self.phase in (DEAL, DEALER):
+            self.step()
+        elif self.phase == PLAYER and not self.human_turn():
+            self.step(self.replay_action() if self.replay is not None else self.bot_play(self))
         else:
-            self.game_over = True
-            self.waiting_to_continue = True
-            pygame.time.set_timer(pygame.USEREVENT + 5, 0)  # Stop hitting
+            return
+        self.next_step_at = now + {DEAL: DEAL_DELAY, PLAYER: BOT_DELAY}.get(self.phase, DEALER_DELAY)
 
 
-    def display_bot_advice(self):
+    # ---TURBO MODE---
+    def toggle_turbo(self):
+        if self.replay is not None:
+            return # A replay only has its own round's cards
+        self.turbo = not self.turbo
+        if self.turbo:
+            self.turbo_stats = [0, 0.0, time.perf_counter()]
+            self.turbo_updated = 0.0
+        else:
+            # Back to the table as the last round left it
+            self.setup_positions()
+            self.dirty.mark_all()
+
+    def play_turbo(self):
+        # Whole rounds with the bot in every seat until the frame's budget is spent, none of them drawn
+        stats = self.turbo_stats
+        deadline = time.perf_counter() + TURBO_FRAME_BUDGET
+        while time.perf_counter() < deadline:
+            stats[1] += play_round(self, self.bot_play)
+            stats[0] += self.num_seats
+
+    def draw_turbo(self):
+        # A status screen refreshed a few times a second in place of the table
+        now = time.perf_counter()
+        if now - self.turbo_updated < 0.25:
+            return
+        self.turbo_updated = now
+        hands, net, started = self.turbo_stats
+        lines = (f"Turbo: {hands:,} hands",
+                 f"Net: {net:+g} units ({net / max(hands, 1):+.2%} per hand)",
+                 self.bankroll_text(),
+                 f"{hands / max(now - started, 1e-9):,.0f} hands/s - T to stop")
+        screen.fill((0, 100, 0))
+        self.WIDTH, self.HEIGHT = screen.get_size()
+        for i, line in enumerate(lines):
+            draw_text(line, self.WIDTH // 2, self.HEIGHT // 2 - 40 + 40 * i, font=small_font)
+        pygame.display.flip()
+
+
+    # ---HISTORY AND REPLAY---
+    def history_advice(self, state):
+        # Advice stored with each recorded action: what the panel shows, or the table bot's in turbo mode
+        return self.bot_advice(state) if self.turbo else self.get_bot_advice()
+
+    def start_replay(self, history, index=0):
         """
-        Calculates and displays the bot's recommended move and EVs in a box
-        in the top-right corner.
+        Deals recorded round index of a HandHistory again: its own cards in their
+        order and its actions with the advice they were given. Nothing is shuffled
+        or decided, and the live shoe and seats come back with stop_replay.
         """
-        # We can't provide a recommendation if the player's hand isn't fully dealt
+        record = history[index]
+        if record.truncated:
+            raise ValueError(f"Round {index} was too long to record in full and can't be replayed")
+        if self.replay is None:
+            self.live_table = (self.deck.shoe, self.deck.counter, self.num_seats, self.seat_kinds, self.human_seat,
+                               self.history)
+            self.history = None # Replays aren't recorded again
+            self.deck.counter = None # Nor counted: the live count carries on with the live shoe
+        self.replay, self.replay_step = record, 0
+        self.replay_source, self.replay_index = history, index
+        self.deck.shoe = RecordedShoe(record.cards)
+        self.num_seats = record.num_seats
+        self.seat_kinds = ['replay'] * record.num_seats
+        self.human_seat = 0
+        self.static_layer = None # Seat labels
+        self.reset_round()
+
+    def stop_replay(self):
+        self.deck.shoe, self.deck.counter, self.num_seats, self.seat_kinds, self.human_seat, self.history = self.live_table
+        self.replay = self.replay_source = self.live_table = None
+        self.static_layer = None
+        self.reset_round()
+
+    def replay_action(self):
+        if self.replay_step >= len(self.replay.actions):
+            return 'stand' # Not reached for a complete record
+        _, action = self.replay.actions[self.replay_step]
+        self.replay_step += 1
+        return action
+
+    def replay_advice(self):
+        # The advice recorded with the next action, if it had any
+        if self.replay_step < len(self.replay.advice):
+            return self.replay.advice[self.replay_step]
+        return None
+
+    def next_round(self):
+        # Enter after a round: the next recorded round while replaying, otherwise a new deal
+        if self.replay is None:
+            self.reset_round()
+        elif self.replay_index + 1 < len(self.replay_source):
+            self.start_replay(self.replay_source, self.replay_index + 1)
+        else:
+            self.stop_replay()
+
+    def close(self):
+        # Writes out any history still buffered
+        history = self.live_table[-1] if self.live_table is not None else self.history
+        if history is not None:
+            history.close()
+
+    def get_bot_advice(self):
+        """
+        Returns the bot's (decision, optimal_ev) for the active hand, or None while
+        the player's hand isn't fully dealt. Cached until a card is dealt or turned
+        over, a hand finishes or the round changes, so a frame only reads the field.
+        """
+        if self.advice_version != self.version:
+            self.advice = self.compute_bot_advice()
+            self.advice_version = self.version
+        return self.advice
+
+    def compute_bot_advice(self):
         if len(self.player_hand.cards) < 2 or len(self.dealer_hand.cards) < 1:
-            return
+            return None
+        if self.replay is not None:
+            return self.replay_advice()
+        if self.insuring:
+            return self.insurance_advice()
 
         # Convert game hands to bot hands
         player_bot_hand = self.get_bot_hand(self.player_hand)
         dealer_up_card = self.dealer_hand.cards[0]
         dealer_bot_hand = BotHand(dealer_up_card.value, dealer_up_card.rank == 'A')
 
-        # Get the bot's decision
-        decision, hit_ev, stand_ev = self.basic_strategy_bot.analyse(player_bot_hand, dealer_bot_hand)
-        optimal_ev = max(hit_ev, stand_ev)
+        if player_bot_hand.total > 21:
+            return "bust", -1.0
+        actions = self.available_actions() or ['hit', 'stand']
+
+        if COUNT_ADVICE:
+            # One table read for the current true count, no solving
+            pair_value = self.player_hand.cards[0].value if 'split' in actions else None
+            _, evs = self.basic_strategy_bot.analyse_all(
+                player_bot_hand, dealer_bot_hand, pair_value, true_count=self.counter.true_count(), system=COUNT_SYSTEM)
+        else:
+            # Get the bot's decision for the cards the player cannot see.
+            # The fast (non-exact) mode keeps a cold query within a frame; repeat queries are cache hits.
+            unseen = self.unseen_counts()
+            _, evs = self.composition_analyser.analyse_all(
+                unseen, player_bot_hand.total, player_bot_hand.soft, dealer_bot_hand.total,
+                can_double='double' in actions, exact=False)
+
+            # Splits come from the infinite-deck solver, a composition-exact split is far too slow for a frame
+            if 'split' in actions:
+                evs['split'] = self.basic_strategy_bot.get_solver().split_ev(self.player_hand.cards[0].value, dealer_bot_hand.total)
+            if 'surrender' in actions:
+                evs['surrender'] = SURRENDER_EV
+        evs = {action: ev for action, ev in evs.items() if action in actions} # Only what the player can take right now
+        decision = max(evs, key=evs.get)
+        return decision, evs[decision]
+
+    def unseen_counts(self):
+        # The cards the player cannot see: the shoe plus the dealer's hole card
+        unseen = self.deck.shoe.counts()
+        for card in self.dealer_hand.cards:
+            if not card.visible:
+                unseen[card.value - 2] += 1
+        return unseen
+
+    def insurance_advice(self):
+        # Insurance pays 2:1 on a ten in the hole: worth it only when more than a third of the unseen cards are tens
+        if COUNT_ADVICE:
+            ev = self.basic_strategy_bot.get_deviation_table(COUNT_SYSTEM).insurance_ev(self.counter.true_count())
+        else:
+            unseen = self.unseen_counts()
+            ev = 3 * unseen[8] / sum(unseen) - 1
+        return ('insurance', ev) if ev > 0 else ('decline', 0.0)
 
-        # Set box properties
-        box_width, box_height = 250, 150
-        box_x = self.WIDTH - box_width - 20
-        box_y = 20
-        box_rect = pygame.Rect(box_x, box_y, box_width, box_height)
+    def advice_rect(self):
+        box_width, box_height = 250, 180
+        return pygame.Rect(self.WIDTH - box_width - 20, 20, box_width, box_height)
+
+    def display_bot_advice(self):
+        """
+        Calculates and displays the bot's recommended move and EVs in a box
+        in the top-right corner.
+        """
+        # We can't provide a recommendation if the player's hand isn't fully dealt
+        advice = self.get_bot_advice()
+        if advice is None:
+            return
+        decision, optimal_ev = advice
+        box_rect = self.advice_rect()
+
+        # The panel is pre-rendered and only rebuilt when what it shows changes
+        panel_key = (decision, f"{optimal_ev:.3f}", self.count_text())
+        if panel_key != self.advice_panel_key:
+            self.advice_panel = self.render_advice_panel(decision, optimal_ev, panel_key[2], box_rect.width, box_rect.height)
+            self.advice_panel_key = panel_key
+        screen.blit(self.advice_panel, box_rect)
+
+    def count_text(self):
+        return f"Count: {self.counter.running:+d} | TC {self.counter.true_count():+.1f}"
+
+    def render_advice_panel(self, decision, optimal_ev, count_text, box_width, box_height):
+        panel = pygame.Surface((box_width, box_height), pygame.SRCALPHA)
+        box_rect = panel.get_rect()
+        box_x, box_y = 0, 0
         
         # Determine color based on EV
         if optimal_ev > 0.3:
@@ -351,70 +779,164 @@ class BlackjackGame:
             box_color = (150, 150, 0) # Yellow
 
         # Draw the box
-        pygame.draw.rect(screen, box_color, box_rect, border_radius=10)
-        pygame.draw.rect(screen, (255, 255, 255), box_rect, 3, border_radius=10)
+        pygame.draw.rect(panel, box_color, box_rect, border_radius=10)
+        pygame.draw.rect(panel, (255, 255, 255), box_rect, 3, border_radius=10)
 
         # Draw the text
-        draw_text("Bot Recommendation", box_x + box_width // 2, box_y + 25, font=small_font)
-        draw_text(f"Decision: {decision.upper()}", box_x + box_width // 2, box_y + 60, font=small_font)
-        draw_text(f"Optimal EV: {optimal_ev:.3f}", box_x + box_width // 2, box_y + 95, font=small_font)
+        draw_text("Bot Recommendation", box_x + box_width // 2, box_y + 25, font=small_font, surface=panel)
+        draw_text(f"Decision: {decision.upper()}", box_x + box_width // 2, box_y + 60, font=small_font, surface=panel)
+        draw_text(f"Optimal EV: {optimal_ev:.3f}", box_x + box_width // 2, box_y + 95, font=small_font, surface=panel)
+        draw_text(count_text, box_x + box_width // 2, box_y + 145, font=small_font, surface=panel)
+        return panel
+
+
 
+    def all_cards(self):
+        return [card for hands in self.seats for hand in hands for card in hand.cards] + self.dealer_hand.cards
 
+    def get_result(self):
+        # Result message and net units once the round is over and every card has finished flipping
+        if any(card.flipping for card in self.all_cards()):
+            return None
+        return self.result(self.human_seat)
+
+    def track_changes(self):
+        """
+        Marks the regions that differ from the last drawn frame: cards that moved,
+        flipped, appeared or disappeared, and labels/panels whose value changed.
+        """
+        # Cards
+        card_states = {}
+        for card in self.all_cards():
+            rect = pygame.Rect(int(card.x), int(card.y), CARD_WIDTH, CARD_HEIGHT)
+            card_states[id(card)] = (rect, card.visible, card.flip_progress if card.flipping else None)
+        for key, old in self.card_states.items():
+            if card_states.get(key) != old:
+                self.dirty.mark(old[0])
+        for key, new in card_states.items():
+            if self.card_states.get(key) != new:
+                self.dirty.mark(new[0])
+        self.card_states = card_states
+
+        # The overlay's own region, while it is shown
+        if self.show_metrics:
+            self.update_metrics_lines()
+            metrics_region = (self.metrics_lines, self.metrics_rect())
+        else:
+            metrics_region = (None, self.metrics_rect())
+
+        # Labels and panels: name -> (value, rect covering it)
+        show_dealer_score = self.phase in (DEALER, SETTLE)
+        result_rect = pygame.Rect(0, 0, 400, 130)
+        result_rect.center = (self.WIDTH // 2, self.HEIGHT // 2)
+        regions = {
+            "deck": (len(self.deck), pygame.Rect(self.deck.x, self.deck.y, CARD_WIDTH + 60, CARD_HEIGHT + 10)),
+            "dealer_score": (self.dealer_hand.score() if show_dealer_score else None,
+                             pygame.Rect(self.WIDTH // 2 + 50, 25, 200, 50)),
+            "player_score": (([[(hand.score(), hand.bet) for hand in hands] for hands in self.seats],
+                              self.active_seat, self.active_hand),
+                             pygame.Rect(0, self.HEIGHT - 225, self.WIDTH, 80)),
+            "controls": (tuple(self.human_actions()), pygame.Rect(0, self.HEIGHT - 50, self.WIDTH, 40)),
+            "advice": ((self.get_bot_advice(), self.count_text()), self.advice_rect()),
+            "result": (self.get_result(), result_rect),
+            "bankroll": (self.bankroll_text(), pygame.Rect(0, 155, 340, 30)),
+            "metrics": metrics_region,
+        }
+        for name, (value, rect) in regions.items():
+            old = self.region_states.get(name)
+            if old is None or old[0] != value:
+                if old is not None:
+                    self.dirty.mark(old[1]) # Where it was drawn, e.g. a taller overlay before it shrank
+                self.dirty.mark(rect)
+            self.region_states[name] = (value, rect)
+
+    def render_static_layer(self):
+        # Everything that only changes with the window size
+        layer = pygame.Surface((self.WIDTH, self.HEIGHT))
+        layer.fill((0, 100, 0)) # Green background for Blackjack
+
+        # Draw labels
+        dealer_label_x = self.WIDTH // 2
+        dealer_label_y = 50
+        draw_text("Dealer", dealer_label_x, dealer_label_y, surface=layer)
+
+        player_label_y = self.HEIGHT - 200
+        if self.num_seats == 1:
+            draw_text("Player", self.WIDTH // 2, player_label_y, surface=layer)
+        else:
+            for seat, kind in enumerate(self.seat_kinds):
+                label = f"{'Bot' if kind == 'bot' else 'Player'} {seat + 1}"
+                draw_text(label, self.seat_x(seat), player_label_y, font=small_font, surface=layer)
+        return layer
 
     # Draw the game state
     def draw(self):
+        if screen.get_size() != (self.WIDTH, self.HEIGHT):
+            flip_frames.clear() # Window resized, drop frames built for the old layout
+            self.static_layer = None
+            self.dirty.mark_all()
         self.WIDTH, self.HEIGHT = screen.get_size()
-        screen.fill((0, 100, 0)) # Green background for Blackjack
 
         # Update positions if window resized
         self.setup_positions()
-        
+
         # Update animations
-        self.player_hand.update()
+        for hands in self.seats:
+            for hand in hands:
+                hand.update()
         self.dealer_hand.update()
 
+        # Nothing moved or changed: skip the frame entirely
+        self.track_changes()
+        if not self.dirty.is_dirty():
+            return
+
+        # Redraw only inside the changed region
+        screen.set_clip(self.dirty.clip_rect())
+        if self.static_layer is None:
+            self.static_layer = self.render_static_layer()
+        screen.blit(self.static_layer, (0, 0))
+
         # Draw the deck
         self.deck.draw(screen)
 
         # Draw hands
-        self.player_hand.draw(screen)
+        for hands in self.seats:
+            for hand in hands:
+                hand.draw(screen)
         self.dealer_hand.draw(screen)
     
-        # Draw labels
-        dealer_label_x = self.WIDTH // 2
-        dealer_label_y = 50
-        draw_text("Dealer", dealer_label_x, dealer_label_y)
-
-        player_label_x = self.WIDTH // 2
-        player_label_y = self.HEIGHT - 200
-        draw_text("Player", player_label_x, player_label_y)
-
         # Draw scores
-        if not self.player_turn or self.game_over:
+        if self.phase in (DEALER, SETTLE):
             dealer_score = self.dealer_hand.score()
             draw_text(f"Score: {dealer_score}", self.WIDTH // 2 + 150, 50)
         else:
             draw_text("Score: ?", self.WIDTH // 2 + 150, 50)    
         
-        player_score = self.player_hand.score()
-        draw_text(f"Score: {player_score}", self.WIDTH // 2 + 150, self.HEIGHT - 200)
-
-        # Draw controls
-        if self.player_turn and not self.game_over:
-            draw_text("H - Hit | S - Stand", 100, self.HEIGHT - 50, font=small_font)
+        if self.num_seats == 1 and len(self.player_hands) == 1:
+            player_score = self.player_hand.score()
+            draw_text(f"Score: {player_score}", self.WIDTH // 2 + 150, self.HEIGHT - 200)
+        else:
+            # One score per seat and split hand, the hand being played in yellow
+            for seat, hands in enumerate(self.seats):
+                for i, hand in enumerate(hands):
+                    active = (seat, i) == (self.active_seat, self.active_hand) and self.phase == PLAYER
+                    color = (255, 255, 0) if active else (255, 255, 255)
+                    draw_text(f"{hand.score()}{' x2' if hand.doubled else ''}", self.hand_x(seat, i), self.HEIGHT - 165,
+                              color=color, font=small_font)
+
+        draw_text(self.bankroll_text(), 170, 170, font=small_font)
+
+        # Draw controls for the actions currently allowed
+        actions = self.human_actions()
+        if actions:
+            controls = " | ".join(f"{CONTROL_KEYS[action]} - {action.capitalize()}" for action in actions)
+            draw_text(controls, self.WIDTH // 2, self.HEIGHT - 30, font=small_font)
 
         # Results (Game Over)
-        if self.game_over and not any(card.flipping for card in self.player_hand.cards + self.dealer_hand.cards):
-            result = ""
-            if self.player_hand.score() > 21:
-                result = "Player Busts!"
-            elif self.dealer_hand.score() > 21 or self.player_hand.score() > self.dealer_hand.score():
-                result = "Player Wins!"
-            elif self.player_hand.score() < self.dealer_hand.score():
-                result = "Dealer Wins!"
-            else:
-                result = "Push!"
-        
+        result = self.get_result()
+        if result is not None:
+            result, net = result
             # Draw results
             result_width = max(len(result) * 20, 240)
             
@@ -423,11 +945,17 @@ class BlackjackGame:
             pygame.draw.rect(screen, (0, 0, 0, 128), result_rect)
             pygame.draw.rect(screen, (255, 255, 255), result_rect, 3)
 
-            draw_text(result, self.WIDTH // 2, self.HEIGHT // 2 - 25, color=(255, 255, 0))
-            draw_text("Press Enter to Continue...", self.WIDTH // 2, self.HEIGHT // 2 + 25, font=small_font)
+            draw_text(result, self.WIDTH // 2, self.HEIGHT // 2 - 30, color=(255, 255, 0))
+            stake = self.stakes[self.human_seat]
+            net_text = f"Net: {net * stake:+,.0f} ({net:+g} units)" if stake else f"Net: {net:+g} units"
+            draw_text(net_text, self.WIDTH // 2, self.HEIGHT // 2 + 5, font=small_font)
+            draw_text("Press Enter to Continue...", self.WIDTH // 2, self.HEIGHT // 2 + 35, font=small_font)
     
         self.display_bot_advice()
-        pygame.display.flip()
+        if self.show_metrics:
+            self.draw_metrics_overlay()
+        screen.set_clip(None)
+        self.dirty.flush()
 
     def show_reshuffle_screen(self):
         screen.fill((0, 108, 0))
@@ -435,16 +963,18 @@ class BlackjackGame:
         draw_text("Reshuffling...", self.WIDTH // 2, self.HEIGHT // 2)
         pygame.display.flip()
         pygame.time.wait(1500)
+        self.dirty.mark_all()
 
 
 
 # ---UTILITY FUNCTIONS---
 # Draw text on the screen
 # Draw text on the screen
-def draw_text(text, x, y, color=(255, 255, 255), font=big_font):
-    img = font.render(text, True, color)
+def draw_text(text, x, y, color=(255, 255, 255), font=None, surface=None):
+    img = text_cache.render(text, font or big_font, color)
     rect = img.get_rect(center =(x, y))
-    screen.blit(img, rect)
+    (surface or screen).blit(img, rect)
+    return rect
 
 """
 # Get the color of the card for display
@@ -480,8 +1010,23 @@ def show_menu():
                     return False, "quit"
 
 
+# ---INSTRUMENTED HOT PATHS---
+# Only wrapped while metrics are enabled
+metrics.register(Card, 'draw', "Card.draw")
+metrics.register(Deck, 'deal', "Deck.deal")
+metrics.register(sys.modules[__name__], 'draw_text', "draw_text")
+metrics.register(BlackjackGame, 'draw', "BlackjackGame.draw")
+metrics.register(GameState, 'step', "GameState.step")
+metrics.register(BlackjackGame, 'display_bot_advice', "display_bot_advice")
+metrics.register(BlackjackGame, 'get_bot_advice', "get_bot_advice")
+metrics.register(BlackjackGame, 'compute_bot_advice', "compute_bot_advice")
+metrics.register(BlackjackGame, 'show_reshuffle_screen', "show_reshuffle_screen")
+
+
 # ---MAIN GAME LOOP---
-def main():
+def main(replay=None, start=0):
+    # replay: a hand history file whose rounds are dealt again from round start, instead of a live game
+    init_display()
     clock = pygame.time.Clock()
     state = "menu"
     running = True
@@ -494,51 +1039,55 @@ def main():
         elif state == "playing":
             if game is None:
                 game = BlackjackGame()
+                if replay is not None:
+                    game.start_replay(HandHistory(replay), start)
+            frame_start = time.perf_counter()
         
             for event in pygame.event.get():
                 # Quit event
                 if event.type == pygame.QUIT:
                     running = False
-                
-                # Card dealing events
-                elif event.type >= pygame.USEREVENT + 1 and event.type <= pygame.USEREVENT + 5:
-                    if event.type == pygame.USEREVENT + 5:
-                        game.dealer_hit()
-                    else:
-                        print(f"Handling deal event: {event.type}")
-                        game.handle_deal_event(event)
+
+                # Metrics overlay
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                    game.toggle_metrics()
+
+                # Turbo mode
+                elif event.type == pygame.KEYDOWN and event.key == pygame.K_t:
+                    game.toggle_turbo()
 
                 # Reset round
-                elif game.waiting_to_continue:
-                    if event.type == pygame.KEYDOWN and event.key == pygame.K_RETURN:
-                        game.reset_round()
-                        game.waiting_to_continue = False
+                elif game.phase == SETTLE:
+                    if event.type == pygame.KEYDOWN and event.key == pygame.K_RETURN and not game.turbo:
+                        game.next_round()
 
                 # Player's turn
-                elif game.player_turn and not game.game_over:
+                elif game.human_turn():
                     if event.type == pygame.KEYDOWN:
-                        # Hit
-                        if event.key == pygame.K_h:
-                            card = game.deck.deal(visible=True)
-                            game.player_hand.add_card(card)
-                            # Check if player busts
-                            if game.player_hand.score() > 21:
-                                game.player_turn = False
-                                game.game_over = True
-                                game.waiting_to_continue = True
-                        # Stand
-                        elif event.key == pygame.K_s:
-                            game.player_turn = False
-
-            # Dealer's turn
-            if not game.player_turn and not game.game_over and not game.waiting_to_continue and not game.dealer_started:
-                game.dealer_play()
-                game.dealer_started = True
-
-            game.draw()
+                        # H - Hit, S - Stand, D - Double, P - Split, R - Surrender, I - Insurance
+                        action = KEY_ACTIONS.get(event.key)
+                        if action is not None:
+                            game.step(action)
+
+            if game.turbo:
+                game.play_turbo()
+                game.draw_turbo()
+            else:
+                # Dealing, bot seats and the dealer's turn
+                game.advance(time.perf_counter())
+                game.draw()
+            if metrics.enabled:
+                metrics.frame(time.perf_counter() - frame_start) # Work done this frame, without the tick's wait
+                metrics.maybe_dump(METRICS_FILE, METRICS_INTERVAL)
             clock.tick(60) # Limit to 60 FPS
     
+    if game is not None:
+        game.close()
     pygame.quit()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Play blackjack, or replay a recorded hand history")
+    parser.add_argument("--replay", default=None, help="Hand history file to replay")
+    parser.add_argument("--start", type=int, default=0, help="First round to replay")
+    args = parser.parse_args()
+    main(args.replay, args.start)
\ No newline at end of file
@@ -0,0 +1,172 @@
+# CARD COUNTING
+#
+# A running count kept incrementally as cards are seen (one list read and an add
+# per card) and converted to a true count per remaining deck. Strategy deviations
+# are precomputed: for each true count bucket the infinite-deck solver is re-run on
+# the composition that count implies, and the charts are stored side by side as the
+# rule sets of one binary StrategyTable. Looking up count-dependent advice is then
+# an index into a mapped array, never a re-solve.
+
+import hashlib
+import math
+import os
+import sys
+
+from Rules import DEFAULT_RULES, TABLE_DIR
+from StrategySolver import StrategySolver, CARD_VALUES
+from StrategyTable import StrategyTable, write_table
+
+
+# ---TAG SYSTEMS---
+# Tags per card value 2-11 (10 covers 10/J/Q/K, 11 is the ace). All balanced.
+TAG_SYSTEMS = {
+    'hi-lo':     [1, 1, 1, 1, 1, 0, 0, 0, -1, -1],
+    'hi-opt-i':  [0, 1, 1, 1, 1, 0, 0, 0, -1, 0],
+    'hi-opt-ii': [1, 1, 2, 2, 1, 1, 0, 0, -2, 0],
+    'omega-ii':  [1, 1, 2, 2, 2, 1, 0, -1, -2, 0],
+    'zen':       [1, 1, 2, 2, 2, 1, 0, 0, -2, -1],
+}
+DECK_COUNTS = [4] * 8 + [16, 4] # Cards per value in one deck
+
+TC_MIN, TC_MAX = -6, 6
+BUCKETS = range(TC_MIN, TC_MAX + 1)
+
+
+def tag_list(system):
+    # A system name or a list of 10 tags -> tags indexed by card value (0-11)
+    tags = TAG_SYSTEMS[system] if isinstance(system, str) else list(system)
+    if len(tags) != len(CARD_VALUES):
+        raise ValueError(f"A tag system needs one tag per card value {CARD_VALUES}")
+    return [0, 0] + tags
+
+
+def count_bucket(true_count):
+    # Floored and clamped to the precomputed range
+    return max(TC_MIN, min(TC_MAX, math.floor(true_count)))
+
+
+def count_probabilities(system, true_count):
+    """
+    Card probabilities implied by a true count: the smallest change to a full deck's
+    composition (weighted by how many cards carry each tag) whose tags sum to the
+    count, which is how a count's information is usually spread over the ranks.
+    """
+    tags = tag_list(system)[2:]
+    weight = sum(tag * tag * n for tag, n in zip(tags, DECK_COUNTS))
+    remaining = [n * (1 - true_count * tag / weight) for tag, n in zip(tags, DECK_COUNTS)]
+    total = sum(remaining)
+    return [r / total for r in remaining]
+
+
+def bet_units(true_count, spread=8):
+    # A standard ramp: one unit up to TC +1, then two more units per true count, up to the spread
+    return max(1, min(spread, 2 * (math.floor(true_count) - 1)))
+
+
+
+class CardCounter:
+    def __init__(self, system='hi-lo', num_decks=1):
+        self.system = system
+        self.tags = tag_list(system)
+        self.total_cards = sum(DECK_COUNTS) * num_decks
+        self.reset()
+
+    def reset(self):
+        # Fresh shoe
+        self.running = 0
+        self.seen = 0
+
+    def see(self, value):
+        self.running += self.tags[value]
+        self.seen += 1
+
+    def decks_remaining(self):
+        return max(self.total_cards - self.seen, 1) / sum(DECK_COUNTS)
+
+    def true_count(self):
+        return self.running / self.decks_remaining()
+
+    def bucket(self):
+        return count_bucket(self.true_count())
+
+
+
+# ---DEVIATION TABLES---
+def deviation_table_path(rules=DEFAULT_RULES, system='hi-lo'):
+    tags = hashlib.sha1(repr(tag_list(system)).encode()).hexdigest()[:8]
+    return os.path.join(TABLE_DIR, f"{rules.digest()}-tc{tags}.bin")
+
+
+def deviation_charts(rules=DEFAULT_RULES, system='hi-lo'):
+    # One solved chart per true count bucket, in BUCKETS order
+    return [StrategySolver(count_probabilities(system, tc), rules).chart() for tc in BUCKETS]
+
+
+def build_deviation_table(rules=DEFAULT_RULES, system='hi-lo', force=False):
+    path = deviation_table_path(rules, system)
+    if force or not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_table(path, deviation_charts(rules, system))
+    return path
+
+
+
+class DeviationTable:
+    def __init__(self, system='hi-lo', rules=DEFAULT_RULES):
+        self.system = system
+        self.rules = rules
+        try:
+            self.table = StrategyTable(deviation_table_path(rules, system))
+        except (OSError, ValueError):
+            self.table = StrategyTable(build_deviation_table(rules, system, force=True))
+
+        # Insurance only depends on the ten density, one value per bucket
+        ten = CARD_VALUES.index(10)
+        self.insurance_evs = [3 * count_probabilities(system, tc)[ten] - 1 for tc in BUCKETS]
+
+    def lookup_all(self, total, kind, dealer_up, true_count):
+        # (decision, {action: ev}) for the true count's bucket, as StrategyTable.lookup_all
+        return self.table.lookup_all(total, kind, dealer_up, count_bucket(true_count) - TC_MIN)
+
+    def lookup(self, total, soft, dealer_up, true_count):
+        return self.table.lookup(total, soft, dealer_up, count_bucket(true_count) - TC_MIN)
+
+    def insurance_ev(self, true_count):
+        return self.insurance_evs[count_bucket(true_count) - TC_MIN]
+
+    def chart(self, bucket):
+        return self.table.chart(bucket - TC_MIN)
+
+    def index_plays(self):
+        """
+        Cells whose two-card decision changes with the count, as
+        {(player_str, dealer_str): [(bucket, decision), ...]} listing each change
+        from the lowest bucket upwards.
+        """
+        plays = {}
+        charts = [self.chart(tc) for tc in BUCKETS]
+        for key in charts[0]:
+            changes = [(tc, chart[key][0]) for tc, chart, previous in zip(BUCKETS[1:], charts[1:], charts)
+                       if chart[key][0] != previous[key][0]]
+            if changes:
+                plays[key] = [(TC_MIN, charts[0][key][0])] + changes
+        return plays
+
+    def close(self):
+        self.table.close()
+
+
+
+def main():
+    system = sys.argv[1] if len(sys.argv) > 1 else 'hi-lo'
+    table = DeviationTable(system)
+    print(f"{system} deviations ({table.rules.describe()}, infinite deck)")
+    for (player_str, dealer_str), changes in table.index_plays().items():
+        steps = ", ".join(f"{decision} from {tc:+d}" for tc, decision in changes[1:])
+        print(f"{player_str:>8} v {dealer_str:<8} {changes[0][1]}, {steps}")
+    first = next((tc for tc in BUCKETS if table.insurance_ev(tc) > 0), None)
+    print(f"Insurance from TC {first:+d}" if first is not None else "Insurance never pays")
+
+
+if __name__ == "__main__":
+    main()
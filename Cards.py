@@ -0,0 +1,113 @@
+# CARDS AND HANDS
+#
+# The game state of cards and hands, free of pygame. A card is its one-byte shoe
+# code plus a visible flag, with rank, suit and value read from the Shoe's lookup
+# tables; a hand keeps a running hard total and ace count, so scoring is constant
+# time however many cards it holds. Both use __slots__, and the game's sprites
+# extend them with position and animation state. BasicStrategyBot uses the same
+# Hand, built straight from a total when there are no cards behind it.
+
+from Shoe import CODE_RANK, CODE_SUIT, CODE_VALUE, encode
+
+
+SUIT_SYMBOLS = {'hearts': '♥', 'diamonds': '♦', 'clubs': '♣', 'spades': '♠'}
+ACE = 11
+
+
+
+class Card:
+    __slots__ = ('code', 'value', 'visible')
+
+    def __init__(self, code, visible=True):
+        self.code = code
+        self.value = CODE_VALUE[code]
+        self.visible = visible
+
+    @classmethod
+    def from_rank(cls, suit, rank, visible=True):
+        return cls(encode(suit, rank), visible)
+
+    @property
+    def rank(self):
+        return CODE_RANK[self.code]
+
+    @property
+    def suit(self):
+        return CODE_SUIT[self.code]
+
+    def flip(self):
+        self.visible = True
+
+    def __str__(self):
+        return f"{self.rank}{SUIT_SYMBOLS[self.suit]}"
+
+
+
+class Hand:
+    __slots__ = ('cards', 'hard_total', 'aces', 'bet', 'doubled', 'surrendered', 'split_aces', 'finished')
+
+    def __init__(self, total=0, soft=False):
+        # A hand can also start from a bare total, e.g. Hand(17, True) for soft 17
+        self.cards = []
+        self.hard_total = total - 10 if soft else total # Aces counted as 1
+        self.aces = 1 if soft else 0
+        self.bet = 1
+        self.doubled = False
+        self.surrendered = False
+        self.split_aces = False
+        self.finished = False
+
+    def __str__(self):
+        return f"{'Soft' if self.soft else 'Hard'} {self.total}"
+
+    def copy(self):
+        # Same class as self, with every slot copied, a subclass's included
+        cls = type(self)
+        new_hand = cls.__new__(cls)
+        for klass in cls.__mro__:
+            for slot in getattr(klass, '__slots__', ()):
+                if hasattr(self, slot):
+                    setattr(new_hand, slot, getattr(self, slot))
+        new_hand.cards = list(self.cards)
+        return new_hand
+
+    def add_value(self, value):
+        if value == ACE:
+            self.hard_total += 1
+            self.aces += 1
+        else:
+            self.hard_total += value
+
+    def add_card(self, card):
+        self.cards.append(card)
+        self.add_value(card.value)
+
+    def remove_card(self):
+        # Takes the last card back out, e.g. to split a pair
+        card = self.cards.pop()
+        if card.value == ACE:
+            self.hard_total -= 1
+            self.aces -= 1
+        else:
+            self.hard_total -= card.value
+        return card
+
+    def clear(self):
+        self.cards.clear()
+        self.hard_total = 0
+        self.aces = 0
+
+    @property
+    def soft(self):
+        # At most one ace can count as 11
+        return self.aces > 0 and self.hard_total <= 11
+
+    @property
+    def total(self):
+        return self.hard_total + 10 if self.soft else self.hard_total
+
+    def score(self):
+        return self.total
+
+    def is_pair(self):
+        return len(self.cards) == 2 and self.cards[0].value == self.cards[1].value
@@ -0,0 +1,222 @@
+# COMPOSITION-DEPENDENT ANALYSER
+#
+# Exact hit/stand/double EVs for the cards actually left in the shoe, instead of the
+# infinite-deck 1/13 per rank assumed by BasicStrategyBot. The remaining shoe is a
+# count per card value packed into a single int (9 bits per value, enough for an
+# 8-deck shoe), so removing a card is one subtraction and the packed int doubles as
+# the memo key. Results are kept in an LRU table so repeated queries from the game
+# loop, and the overlapping subtrees of a single query, are dictionary hits.
+
+from collections import OrderedDict
+
+from DealerProbabilities import dealer_stands
+from Rules import DEFAULT_RULES
+from StrategySolver import CARD_VALUES, DEALER_BUST, NEXT, BUST, add_card, state_index
+
+
+# ---PACKED COMPOSITION---
+NUM_VALUES = len(CARD_VALUES)
+BITS = 9
+MASK = (1 << BITS) - 1
+UNITS = [1 << (BITS * i) for i in range(NUM_VALUES)]
+
+def pack(counts):
+    packed = 0
+    for i, count in enumerate(counts):
+        packed |= count << (BITS * i)
+    return packed
+
+
+def unpack(packed):
+    return [(packed >> (BITS * i)) & MASK for i in range(len(CARD_VALUES))]
+
+
+def counts_from_cards(cards):
+    # Blackjack.Card objects (or anything with a .value of 2-11) -> counts per card value
+    counts = [0] * len(CARD_VALUES)
+    for card in cards:
+        counts[card.value - 2] += 1
+    return counts
+
+
+
+class CompositionAnalyser:
+    def __init__(self, max_entries=500_000, rules=DEFAULT_RULES):
+        self.max_entries = max_entries
+        self.stands = dealer_stands(rules)
+        # natural[up] is the value index of the hole card that makes a blackjack. Under a peek the
+        # player only acts once the dealer has none, so the first draw skips it; without one it
+        # stays in, and beats every hand the player can stand on
+        self.natural = [-1] * 12
+        self.natural[10] = CARD_VALUES.index(11)
+        self.natural[11] = CARD_VALUES.index(10)
+        self.skip = self.natural if rules.dealer_peek else [-1] * 12
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    # ---CACHE---
+    def _get(self, key):
+        value = self.cache.get(key)
+        if value is not None:
+            self.cache.move_to_end(key)
+            self.hits += 1
+        else:
+            self.misses += 1
+        return value
+
+    def _put(self, key, value):
+        self.cache[key] = value
+        if len(self.cache) > self.max_entries:
+            self.cache.popitem(last=False) # Evict least recently used
+        return value
+
+    def clear(self):
+        self.cache.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+    # ---DEALER---
+    def dealer_outcomes(self, packed, total, soft):
+        """
+        Dealer final-total probabilities [17, 18, 19, 20, 21, bust] for a dealer hand
+        drawing from the packed shoe, under the analyser's 17 rule.
+        """
+        return self._dealer_outcomes(packed, state_index(total, soft))
+
+    def _dealer_outcomes(self, packed, state, skip=-1):
+        # Hot path: states and transitions come from the solver's integer tables; the first draw leaves out value index skip
+        key = (0, packed, state, skip)
+        cache = self.cache
+        cached = cache.get(key)
+        if cached is not None:
+            cache.move_to_end(key)
+            self.hits += 1
+            return cached
+        self.misses += 1
+
+        remaining = 0
+        for i in range(NUM_VALUES):
+            remaining += (packed >> (BITS * i)) & MASK
+        if skip >= 0:
+            remaining -= (packed >> (BITS * skip)) & MASK
+        stands = self.stands
+        dist = [0.0] * 6
+        row = state * NUM_VALUES
+        for i in range(NUM_VALUES):
+            count = (packed >> (BITS * i)) & MASK
+            if not count or i == skip:
+                continue
+            p = count / remaining
+            n = NEXT[row + i]
+            if n == BUST:
+                dist[DEALER_BUST] += p
+            elif stands[n] >= 0:
+                dist[stands[n]] += p
+            else:
+                sub = self._dealer_outcomes(packed - UNITS[i], n)
+                for o in range(6):
+                    dist[o] += p * sub[o]
+        return self._put(key, dist)
+
+
+    # ---PLAYER---
+    def stand_ev(self, packed, player_total, dealer_up):
+        key = (1, packed, player_total, dealer_up)
+        cached = self._get(key)
+        if cached is not None:
+            return cached
+
+        dist = self._dealer_outcomes(packed, state_index(dealer_up, dealer_up == 11), self.skip[dealer_up])
+        ev = dist[DEALER_BUST]
+        for o in range(5):
+            dealer_total = 17 + o
+            if player_total > dealer_total:
+                ev += dist[o]
+            elif player_total < dealer_total:
+                ev -= dist[o]
+        natural = self.natural[dealer_up]
+        if player_total == 21 and natural >= 0 and self.skip[dealer_up] < 0:
+            # The dealer's blackjacks are in dist's 21s, a push above, but a natural wins
+            counts = unpack(packed)
+            ev -= counts[natural] / sum(counts)
+        return self._put(key, ev)
+
+    def hit_ev(self, packed, player_total, player_soft, dealer_up, dealer_packed=None):
+        """
+        EV of hitting then playing on optimally. When dealer_packed is given the
+        dealer draws from that fixed shoe instead of the one left after the
+        player's hits, which shares a single dealer tree across the whole query.
+        """
+        key = (2, packed, player_total, player_soft, dealer_up, dealer_packed)
+        cached = self._get(key)
+        if cached is not None:
+            return cached
+
+        counts = unpack(packed)
+        remaining = sum(counts)
+        ev = 0.0
+        for i, count in enumerate(counts):
+            if not count:
+                continue
+            p = count / remaining
+            new_total, new_soft = add_card(player_total, player_soft, CARD_VALUES[i])
+            if new_total > 21:
+                ev -= p
+            else:
+                new_packed = packed - UNITS[i]
+                stand_packed = new_packed if dealer_packed is None else dealer_packed
+                ev += p * max(self.stand_ev(stand_packed, new_total, dealer_up),
+                              self.hit_ev(new_packed, new_total, new_soft, dealer_up, dealer_packed))
+        return self._put(key, ev)
+
+    def double_ev(self, packed, player_total, player_soft, dealer_up, dealer_packed=None):
+        # One card for twice the bet; dealer_packed as in hit_ev
+        key = (3, packed, player_total, player_soft, dealer_up, dealer_packed)
+        cached = self._get(key)
+        if cached is not None:
+            return cached
+
+        counts = unpack(packed)
+        remaining = sum(counts)
+        ev = 0.0
+        for i, count in enumerate(counts):
+            if not count:
+                continue
+            p = count / remaining
+            new_total, _ = add_card(player_total, player_soft, CARD_VALUES[i])
+            if new_total > 21:
+                ev -= p
+            else:
+                stand_packed = packed - UNITS[i] if dealer_packed is None else dealer_packed
+                ev += p * self.stand_ev(stand_packed, new_total, dealer_up)
+        return self._put(key, 2 * ev)
+
+    def analyse(self, counts, player_total, player_soft, dealer_up, exact=True):
+        """
+        counts is the unseen cards per value (see counts_from_cards), which must
+        include the dealer's hole card. Returns (decision, hit_ev, stand_ev) like
+        BasicStrategyBot.analyse.
+        With exact=False the cards the player draws are not removed from the
+        dealer's shoe: the stand EV is still exact, hit EVs lose a small amount
+        of precision and a cold query becomes cheap enough for a single frame.
+        """
+        if player_total > 21:
+            return "bust", -1.0, -1.0
+        packed = counts if isinstance(counts, int) else pack(counts)
+        stand_ev = self.stand_ev(packed, player_total, dealer_up)
+        hit_ev = self.hit_ev(packed, player_total, player_soft, dealer_up, None if exact else packed)
+        if hit_ev > stand_ev:
+            return 'hit', hit_ev, stand_ev
+        else:
+            return 'stand', hit_ev, stand_ev
+
+    def analyse_all(self, counts, player_total, player_soft, dealer_up, can_double=True, exact=True):
+        # Hit, stand and (for first decisions) double, as (best action, {action: ev})
+        packed = counts if isinstance(counts, int) else pack(counts)
+        _, hit_ev, stand_ev = self.analyse(packed, player_total, player_soft, dealer_up, exact)
+        evs = {'hit': hit_ev, 'stand': stand_ev}
+        if can_double:
+            evs['double'] = self.double_ev(packed, player_total, player_soft, dealer_up, None if exact else packed)
+        return max(evs, key=evs.get), evs
@@ -0,0 +1,318 @@
+# DEALER PROBABILITIES
+#
+# The dealer's final-total distribution from every hand and upcard, as flat arrays
+# indexed like the solver's: [17, 18, 19, 20, 21, bust] from any dealer state, plus
+# blackjack kept as its own outcome from each upcard. DealerTable fills them in one bottom-up pass
+# for fixed card probabilities (the infinite deck), once per rule set, and is shared
+# by the solver's stand EVs, the bot and the simulators' variance estimates.
+#
+# ShoeDealerTable gives the same upcard distributions for a finite shoe, exact
+# without replacement. Every way the dealer can draw out is precomputed once per
+# rule set as a term: the cards drawn (as counts per value), the number of orders
+# they can come in, and the outcome. A term's probability is a product of falling
+# factorials of the shoe's counts, so taking one card out of the shoe rescales only
+# the terms holding that value, instead of re-solving the dealer tree.
+
+from array import array
+
+from Rules import DEFAULT_RULES
+from StrategySolver import (CARD_VALUES, INFINITE_DECK, UPCARDS, NUM_STATES, NEXT, BUST, SOLVE_ORDER,
+                            DEALER_OUTCOMES, DEALER_BUST, state_index)
+
+
+OUTCOMES = DEALER_OUTCOMES + ["blackjack"]
+BLACKJACK = 6
+NUM_OUTCOMES = len(OUTCOMES)
+
+
+def dealer_stands(rules=DEFAULT_RULES):
+    # stands[state] = dealer outcome index if the dealer stands on this state, else -1
+    stands = [-1] * NUM_STATES
+    for total in range(17, 22):
+        stands[state_index(total, False)] = stands[state_index(total, True)] = total - 17
+    if rules.hit_soft_17:
+        stands[state_index(17, True)] = -1
+    return stands
+
+
+
+class DealerDistributions:
+    # Queries shared by both tables, over upcards[up * 7 + outcome] and stand[up * 7 + outcome]
+
+    def upcard_outcomes(self, up):
+        # {17: p, ..., 21: p, "bust": p, "blackjack": p} from an upcard, before any peek
+        upcards = self.upcards
+        return {outcome: upcards[up * NUM_OUTCOMES + o] for o, outcome in enumerate(OUTCOMES)}
+
+    def blackjack_probability(self, up):
+        return self.upcards[up * NUM_OUTCOMES + BLACKJACK]
+
+    def stand_ev(self, player_total, up):
+        stand = self.stand
+        base = up * NUM_OUTCOMES
+        ev = stand[base + DEALER_BUST] - stand[base + BLACKJACK] # A natural beats every other hand, 21s included
+        for o in range(5):
+            dealer_total = 17 + o
+            if player_total > dealer_total:
+                ev += stand[base + o]
+            elif player_total < dealer_total:
+                ev -= stand[base + o]
+        return ev
+
+    def stand_moments(self, player_total, up):
+        # (mean, variance) of standing: every outcome is +1, -1 or a push
+        stand = self.stand
+        ev = self.stand_ev(player_total, up)
+        push = stand[up * NUM_OUTCOMES + player_total - 17] if 17 <= player_total <= 21 else 0.0
+        return ev, 1.0 - push - ev * ev
+
+
+
+class DealerTable(DealerDistributions):
+    """
+    states[state * 6 + outcome] from any dealer hand, upcards[up * 7 + outcome] from
+    an upcard with blackjack split out, and stand[up * 7 + outcome], what a standing
+    player is settled against: given no blackjack when the dealer peeks, with the
+    blackjack left in when not.
+    """
+    def __init__(self, probabilities=INFINITE_DECK, rules=DEFAULT_RULES):
+        self.probabilities = list(probabilities)
+        self.rules = rules
+        self.states = array('d', [0.0]) * (NUM_STATES * 6)
+        self.upcards = array('d', [0.0]) * (12 * NUM_OUTCOMES)
+        self.stand = array('d', [0.0]) * (12 * NUM_OUTCOMES)
+        self._solve()
+
+    def _solve(self):
+        dist = self.states
+        probabilities = self.probabilities
+        hit_soft_17 = self.rules.hit_soft_17
+        for total, soft in SOLVE_ORDER:
+            s = state_index(total, soft)
+            # Dealer stands on 17, or on hard 17 only under H17
+            if total >= 17 and not (hit_soft_17 and soft and total == 17):
+                dist[s * 6 + total - 17] = 1.0
+                continue
+            for c, p in enumerate(probabilities):
+                n = NEXT[s * 10 + c]
+                if n == BUST:
+                    dist[s * 6 + DEALER_BUST] += p
+                else:
+                    for o in range(6):
+                        dist[s * 6 + o] += p * dist[n * 6 + o]
+
+        # From the upcard: draw the hole card, skipping blackjacks the dealer would have peeked at
+        for up in UPCARDS:
+            start = state_index(up, up == 11)
+            base = up * NUM_OUTCOMES
+            total = 0.0
+            for c, p in enumerate(probabilities):
+                n = NEXT[start * 10 + c]
+                if up + CARD_VALUES[c] == 21:
+                    self.upcards[base + BLACKJACK] += p
+                    if not self.rules.dealer_peek:
+                        self.stand[base + BLACKJACK] += p
+                        total += p
+                    continue
+                for o in range(6):
+                    self.upcards[base + o] += p * dist[n * 6 + o]
+                    self.stand[base + o] += p * dist[n * 6 + o]
+                total += p
+            for o in range(NUM_OUTCOMES):
+                self.stand[base + o] /= total
+
+    def outcomes(self, total, soft):
+        # {17: p, ..., 21: p, "bust": p} for any dealer hand, leaving out outcomes it can't reach
+        base = state_index(total, soft) * 6
+        return {outcome: self.states[base + o] for o, outcome in enumerate(DEALER_OUTCOMES)
+                if self.states[base + o] > 0}
+
+
+_tables = {}
+
+def dealer_table(rules=DEFAULT_RULES, probabilities=INFINITE_DECK):
+    # One shared table per set of card probabilities and dealer rules
+    key = (tuple(probabilities), rules.hit_soft_17, rules.dealer_peek)
+    table = _tables.get(key)
+    if table is None:
+        table = _tables[key] = DealerTable(probabilities, rules)
+    return table
+
+
+
+# ---FINITE SHOES---
+class DealerTerms:
+    """
+    Every way the dealer draws out from each upcard, merged by the cards drawn and
+    outcome. Term t holds weights[t] orderings of its cards, drawn[t] as (value
+    index, count) pairs, and adds to group[t] = (up * 7 + outcome) * max_draws +
+    cards drawn. by_value[i] lists the (term, count) pairs holding card value i.
+    """
+    def __init__(self, hit_soft_17=False):
+        stands = dealer_stands(DEFAULT_RULES._replace(hit_soft_17=hit_soft_17))
+        merged = {}
+
+        def draw(up, state, drawn, first):
+            for c, value in enumerate(CARD_VALUES):
+                n = NEXT[state * 10 + c]
+                drawn[c] += 1
+                if first and up + value == 21:
+                    outcome = BLACKJACK
+                elif n == BUST:
+                    outcome = DEALER_BUST
+                else:
+                    outcome = stands[n]
+                if outcome >= 0:
+                    key = (up, outcome, tuple(drawn))
+                    merged[key] = merged.get(key, 0) + 1
+                else:
+                    draw(up, n, drawn, False)
+                drawn[c] -= 1
+
+        for up in UPCARDS:
+            draw(up, state_index(up, up == 11), [0] * len(CARD_VALUES), True)
+
+        self.max_draws = max(sum(drawn) for _, _, drawn in merged) + 1
+        self.weights = []
+        self.drawn = []
+        self.group = []
+        self.by_value = [[] for _ in CARD_VALUES]
+        for t, ((up, outcome, drawn), weight) in enumerate(merged.items()):
+            self.weights.append(weight)
+            self.drawn.append([(c, m) for c, m in enumerate(drawn) if m])
+            self.group.append((up * NUM_OUTCOMES + outcome) * self.max_draws + sum(drawn))
+            for c, m in enumerate(drawn):
+                if m:
+                    self.by_value[c].append((t, m))
+
+
+_terms = {}
+
+def dealer_terms(hit_soft_17=False):
+    terms = _terms.get(hit_soft_17)
+    if terms is None:
+        terms = _terms[hit_soft_17] = DealerTerms(hit_soft_17)
+    return terms
+
+
+def falling(n, m):
+    # n (n - 1) ... (n - m + 1): the ordered ways to draw m cards from n
+    product = 1
+    for i in range(m):
+        product *= n - i
+    return product
+
+
+
+class ShoeDealerTable(DealerDistributions):
+    """
+    Upcard distributions for a dealer drawing from counts (the unseen cards per
+    value 2-11, hole card included), updated in place as cards leave or return to
+    the shoe. The upcards and stand arrays are rebuilt from the term sums when
+    next read.
+    """
+    def __init__(self, counts, rules=DEFAULT_RULES):
+        self.rules = rules
+        self.terms = dealer_terms(rules.hit_soft_17)
+        self.reset(counts)
+
+    def reset(self, counts):
+        # Every term from scratch, e.g. after a shuffle
+        terms = self.terms
+        self.counts = list(counts)
+        self.remaining = sum(self.counts)
+        self.values = [0.0] * len(terms.weights) # Weight times the falling factorials
+        self.sums = [0.0] * (12 * NUM_OUTCOMES * terms.max_draws)
+        for t, weight in enumerate(terms.weights):
+            value = self._term(t)
+            self.values[t] = value
+            self.sums[terms.group[t]] += value
+        self.stale = True
+
+    def _term(self, t):
+        value = self.terms.weights[t]
+        for c, m in self.terms.drawn[t]:
+            value *= falling(self.counts[c], m)
+        return float(value)
+
+    def remove(self, value):
+        # One card of this value (2-11) leaves the shoe
+        c = value - 2
+        n = self.counts[c]
+        if n == 0:
+            raise ValueError(f"no {value}s left to remove")
+        values, sums, group = self.values, self.sums, self.terms.group
+        for t, m in self.terms.by_value[c]:
+            old = values[t]
+            if old:
+                new = old * (n - m) / n
+                values[t] = new
+                sums[group[t]] += new - old
+        self.counts[c] = n - 1
+        self.remaining -= 1
+        self.stale = True
+
+    def add(self, value):
+        # One card of this value returns to the shoe
+        c = value - 2
+        n = self.counts[c] + 1
+        self.counts[c] = n
+        self.remaining += 1
+        values, sums, group = self.values, self.sums, self.terms.group
+        for t, m in self.terms.by_value[c]:
+            old = values[t]
+            if old:
+                new = old * n / (n - m)
+            elif m == n:
+                new = self._term(t) # There were too few of this value for the term before
+            else:
+                continue
+            values[t] = new
+            sums[group[t]] += new - old
+        self.stale = True
+
+    def _refresh(self):
+        max_draws = self.terms.max_draws
+        orders = [falling(self.remaining, k) for k in range(max_draws)]
+        sums = self.sums
+        upcards = array('d', [0.0]) * (12 * NUM_OUTCOMES)
+        stand = array('d', [0.0]) * (12 * NUM_OUTCOMES)
+        for up in UPCARDS:
+            for o in range(NUM_OUTCOMES):
+                base = (up * NUM_OUTCOMES + o) * max_draws
+                upcards[up * NUM_OUTCOMES + o] = sum(sums[base + k] / orders[k]
+                                                     for k in range(1, max_draws) if orders[k])
+            base = up * NUM_OUTCOMES
+            if self.rules.dealer_peek:
+                total = sum(upcards[base:base + 6])
+                for o in range(6):
+                    stand[base + o] = upcards[base + o] / total if total else 0.0
+            else:
+                stand[base:base + NUM_OUTCOMES] = upcards[base:base + NUM_OUTCOMES]
+        self._upcards, self._stand = upcards, stand
+        self.stale = False
+
+    @property
+    def upcards(self):
+        if self.stale:
+            self._refresh()
+        return self._upcards
+
+    @property
+    def stand(self):
+        if self.stale:
+            self._refresh()
+        return self._stand
+
+
+
+def main():
+    # The infinite-deck table under the default rules
+    table = dealer_table()
+    print(f"{'Up':>4} " + " ".join(f"{str(outcome):>9}" for outcome in OUTCOMES))
+    for up in UPCARDS:
+        print(f"{'A' if up == 11 else up:>4} " + " ".join(f"{p:9.4f}" for p in table.upcard_outcomes(up).values()))
+
+
+if __name__ == "__main__":
+    main()
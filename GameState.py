@@ -0,0 +1,430 @@
+# GAME STATE
+#
+# The rules of a round as a state machine, free of pygame. A round moves through
+# four phases: DEAL (one initial card per step), PLAYER (one action per step, with
+# every seat offered insurance in turn first under an ace), DEALER (the hole card,
+# then one draw per step) and SETTLE. The pygame front-end
+# steps it on a clock so every card can be animated; bots and simulators step it
+# in a tight loop at full speed, e.g. with play_round and bot_policy.
+#
+# A table has up to seven seats, each with its own hands (more than one after a
+# split) and insurance. Cards go round the seats in order, the seats act in turn
+# against one dealer hand, and every seat is settled in one pass at the end.
+
+from Cards import Card, Hand
+from Rules import DEFAULT_RULES
+from Shoe import Shoe
+from StrategySolver import SURRENDER_EV
+
+
+DEAL, PLAYER, DEALER, SETTLE = 'deal', 'player', 'dealer', 'settle'
+MAX_SEATS = 7
+
+
+
+class Deck:
+    # The shoe holds compact card codes; Card objects are only built when dealt
+    card_class = Card
+
+    def __init__(self, num_decks=1, penetration=0.5, continuous=False, counter=None, seed=None):
+        self.shoe = Shoe(num_decks, penetration, continuous, seed)
+        self.counter = counter # Sees every card as it is shown
+
+    def __len__(self):
+        return len(self.shoe)
+
+    def deal(self, visible=True):
+        if not len(self.shoe):
+            self.reset() # A full table can run a short shoe dry mid-round: shuffle up and carry on
+        card = self.card_class(self.shoe.deal(), visible)
+        if visible and self.counter is not None:
+            self.counter.see(card.value)
+        return card
+
+    def reveal(self, card):
+        # Turn a face-down card over; it only counts once it has been seen
+        card.flip()
+        if self.counter is not None:
+            self.counter.see(card.value)
+
+    def needs_shuffle(self):
+        return self.shoe.needs_shuffle()
+
+    def reset(self):
+        self.shoe.shuffle()
+        if self.counter is not None:
+            self.counter.reset()
+
+
+
+class GameState:
+    hand_class = Hand
+
+    def __init__(self, rules=DEFAULT_RULES, deck=None, num_seats=1):
+        if not 1 <= num_seats <= MAX_SEATS:
+            raise ValueError(f"A table has 1 to {MAX_SEATS} seats, not {num_seats}")
+        self.rules = rules
+        self.deck = deck if deck is not None else Deck(rules.num_decks)
+        self.num_seats = num_seats
+        self.dealer_hand = self.hand_class()
+        self.version = 0 # Bumped on every change, so anything derived from the state can be cached
+        self.history = None # e.g. a HandHistoryWriter, told of every round, card and action
+        self.new_round()
+
+    @property
+    def player_hands(self):
+        # The hands of the seat currently acting
+        return self.seats[self.active_seat]
+
+    @property
+    def player_hand(self):
+        # The hand currently being played
+        return self.seats[self.active_seat][self.active_hand]
+
+    @property
+    def insurance(self):
+        # Insurance bet of the seat currently acting, in units of the original bet
+        return self.insurances[self.active_seat]
+
+    @insurance.setter
+    def insurance(self, bet):
+        self.insurances[self.active_seat] = bet
+
+    def new_round(self):
+        # Clears the table for the next deal; returns True if the shoe was reshuffled first
+        reshuffled = self.deck.needs_shuffle()
+        if reshuffled:
+            self.deck.reset()
+        self.seats = [[self.hand_class()] for _ in range(self.num_seats)] # Hands per seat
+        self.insurances = [0] * self.num_seats
+        self.active_seat = 0
+        self.active_hand = 0
+        self.peeked = False
+        self.insuring = False # Seats are being offered insurance, before anyone plays
+        self.dealer_hand.clear()
+        self.phase = DEAL
+        self.version += 1
+        if self.history is not None:
+            self.history.begin(self)
+        return reshuffled
+
+    def step(self, action=None):
+        """
+        Advances the round by one event and returns the new phase: the next card
+        of the initial deal, the player's action (ignored if not allowed) or the
+        dealer's next move. Nothing happens once the round is settled.
+        """
+        if self.phase == DEAL:
+            self.deal_next()
+        elif self.phase == PLAYER:
+            if action is not None:
+                self.play(action)
+        elif self.phase == DEALER:
+            self.dealer_step()
+        return self.phase
+
+    def deal_to(self, hand, visible=True):
+        card = self.deck.deal(visible)
+        hand.add_card(card)
+        if self.history is not None:
+            self.history.card(card)
+        self.version += 1
+        return card
+
+
+    # ---DEALING---
+    def deal_next(self):
+        # Round the seats then the dealer, twice; the dealer's second card is the hole card
+        dealt = sum(len(hands[0].cards) for hands in self.seats) + len(self.dealer_hand.cards)
+        seat = dealt % (self.num_seats + 1)
+        if seat < self.num_seats:
+            self.deal_to(self.seats[seat][0])
+        elif not self.dealer_hand.cards:
+            self.deal_to(self.dealer_hand)
+        else:
+            self.deal_to(self.dealer_hand, visible=False)
+            self.phase = PLAYER
+            # Under a ten the dealer peeks straight away; under an ace, once every seat has been offered insurance
+            if self.dealer_hand.cards[0].value == 11:
+                self.insuring = True
+            elif self.dealer_hand.cards[0].value == 10:
+                self.peek()
+
+    def peek(self):
+        """
+        Checks the hole card for blackjack when the rules have the dealer peek, ending
+        the round before the player acts. Returns True if the round ended.
+        """
+        if not self.rules.dealer_peek or self.peeked or self.dealer_hand.cards[0].value < 10:
+            return False
+        self.peeked = True
+        if self.dealer_hand.score() != 21:
+            return False
+        self.deck.reveal(self.dealer_hand.cards[1])
+        self.version += 1
+        self.settle()
+        return True
+
+    def dealer_step(self):
+        # Turn the hole card over first, then one draw per step until the dealer stands
+        hole_card = self.dealer_hand.cards[1]
+        if not hole_card.visible:
+            self.deck.reveal(hole_card)
+            self.version += 1
+        elif self.dealer_should_hit():
+            self.deal_to(self.dealer_hand)
+        else:
+            self.settle()
+
+    def dealer_should_hit(self):
+        score = self.dealer_hand.score()
+        return score < 17 or (self.rules.hit_soft_17 and score == 17 and self.dealer_hand.soft)
+
+
+    # ---PLAYER ACTIONS---
+    def available_actions(self):
+        # Actions allowed for the active hand, in key order
+        if self.phase != PLAYER:
+            return []
+        if self.insuring:
+            return ['insurance', 'decline']
+        rules = self.rules
+        hand = self.player_hand
+        split = len(self.player_hands) > 1
+        first_decision = len(hand.cards) == 2
+        if hand.split_aces: # Only open while it can be resplit: keep the two aces or split them again
+            return ['stand', 'split'] if self.can_split(hand) else ['stand']
+        actions = ['hit', 'stand']
+        if first_decision and (rules.double_after_split or not split):
+            actions.append('double')
+        if self.can_split(hand):
+            actions.append('split')
+        if rules.late_surrender and first_decision and not split:
+            actions.append('surrender')
+        return actions
+
+    def can_split(self, hand):
+        return (hand.is_pair() and len(self.player_hands) < self.rules.max_split_hands
+                and (self.rules.resplit_aces or not hand.split_aces))
+
+    def play(self, action):
+        # Runs one player action if it is currently allowed
+        if action not in self.available_actions():
+            return
+        if self.history is not None:
+            self.history.action(self, action)
+        {'hit': self.hit, 'stand': self.stand, 'double': self.double_down, 'split': self.split,
+         'surrender': self.surrender, 'insurance': self.take_insurance, 'decline': self.offer_insurance}[action]()
+
+    def hit(self):
+        self.deal_to(self.player_hand)
+        if self.player_hand.score() > 21:
+            self.finish_hand()
+
+    def stand(self):
+        self.finish_hand()
+        self.finish_split_aces()
+
+    def double_down(self):
+        hand = self.player_hand
+        hand.bet *= 2
+        hand.doubled = True
+        self.deal_to(hand)
+        self.finish_hand()
+
+    def split(self):
+        hand = self.player_hand
+        new_hand = self.hand_class()
+        new_hand.add_card(hand.remove_card())
+        new_hand.bet = hand.bet
+        hand.split_aces = new_hand.split_aces = hand.cards[0].rank == 'A'
+        self.player_hands.insert(self.active_hand + 1, new_hand)
+
+        # Each hand gets its second card straight away; split aces get only that one
+        self.deal_to(hand)
+        self.deal_to(new_hand)
+        self.finish_split_aces()
+
+    def finish_split_aces(self):
+        # Split aces take no more cards: each is finished in turn unless it is a pair that can be split again
+        while self.phase == PLAYER and self.player_hand.split_aces and not self.can_split(self.player_hand):
+            self.finish_hand()
+
+    def surrender(self):
+        self.player_hand.surrendered = True
+        self.finish_hand()
+
+    def take_insurance(self):
+        # Half the original bet, paid 2:1 if the dealer has blackjack
+        self.insurance = 0.5
+        self.offer_insurance()
+
+    def offer_insurance(self):
+        # On to the next seat's insurance decision; after the last, the dealer peeks and play starts at seat 0
+        self.version += 1
+        if self.active_seat + 1 < self.num_seats:
+            self.active_seat += 1
+            return
+        self.active_seat = 0
+        self.insuring = False
+        self.peek()
+
+    def finish_hand(self):
+        # Moves on to the seat's next hand, then the next seat, then the dealer
+        self.version += 1
+        self.player_hand.finished = True
+        if self.active_hand + 1 < len(self.player_hands):
+            self.active_hand += 1
+            return
+        if self.active_seat + 1 < self.num_seats:
+            self.active_seat += 1
+            self.active_hand = 0
+            return
+
+        # Nothing left for the dealer to beat
+        if all(hand.score() > 21 or hand.surrendered for hands in self.seats for hand in hands):
+            self.settle()
+        else:
+            self.phase = DEALER
+
+
+    # ---SETTLEMENT---
+    def settle(self):
+        # The hole card is turned over however the round ends, so the count sees every card dealt
+        hole_cards = self.dealer_hand.cards[1:2]
+        if hole_cards and not hole_cards[0].visible:
+            self.deck.reveal(hole_cards[0])
+            self.version += 1
+        self.phase = SETTLE
+        if self.history is not None:
+            self.history.end(self)
+
+    def is_blackjack(self, hand, hands=None):
+        # A two-card 21 on an unsplit hand; hands is the seat's hands, the acting seat's by default
+        hands = self.player_hands if hands is None else hands
+        return len(hands) == 1 and len(hand.cards) == 2 and hand.score() == 21
+
+    def dealer_blackjack(self):
+        return len(self.dealer_hand.cards) == 2 and self.dealer_hand.score() == 21
+
+    def hand_result(self, hand, hands=None):
+        if hand.surrendered:
+            return "Player Surrenders!"
+        if hand.score() > 21:
+            return "Player Busts!"
+        # Naturals are settled against each other: two push, one alone beats any other total
+        player_blackjack = self.is_blackjack(hand, hands)
+        dealer_blackjack = self.dealer_blackjack()
+        if player_blackjack or dealer_blackjack:
+            if player_blackjack and dealer_blackjack:
+                return "Push!"
+            return "Blackjack!" if player_blackjack else "Dealer Wins!"
+        elif self.dealer_hand.score() > 21 or hand.score() > self.dealer_hand.score():
+            return "Player Wins!"
+        elif hand.score() < self.dealer_hand.score():
+            return "Dealer Wins!"
+        else:
+            return "Push!"
+
+    def hand_net(self, hand, hands=None):
+        # Units won or lost on one hand; blackjack pays at the rule set's payout
+        result = self.hand_result(hand, hands)
+        if result == "Player Surrenders!":
+            return SURRENDER_EV * hand.bet
+        return {"Blackjack!": hand.bet * self.rules.blackjack_payout, "Player Wins!": hand.bet, "Dealer Wins!": -hand.bet,
+                "Player Busts!": -hand.bet, "Push!": 0}[result]
+
+    def seat_nets(self):
+        """
+        Net units for every seat, settled in one pass over the table's hands with
+        the dealer's total worked out once. Same outcomes as hand_net, insurance included.
+        """
+        dealer_score = self.dealer_hand.score()
+        dealer_blackjack = self.dealer_blackjack()
+        payout = self.rules.blackjack_payout
+        nets = []
+        for hands, insurance in zip(self.seats, self.insurances):
+            net = 0
+            unsplit = len(hands) == 1
+            for hand in hands:
+                score = hand.score()
+                if hand.surrendered:
+                    net += SURRENDER_EV * hand.bet
+                elif score > 21:
+                    net -= hand.bet
+                elif unsplit and score == 21 and len(hand.cards) == 2:
+                    if not dealer_blackjack:
+                        net += hand.bet * payout
+                elif dealer_blackjack:
+                    net -= hand.bet
+                elif dealer_score > 21 or score > dealer_score:
+                    net += hand.bet
+                elif score < dealer_score:
+                    net -= hand.bet
+            if insurance:
+                net += 2 * insurance if dealer_blackjack else -insurance
+            nets.append(net)
+        return nets
+
+    def round_net(self, seat=0):
+        return self.seat_nets()[seat]
+
+    def result(self, seat=0):
+        # A seat's result message and net units, once the round is settled
+        if self.phase != SETTLE:
+            return None
+        hands = self.seats[seat]
+        if len(hands) == 1:
+            message = self.hand_result(hands[0], hands)
+        else:
+            results = [self.hand_net(hand, hands) for hand in hands]
+            message = f"Won {sum(net > 0 for net in results)} of {len(results)} Hands"
+        return message, self.round_net(seat)
+
+
+
+# ---DRIVING THE STATE MACHINE---
+def bot_advisor(bot):
+    """
+    The basic strategy bot's (decision, ev) for the active hand from its table,
+    limited to the actions allowed right now. Insurance is never advised. Results
+    are memoised on (total, soft, pair, upcard, actions), so every bot seat sharing
+    an advisor costs one lookup per distinct situation.
+    """
+    memo = {}
+
+    def advise(state):
+        if state.insuring:
+            return 'decline', 0.0
+        actions = state.available_actions()
+        hand = state.player_hand
+        up = state.dealer_hand.cards[0].value
+        pair_value = hand.cards[0].value if 'split' in actions else None
+        key = (hand.total, hand.soft, pair_value, up, tuple(actions))
+        advice = memo.get(key)
+        if advice is None:
+            _, evs = bot.analyse_all(hand, Hand(up, up == 11), pair_value)
+            decision = max((action for action in evs if action in actions), key=evs.get, default='stand')
+            advice = memo[key] = (decision, evs.get(decision, float('nan')))
+        return advice
+    return advise
+
+
+def bot_policy(bot):
+    # A policy for play_round: play whatever bot_advisor advises
+    advise = bot_advisor(bot)
+    return lambda state: advise(state)[0]
+
+
+def play_round(state, policy):
+    """
+    Plays a whole round at full speed, starting a new one if the last is settled,
+    and returns the table's net units. policy is one callable for every seat or a
+    list with one per seat.
+    """
+    if state.phase == SETTLE:
+        state.new_round()
+    policies = policy if isinstance(policy, (list, tuple)) else [policy] * state.num_seats
+    while state.phase != SETTLE:
+        state.step(policies[state.active_seat](state) if state.phase == PLAYER else None)
+    return sum(state.seat_nets())
@@ -0,0 +1,318 @@
+# HAND HISTORY
+#
+# Every round as one fixed-width binary record: the shoe's seed, shuffle and
+# position, the cards in the order they were dealt, each action with the seat that
+# took it and the bot's advice at the time, and each seat's net. The writer packs
+# records into a preallocated buffer and writes it out in bulk; the reader maps the
+# file and decodes records on demand, so a log of tens of millions of rounds is
+# scanned without being loaded. Replaying a record deals its cards back through
+# GameState (see RecordedShoe and BlackjackGame.start_replay).
+#
+#   python HandHistory.py record history.bin --rounds 1000000 --seats 7
+#   python HandHistory.py summary history.bin
+#   python HandHistory.py show history.bin 42
+
+import argparse
+import math
+import mmap
+import os
+import struct
+import time
+from typing import NamedTuple
+
+from GameState import MAX_SEATS
+
+
+MAGIC = b'BJHH'
+VERSION = 2 # 2: insurance offered to every seat before play, declining recorded
+HEADER = struct.Struct('<4sHH8x') # Magic, version, record size
+
+MAX_CARDS = 40
+MAX_ACTIONS = 32
+ACTIONS = ['hit', 'stand', 'double', 'split', 'surrender', 'insurance', 'decline']
+NO_ADVICE = 255
+TRUNCATED = 1 # More cards or actions than a record holds; such a round can't be replayed
+
+# Seed (signed, as Shoe accepts any int), shuffle, position, seats, cards, actions, flags, then the fixed-size arrays:
+# card codes, actions (seat << 4 | action), advice per action, advice EV (half float), net per seat
+RECORD = struct.Struct(f'<qIHBBBB{MAX_CARDS}s{MAX_ACTIONS}s{MAX_ACTIONS}s{MAX_ACTIONS}e{MAX_SEATS}f')
+NET_OFFSET = RECORD.size - 4 * MAX_SEATS
+NETS = struct.Struct(f'<{MAX_SEATS}f')
+
+
+class Round(NamedTuple):
+    seed: int
+    shuffle: int
+    position: int # Shoe position at the start of the round
+    num_seats: int
+    cards: bytes # Card codes in dealing order
+    actions: list # (seat, action) in the order taken
+    advice: list # (decision, ev) per action, None where there was no advice
+    nets: list # Net units per seat
+    truncated: bool
+
+
+def decode(fields):
+    seed, shuffle, position, num_seats, num_cards, num_actions, flags, cards, actions, advice = fields[:10]
+    evs = fields[10:10 + MAX_ACTIONS]
+    nets = fields[10 + MAX_ACTIONS:10 + MAX_ACTIONS + num_seats]
+    return Round(seed, shuffle, position, num_seats, cards[:num_cards],
+                 [(byte >> 4, ACTIONS[byte & 15]) for byte in actions[:num_actions]],
+                 [None if byte == NO_ADVICE else (ACTIONS[byte], evs[i]) for i, byte in enumerate(advice[:num_actions])],
+                 list(nets), bool(flags & TRUNCATED))
+
+
+
+# ---WRITING---
+class HandHistoryWriter:
+    """
+    Records rounds as a GameState plays them: set state.history to a writer and it
+    is told of each new round, card, action and settlement; a round already under
+    way is only recorded if begin is called for it. advisor(state) returns the
+    (decision, ev) stored with each action, e.g. GameState.bot_advisor(bot).
+    """
+    def __init__(self, path, advisor=None, buffer_rounds=4096):
+        self.path = path
+        self.advisor = advisor
+        self.file = open(path, 'ab')
+        if self.file.tell() == 0:
+            self.file.write(HEADER.pack(MAGIC, VERSION, RECORD.size))
+        else:
+            # Only append to a log of the same version, or the records would be read back as the wrong rounds
+            with open(path, 'rb') as f:
+                header = f.read(HEADER.size)
+            if len(header) < HEADER.size or HEADER.unpack(header) != (MAGIC, VERSION, RECORD.size):
+                self.file.close()
+                raise ValueError(f"{path} is not a version {VERSION} hand history to append to")
+        self.buffer = bytearray(RECORD.size * buffer_rounds)
+        self.capacity = buffer_rounds
+        self.pending = 0
+        self.written = 0
+        self.recording = False
+        self.flags = 0
+        self.cards = bytearray()
+        self.actions = bytearray()
+        self.advice = bytearray()
+        self.evs = []
+
+    def begin(self, state):
+        shoe = state.deck.shoe
+        self.start = (shoe.seed, shoe.shuffles, shoe.cursor)
+        self.cards.clear()
+        self.actions.clear()
+        self.advice.clear()
+        self.evs.clear()
+        self.flags = 0
+        self.recording = True
+
+    def card(self, card):
+        if len(self.cards) < MAX_CARDS:
+            self.cards.append(card.code)
+        else:
+            self.flags |= TRUNCATED
+
+    def action(self, state, action):
+        if len(self.actions) >= MAX_ACTIONS:
+            self.flags |= TRUNCATED
+            return
+        advice = self.advisor(state) if self.advisor is not None else None
+        if advice is not None and advice[0] in ACTIONS:
+            self.advice.append(ACTIONS.index(advice[0]))
+            self.evs.append(advice[1])
+        else:
+            self.advice.append(NO_ADVICE)
+            self.evs.append(math.nan)
+        self.actions.append(state.active_seat << 4 | ACTIONS.index(action))
+
+    def end(self, state):
+        if not self.recording:
+            return
+        self.recording = False
+        nets = state.seat_nets()
+        RECORD.pack_into(self.buffer, self.pending * RECORD.size,
+                         *self.start, state.num_seats, len(self.cards), len(self.actions), self.flags,
+                         bytes(self.cards), bytes(self.actions), bytes(self.advice),
+                         *self.evs, *[math.nan] * (MAX_ACTIONS - len(self.evs)),
+                         *nets, *[0.0] * (MAX_SEATS - len(nets)))
+        self.pending += 1
+        if self.pending == self.capacity:
+            self.flush()
+
+    def flush(self):
+        self.file.write(memoryview(self.buffer)[:self.pending * RECORD.size])
+        self.file.flush()
+        self.written += self.pending
+        self.pending = 0
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+
+# ---READING---
+class HandHistory:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        size = os.fstat(self.file.fileno()).st_size
+        if size < HEADER.size:
+            self.file.close()
+            raise ValueError(f"{path} is not a hand history")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, record_size = HEADER.unpack_from(self.map)
+        if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+            self.close()
+            raise ValueError(f"{path} is not a version {VERSION} hand history")
+        self.count = (size - HEADER.size) // RECORD.size # A partly written last record is ignored
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self.count
+        if not 0 <= i < self.count:
+            raise IndexError(i)
+        return decode(RECORD.unpack_from(self.map, HEADER.size + i * RECORD.size))
+
+    def __iter__(self):
+        for fields in self.records():
+            yield decode(fields)
+
+    def records(self, chunk=65536):
+        # Raw record tuples, unpacked a chunk of the mapped file at a time
+        view = memoryview(self.map)
+        try:
+            for start in range(0, self.count, chunk):
+                stop = min(start + chunk, self.count)
+                yield from RECORD.iter_unpack(view[HEADER.size + start * RECORD.size:HEADER.size + stop * RECORD.size])
+        finally:
+            view.release()
+
+    def seat_nets(self):
+        # Net units per seat of every round, reading only the nets field of each record
+        unpack = NETS.unpack_from
+        for offset in range(HEADER.size + NET_OFFSET, HEADER.size + self.count * RECORD.size, RECORD.size):
+            yield unpack(self.map, offset)
+
+    def summary(self):
+        # Streams the whole log once: rounds, hands, net and agreement with the recorded advice
+        rounds = hands = followed = advised = 0
+        net = 0.0
+        for fields in self.records():
+            num_seats, num_actions = fields[3], fields[5]
+            actions, advice = fields[8], fields[9]
+            rounds += 1
+            hands += num_seats
+            net += sum(fields[10 + MAX_ACTIONS:10 + MAX_ACTIONS + num_seats])
+            for i in range(num_actions):
+                if advice[i] != NO_ADVICE:
+                    advised += 1
+                    followed += (actions[i] & 15) == advice[i]
+        return {"rounds": rounds, "hands": hands, "net": net, "edge": net / hands if hands else 0.0,
+                "advised_actions": advised, "followed_advice": followed / advised if advised else None}
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+
+
+# ---REPLAY---
+class RecordedShoe:
+    # Stands in for a Shoe: deals a recorded round's cards in their original order
+    def __init__(self, cards):
+        self.cards = bytes(cards)
+        self.cursor = 0
+        self.seed, self.shuffles = 0, 0
+
+    def __len__(self):
+        return len(self.cards) - self.cursor
+
+    def deal(self):
+        code = self.cards[self.cursor]
+        self.cursor += 1
+        return code
+
+    def needs_shuffle(self):
+        return False
+
+    def shuffle(self):
+        self.cursor = 0
+
+    def undealt(self):
+        return self.cards[self.cursor:]
+
+
+
+def seed(text):
+    # Argparse type for --seed: any int a record's signed 64-bit seed field holds
+    value = int(text)
+    if not -1 << 63 <= value < 1 << 63:
+        raise argparse.ArgumentTypeError(f"seed {value} doesn't fit in 64 bits")
+    return value
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record, summarise and inspect hand histories")
+    commands = parser.add_subparsers(dest="command", required=True)
+    record = commands.add_parser("record", help="Play rounds with the bot and record them")
+    record.add_argument("path")
+    record.add_argument("--rounds", type=int, default=100_000)
+    record.add_argument("--seats", type=int, default=1)
+    record.add_argument("--decks", type=int, default=6)
+    record.add_argument("--seed", type=seed, default=None)
+    summary = commands.add_parser("summary", help="Totals over a whole log")
+    summary.add_argument("path")
+    show = commands.add_parser("show", help="Print one recorded round")
+    show.add_argument("path")
+    show.add_argument("index", type=int)
+    args = parser.parse_args()
+
+    if args.command == "record":
+        from BasicStrategyBot import BasicStrategyBot
+        from GameState import GameState, Deck, bot_advisor, play_round
+        from Rules import RuleSet
+
+        rules = RuleSet(num_decks=args.decks)
+        advise = bot_advisor(BasicStrategyBot(rules))
+        state = GameState(rules, Deck(rules.num_decks, 0.75, seed=args.seed), args.seats)
+        start = time.perf_counter()
+        with HandHistoryWriter(args.path, advisor=advise) as writer:
+            state.history = writer
+            writer.begin(state) # The round the state was created with
+            for _ in range(args.rounds):
+                play_round(state, lambda state: advise(state)[0])
+        elapsed = time.perf_counter() - start
+        print(f"Recorded {args.rounds:,} rounds in {elapsed:.2f}s ({args.rounds / elapsed:,.0f} rounds/s)")
+
+    elif args.command == "summary":
+        history = HandHistory(args.path)
+        start = time.perf_counter()
+        summary = history.summary()
+        elapsed = time.perf_counter() - start
+        for name, value in summary.items():
+            print(f"{name:<16} {value:,.4f}" if isinstance(value, float) else f"{name:<16} {value:,}")
+        print(f"Read {len(history):,} records in {elapsed:.2f}s")
+
+    else:
+        from Cards import Card
+        record = HandHistory(args.path)[args.index]
+        print(f"Shoe seed {record.seed}, shuffle {record.shuffle}, position {record.position}, {record.num_seats} seat(s)"
+              + (" (truncated)" if record.truncated else ""))
+        print("Cards:  ", " ".join(str(Card(code)) for code in record.cards))
+        for (seat, action), advice in zip(record.actions, record.advice):
+            advised = f"advised {advice[0]} ({advice[1]:+.3f})" if advice else "no advice"
+            print(f"  Seat {seat + 1}: {action:<10} {advised}")
+        print("Nets:   ", " ".join(f"{net:+g}" for net in record.nets))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+# INSTRUMENTATION
+#
+# Opt-in timers and counters for the game's hot paths. Functions are registered up
+# front but only wrapped while metrics are enabled, so a normal game runs the
+# original functions untouched; an enabled timer costs two perf_counter reads and
+# a few additions per call. Cache hit rates are read from the caches' own counters
+# when a snapshot is taken, never on the hot path.
+
+import functools
+import json
+import time
+from collections import deque
+
+
+FRAME_BUCKETS_MS = [1, 2, 4, 8, 16, 33, 66] # Histogram upper edges, the last bucket is open
+FRAME_WINDOW = 600 # Recent frames kept for percentiles
+
+
+
+class Metrics:
+    def __init__(self):
+        self.enabled = False
+        self.targets = [] # (owner, attribute, name) to wrap while enabled
+        self.originals = {}
+        self.caches = {} # Name -> callable returning (hits, misses)
+        self.reset()
+
+    def reset(self):
+        self.timers = {name: [0, 0.0, 0.0] for _, _, name in self.targets} # Calls, total s, max s
+        self.counters = {}
+        self.frame_histogram = [0] * (len(FRAME_BUCKETS_MS) + 1)
+        self.frame_times = deque(maxlen=FRAME_WINDOW)
+        self.started = time.perf_counter()
+        self.last_dump = self.started
+
+
+    # ---REGISTRATION---
+    def register(self, owner, attribute, name=None):
+        # owner is a class or module; the attribute is replaced by a timing wrapper while enabled
+        name = name or f"{getattr(owner, '__name__', owner)}.{attribute}"
+        self.targets.append((owner, attribute, name))
+        self.timers.setdefault(name, [0, 0.0, 0.0])
+        if self.enabled:
+            self._wrap(owner, attribute, name)
+
+    def register_cache(self, name, stats):
+        self.caches[name] = stats
+
+    def _wrap(self, owner, attribute, name):
+        original = owner.__dict__[attribute] if isinstance(owner, type) else getattr(owner, attribute)
+        timer = self.timers[name]
+        perf_counter = time.perf_counter
+
+        @functools.wraps(original)
+        def timed(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                elapsed = perf_counter() - start
+                timer[0] += 1
+                timer[1] += elapsed
+                if elapsed > timer[2]:
+                    timer[2] = elapsed
+
+        self.originals[(owner, attribute)] = original
+        setattr(owner, attribute, timed)
+
+    def enable(self):
+        if self.enabled:
+            return
+        self.reset()
+        for owner, attribute, name in self.targets:
+            self._wrap(owner, attribute, name)
+        self.enabled = True
+
+    def disable(self):
+        for (owner, attribute), original in self.originals.items():
+            setattr(owner, attribute, original)
+        self.originals.clear()
+        self.enabled = False
+
+
+    # ---RECORDING---
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def frame(self, seconds):
+        ms = seconds * 1000
+        self.frame_times.append(ms)
+        for i, edge in enumerate(FRAME_BUCKETS_MS):
+            if ms < edge:
+                self.frame_histogram[i] += 1
+                return
+        self.frame_histogram[-1] += 1
+
+
+    # ---REPORTING---
+    def snapshot(self):
+        elapsed = time.perf_counter() - self.started
+        frames = sorted(self.frame_times)
+
+        def percentile(p):
+            return frames[min(len(frames) - 1, int(p * len(frames)))] if frames else 0.0
+
+        labels = [f"<{edge}" for edge in FRAME_BUCKETS_MS] + [f">={FRAME_BUCKETS_MS[-1]}"]
+        caches = {}
+        for name, stats in self.caches.items():
+            hits, misses = stats()
+            caches[name] = {"hits": hits, "misses": misses,
+                            "hit_rate": hits / (hits + misses) if hits + misses else None}
+        return {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "elapsed": elapsed,
+            "timers": {name: {"calls": calls, "total_ms": total * 1000, "max_ms": peak * 1000,
+                              "mean_ms": total * 1000 / calls if calls else 0.0,
+                              "per_second": calls / elapsed if elapsed else 0.0}
+                       for name, (calls, total, peak) in self.timers.items()},
+            "counters": dict(self.counters),
+            "frames": {"count": sum(self.frame_histogram), "p50_ms": percentile(0.5),
+                       "p95_ms": percentile(0.95), "max_ms": frames[-1] if frames else 0.0,
+                       "histogram_ms": dict(zip(labels, self.frame_histogram))},
+            "caches": caches,
+        }
+
+    def dump(self, path):
+        # One JSON object per line, so a long session can be tailed or loaded line by line
+        with open(path, 'a') as f:
+            f.write(json.dumps(self.snapshot()) + "\n")
+        self.last_dump = time.perf_counter()
+
+    def maybe_dump(self, path, interval):
+        if self.enabled and time.perf_counter() - self.last_dump >= interval:
+            self.dump(path)
+
+    def summary_lines(self, max_timers=5):
+        # Short text lines for the in-game overlay
+        snapshot = self.snapshot()
+        frames = snapshot["frames"]
+        lines = [f"Frame p50 {frames['p50_ms']:.1f} ms | p95 {frames['p95_ms']:.1f} | max {frames['max_ms']:.1f}",
+                 " ".join(f"{label}:{n}" for label, n in frames["histogram_ms"].items())]
+        timers = sorted(snapshot["timers"].items(), key=lambda item: item[1]["total_ms"], reverse=True)
+        for name, timer in timers[:max_timers]:
+            if timer["calls"]:
+                lines.append(f"{name}: {timer['calls']} x {timer['mean_ms']:.3f} ms (max {timer['max_ms']:.1f})")
+        rates = [f"{name} {cache['hit_rate']:.0%}" for name, cache in snapshot["caches"].items()
+                 if cache["hit_rate"] is not None]
+        if rates:
+            lines.append("Hits: " + " | ".join(rates))
+        if snapshot["counters"]:
+            lines.append(" | ".join(f"{name}: {value}" for name, value in snapshot["counters"].items()))
+        return lines
+
+
+metrics = Metrics()
@@ -0,0 +1,110 @@
+# MULTI-PROCESS MONTE CARLO RUNNER
+#
+# Shards a round count across a process pool. Every chunk of work gets its own
+# RNG stream derived from (seed, shard, chunk), so results do not depend on which
+# worker picks a chunk up or when, and partial SimulationResults are merged in task
+# order as they stream back. All aggregates are integer counts and sums, so the
+# merged result is bit-identical for a given seed, round count and worker count.
+
+import argparse
+import os
+import random
+import time
+from multiprocessing import Pool
+
+from Simulator import simulate, chart_strategy, dealer_strategy, build_table, deviation_tables, SimulationResult
+
+
+CHUNK_ROUNDS = 250_000 # Rounds per task, small enough to stream progress back
+
+
+def chunk_seed(seed, shard, chunk):
+    # String seeds are hashed with SHA-512 by random.Random, giving independent streams
+    return f"{seed}/{shard}/{chunk}"
+
+
+def make_tasks(n_rounds, workers, seed, chunk_rounds=CHUNK_ROUNDS):
+    # Split n_rounds into one shard per worker, then each shard into chunks
+    tasks = []
+    base, extra = divmod(n_rounds, workers)
+    for shard in range(workers):
+        shard_rounds = base + (1 if shard < extra else 0)
+        chunk = 0
+        while shard_rounds > 0:
+            rounds = min(chunk_rounds, shard_rounds)
+            tasks.append((rounds, chunk_seed(seed, shard, chunk)))
+            shard_rounds -= rounds
+            chunk += 1
+    return tasks
+
+
+def _run_chunk(args):
+    rounds, seed, table, num_decks, penetration, count_system, spread, deviations = args
+    return simulate(rounds, table, seed, num_decks, penetration, count_system=count_system, spread=spread,
+                    deviations=deviations)
+
+
+def run(n_rounds, strategy=None, seed=None, workers=None, chunk_rounds=CHUNK_ROUNDS, progress=None,
+        num_decks=1, penetration=0.5, count_system=None, spread=1, deviations=None):
+    """
+    Simulates n_rounds across a process pool and returns the merged SimulationResult.
+    progress, if given, is called with the running merged result after every chunk.
+    num_decks, penetration, count_system, spread and deviations are passed through to simulate.
+    """
+    workers = workers or os.cpu_count() or 1
+    if seed is None:
+        seed = random.randrange(2**32)
+
+    # Build the lookup table once in the parent; workers only receive the bytes
+    if strategy is None:
+        table = chart_strategy()
+    elif isinstance(strategy, (bytes, bytearray)):
+        table = strategy
+    else:
+        table = build_table(strategy)
+
+    tasks = [(rounds, task_seed, table, num_decks, penetration, count_system, spread, deviations)
+             for rounds, task_seed in make_tasks(n_rounds, workers, seed, chunk_rounds)]
+
+    merged = SimulationResult()
+    start = time.perf_counter()
+    with Pool(workers) as pool:
+        # imap yields results in task order, so the merge order is fixed
+        for partial in pool.imap(_run_chunk, tasks):
+            merged.merge(partial)
+            if progress:
+                progress(merged)
+
+    merged.elapsed = time.perf_counter() - start # Wall time rather than summed worker time
+    merged.seed = seed
+    return merged
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-process blackjack simulator")
+    parser.add_argument("rounds", type=int, nargs="?", default=10_000_000)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--decks", type=int, default=1)
+    parser.add_argument("--penetration", type=float, default=0.5)
+    parser.add_argument("--dealer", action="store_true", help="Mimic the dealer instead of basic strategy")
+    parser.add_argument("--count", default=None, help="Keep a count with this tag system, e.g. hi-lo")
+    parser.add_argument("--spread", type=int, default=1, help="Top of the count-based bet ramp, in units")
+    parser.add_argument("--deviations", action="store_true", help="Play the count's strategy deviations")
+    args = parser.parse_args()
+    if not args.count and (args.spread > 1 or args.deviations):
+        parser.error("--spread and --deviations need --count")
+
+    strategy = dealer_strategy if args.dealer else None
+    deviations = deviation_tables(args.count) if args.deviations else None
+    result = run(args.rounds, strategy, args.seed, args.workers,
+                 progress=lambda r: print(f"{r.rounds:,} rounds, EV {r.ev:+.4f}", end="\r"),
+                 num_decks=args.decks, penetration=args.penetration, count_system=args.count, spread=args.spread, deviations=deviations)
+    print()
+    print(result)
+    print(f"Seed: {result.seed}")
+
+
+if __name__ == "__main__":
+    main()
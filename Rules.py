@@ -0,0 +1,66 @@
+# RULE SETS
+#
+# Every table rule the game, the solver and the bot depend on, in one immutable
+# value. The defaults are the original game: a single deck, dealer stands on all
+# 17s, no peek, blackjack paid 1:1. Strategy tables are cached on disk under a
+# digest of the rules that change decisions, so switching rule sets only maps a
+# file that already exists instead of re-solving.
+
+import hashlib
+import itertools
+import os
+from typing import NamedTuple
+
+
+TABLE_DIR = 'strategy_tables'
+TABLE_REVISION = 2 # Part of the digest: bumped when the solver's EVs change, so cached tables are re-solved
+
+
+class RuleSet(NamedTuple):
+    num_decks: int = 1
+    hit_soft_17: bool = False # H17 instead of S17
+    blackjack_payout: float = 1.0 # 1.5 for 3:2, 1.2 for 6:5
+    dealer_peek: bool = False # Dealer checks for blackjack under a ten or ace
+    double_after_split: bool = True
+    max_split_hands: int = 4
+    resplit_aces: bool = False
+    late_surrender: bool = True
+
+    def strategy_key(self):
+        # Only the rules the infinite-deck solver sees; the deck count and payout don't change a decision
+        return (self.hit_soft_17, self.dealer_peek, self.double_after_split,
+                self.max_split_hands, self.resplit_aces, self.late_surrender)
+
+    def digest(self):
+        return hashlib.sha1(repr((TABLE_REVISION,) + self.strategy_key()).encode()).hexdigest()[:16]
+
+    def table_path(self):
+        return os.path.join(TABLE_DIR, f"{self.digest()}.bin")
+
+    def describe(self):
+        payout = {1.0: "1:1", 1.5: "3:2", 1.2: "6:5"}.get(self.blackjack_payout, f"{self.blackjack_payout:g}:1")
+        return (f"{self.num_decks} deck{'s' if self.num_decks > 1 else ''}, {'H17' if self.hit_soft_17 else 'S17'}, "
+                f"BJ {payout}, {'peek' if self.dealer_peek else 'no peek'}, {'DAS' if self.double_after_split else 'NDAS'}, "
+                f"{'LS' if self.late_surrender else 'no surrender'}")
+
+
+DEFAULT_RULES = RuleSet()
+
+
+def common_rule_sets():
+    # Every combination of the rules that change the strategy table
+    for h17, peek, das, surrender in itertools.product((False, True), repeat=4):
+        yield RuleSet(hit_soft_17=h17, dealer_peek=peek, double_after_split=das, late_surrender=surrender)
+
+
+
+def main():
+    # Precompute the table for every common rule set
+    from BasicStrategyBot import build_rules_table
+
+    for rules in common_rule_sets():
+        print(f"{build_rules_table(rules)}  {rules.describe()}")
+
+
+if __name__ == "__main__":
+    main()
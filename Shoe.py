@@ -0,0 +1,74 @@
+# SHOE
+#
+# A multi-deck shoe stored as a flat array of one-byte card codes with a dealing
+# cursor. Dealing reads the code under the cursor and advances it, so nothing is
+# popped or allocated, and the whole shoe is shuffled once when the cut card is
+# reached. Codes are rank * 4 + suit, using the same rank and suit order as the game.
+
+import random
+from array import array
+
+
+# ---CARD CODES---
+SUITS = ['hearts', 'diamonds', 'clubs', 'spades']
+RANKS = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A']
+VALUES = {'2': 2, '3': 3, '4': 4, '5': 5, '6': 6, '7': 7, '8': 8,
+          '9': 9, '10': 10, 'J': 10, 'Q': 10, 'K': 10, 'A': 11}
+DECK_SIZE = len(RANKS) * len(SUITS)
+
+CODE_RANK = [RANKS[code // 4] for code in range(DECK_SIZE)]
+CODE_SUIT = [SUITS[code % 4] for code in range(DECK_SIZE)]
+CODE_VALUE = [VALUES[rank] for rank in CODE_RANK]
+
+
+def encode(suit, rank):
+    return RANKS.index(rank) * 4 + SUITS.index(suit)
+
+
+
+class Shoe:
+    def __init__(self, num_decks=1, penetration=0.5, continuous=False, seed=None):
+        """
+        num_decks: decks in the shoe
+        penetration: fraction of the shoe dealt before the cut card forces a reshuffle
+                     (0.5 of a single deck is the original "fewer than 26 cards" rule)
+        continuous: continuous shuffling machine, the shoe is reshuffled every round
+        seed: seeds the shuffles; a random one is drawn if not given, so any shoe can be dealt again
+        """
+        self.num_decks = num_decks
+        self.penetration = penetration
+        self.continuous = continuous
+        self.seed = seed if seed is not None else random.randrange(1 << 63)
+        self.rng = random.Random(self.seed)
+        self.shuffles = 0 # Shuffles since seeding, the first included
+        self.cards = array('B', range(DECK_SIZE)) * num_decks
+        self.cut = int(len(self.cards) * penetration)
+        self.cursor = 0
+        self.shuffle()
+
+    def __len__(self):
+        return len(self.cards) - self.cursor
+
+    def shuffle(self):
+        self.rng.shuffle(self.cards)
+        self.cursor = 0
+        self.shuffles += 1
+
+    def deal(self):
+        code = self.cards[self.cursor]
+        self.cursor += 1
+        return code
+
+    def needs_shuffle(self):
+        # Checked between rounds, like the cut card
+        return self.continuous or self.cursor > self.cut
+
+    def undealt(self):
+        return self.cards[self.cursor:]
+
+    def counts(self):
+        # Undealt cards per value 2-11, in CompositionAnalyser's order
+        counts = [0] * 10
+        for code in self.undealt():
+            counts[CODE_VALUE[code] - 2] += 1
+        return counts
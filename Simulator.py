@@ -0,0 +1,364 @@
+# HEADLESS BLACKJACK SIMULATOR
+#
+# Plays rounds with the same rules as BlackjackGame (single deck reshuffled when
+# fewer than 26 cards remain, dealer stands on all 17s, player bust loses first)
+# without pygame. Cards are plain ints holding their blackjack value (2-11, ace = 11)
+# so a round is nothing more than a few list reads and integer additions.
+
+import argparse
+import math
+import random
+import time
+
+
+# ---CARD ENCODING---
+RANKS = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A']
+VALUES = {'2': 2, '3': 3, '4': 4, '5': 5, '6': 6, '7': 7, '8': 8, '9': 9, '10': 10, 'J': 10, 'Q': 10, 'K': 10, 'A': 11}
+ACE = 11
+SINGLE_DECK = [VALUES[rank] for rank in RANKS] * 4
+RESHUFFLE_BELOW = 26 # Same threshold as BlackjackGame.reset_round
+
+
+# ---STRATEGY TABLE---
+# A strategy is flattened into a bytearray indexed by (player total, soft, dealer upcard),
+# holding 1 for hit and 0 for stand, so the inner loop never formats a string.
+DEALER_UPCARDS = range(2, 12) # 2-10, 11 = Ace
+TABLE_SIZE = 22 * 2 * 12
+
+def table_index(total, soft, dealer_up):
+    return (total * 2 + soft) * 12 + dealer_up
+
+
+def parse_hand(hand_str):
+    # "Soft 17" -> (17, True)
+    softness, total = hand_str.split()
+    return int(total), softness == 'Soft'
+
+
+def build_table(strategy):
+    """
+    Flattens a strategy into a lookup table. The strategy can be a decision chart
+    (as loaded by BasicStrategyBot) or a callable (total, soft, dealer_up) -> 'hit'/'stand'.
+    """
+    table = bytearray(TABLE_SIZE)
+
+    # Fallback for cells the chart does not cover: hit below 17
+    for total in range(22):
+        for soft in (0, 1):
+            for dealer_up in DEALER_UPCARDS:
+                table[table_index(total, soft, dealer_up)] = 1 if total < 17 else 0
+
+    if callable(strategy):
+        for total in range(4, 22):
+            for soft in (0, 1):
+                for dealer_up in DEALER_UPCARDS:
+                    decision = strategy(total, bool(soft), dealer_up)
+                    table[table_index(total, soft, dealer_up)] = 1 if decision == 'hit' else 0
+    else:
+        for (player_str, dealer_str), decision_array in strategy.items():
+            if player_str.startswith('Pair'):
+                continue # Only hit/stand is simulated
+            total, soft = parse_hand(player_str)
+            dealer_up, _ = parse_hand(dealer_str)
+            # Hit/stand from the EVs: the chart's decision may be a two-card only action like double
+            table[table_index(total, soft, dealer_up)] = 1 if decision_array[1] > decision_array[2] else 0
+
+    return table
+
+
+def chart_strategy():
+    # Imported here so the simulator itself stays free of the bot's dependencies
+    from BasicStrategyBot import BasicStrategyBot
+    bot = BasicStrategyBot()
+    return build_table(bot.decision_chart)
+
+
+def dealer_strategy(total, soft, dealer_up):
+    # Mimic the dealer: hit below 17
+    return 'hit' if total < 17 else 'stand'
+
+
+def deviation_tables(count_system='hi-lo'):
+    # One table per true count bucket, from the count-shifted charts in CardCounter
+    from CardCounter import deviation_charts
+    return [build_table(chart) for chart in deviation_charts(system=count_system)]
+
+
+
+# ---RESULTS---
+class SimulationResult:
+    def __init__(self):
+        self.rounds = 0
+        self.wins = 0
+        self.losses = 0
+        self.pushes = 0
+        self.player_busts = 0
+        self.dealer_busts = 0
+        self.net = 0.0 # Sum of round outcomes in units
+        self.net_squared = 0.0 # Sum of squared round outcomes, for the variance
+        self.wagered = 0 # Units bet, equal to rounds without a bet ramp
+        self.elapsed = 0.0
+
+        # Per-cell aggregates indexed by table_index of the player's two-card hand
+        self.cell_counts = [0] * TABLE_SIZE
+        self.cell_sums = [0] * TABLE_SIZE
+        self.cell_sums_sq = [0] * TABLE_SIZE
+
+    def merge(self, other):
+        self.rounds += other.rounds
+        self.wins += other.wins
+        self.losses += other.losses
+        self.pushes += other.pushes
+        self.player_busts += other.player_busts
+        self.dealer_busts += other.dealer_busts
+        self.net += other.net
+        self.net_squared += other.net_squared
+        self.wagered += other.wagered
+        self.elapsed += other.elapsed
+        for i in range(TABLE_SIZE):
+            self.cell_counts[i] += other.cell_counts[i]
+            self.cell_sums[i] += other.cell_sums[i]
+            self.cell_sums_sq[i] += other.cell_sums_sq[i]
+        return self
+
+    def cell_ev(self, total, soft, dealer_up):
+        # Mean outcome and standard error for one starting cell
+        i = table_index(total, soft, dealer_up)
+        n = self.cell_counts[i]
+        if n < 2:
+            return (self.cell_sums[i] / n if n else 0.0), 0.0
+        mean = self.cell_sums[i] / n
+        variance = (self.cell_sums_sq[i] - n * mean * mean) / (n - 1)
+        return mean, math.sqrt(max(variance, 0.0) / n)
+
+    @property
+    def ev(self):
+        return self.net / self.rounds if self.rounds else 0.0
+
+    @property
+    def edge(self):
+        # Return per unit wagered, the figure a bet ramp is judged by
+        return self.net / self.wagered if self.wagered else 0.0
+
+    @property
+    def variance(self):
+        if self.rounds < 2:
+            return 0.0
+        mean = self.ev
+        return (self.net_squared - self.rounds * mean * mean) / (self.rounds - 1)
+
+    @property
+    def std(self):
+        return math.sqrt(max(self.variance, 0.0))
+
+    @property
+    def stderr(self):
+        return self.std / math.sqrt(self.rounds) if self.rounds else 0.0
+
+    @property
+    def rounds_per_second(self):
+        return self.rounds / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self):
+        if not self.rounds:
+            return "No rounds played"
+        return (f"Rounds: {self.rounds}\n"
+                f"Wins: {self.wins} ({self.wins / self.rounds:.2%}) | "
+                f"Losses: {self.losses} ({self.losses / self.rounds:.2%}) | "
+                f"Pushes: {self.pushes} ({self.pushes / self.rounds:.2%})\n"
+                f"Player busts: {self.player_busts} | Dealer busts: {self.dealer_busts}\n"
+                f"EV per round: {self.ev:+.4f} ± {1.96 * self.stderr:.4f} (95% CI), std {self.std:.4f}\n"
+                + (f"Edge: {self.edge:+.4%} of {self.wagered:,} units wagered\n" if self.wagered != self.rounds else "")
+                + f"Speed: {self.rounds_per_second:,.0f} rounds/sec")
+
+
+
+# ---SIMULATION---
+def simulate(n_rounds, strategy=None, seed=None, num_decks=1, penetration=0.5,
+             count_system=None, spread=1, deviations=None):
+    """
+    Plays n_rounds headless rounds and returns a SimulationResult.
+    strategy defaults to the basic strategy chart; it may also be a decision chart,
+    a callable (total, soft, dealer_up) -> 'hit'/'stand' or a table from build_table.
+    seed can be anything random.Random accepts; string seeds are hashed with SHA-512
+    so they give the same stream on every platform and process.
+    num_decks and penetration describe the shoe as in Shoe; the defaults are the
+    game's single deck reshuffled below 26 cards.
+    count_system (a CardCounter tag system) keeps a running count; with it, spread
+    is the top of the bet ramp in units and deviations a list of tables per true
+    count bucket (see deviation_tables) to play from instead of the fixed strategy.
+    """
+    if count_system is None and (spread > 1 or deviations is not None):
+        raise ValueError("a bet spread or deviations need a count_system to follow")
+    if strategy is None:
+        table = chart_strategy()
+    elif isinstance(strategy, (bytes, bytearray)):
+        table = strategy
+    else:
+        table = build_table(strategy)
+
+    # The shoe is shuffled lazily: each deal swaps a uniformly chosen undealt card
+    # into place (an incremental Fisher-Yates), so a reshuffle is just resetting the
+    # cursor and only the ~30 cards actually dealt per shoe cost a random draw.
+    rnd = random.Random(seed).random
+    shoe = SINGLE_DECK * num_decks
+    size = len(shoe)
+    reshuffle_at = int(size * penetration)
+    pos = 0
+
+    # Counting: tags by card value and the running count, 0 for every card when not counting
+    if count_system is not None:
+        from CardCounter import tag_list, bet_units, count_bucket, TC_MIN
+        tags = tag_list(count_system)
+    else:
+        tags = [0] * (ACE + 1)
+    running = 0
+    bet = 1
+    net = net_squared = wagered = 0
+
+    wins = losses = pushes = player_busts = dealer_busts = 0
+    result = SimulationResult()
+    cell_counts = result.cell_counts
+    cell_sums = result.cell_sums
+    cell_sums_sq = result.cell_sums_sq
+    start = time.perf_counter()
+
+    for _ in range(n_rounds):
+        if pos > reshuffle_at or size - pos < 5: # The deal needs four cards and the count a fifth left over
+            pos = 0
+            running = 0
+        if spread > 1:
+            bet = bet_units(running * 52 / (size - pos), spread)
+        wagered += bet
+
+        # Deal in the same order as the game: player, dealer, player, dealer (hole)
+        for i in range(pos, pos + 4):
+            j = i + int(rnd() * (size - i))
+            shoe[i], shoe[j] = shoe[j], shoe[i]
+        p1, up, p2, hole = shoe[pos:pos + 4]
+        pos += 4
+        running += tags[p1] + tags[up] + tags[p2]
+        if deviations is not None:
+            table = deviations[count_bucket(running * 52 / (size - pos)) - TC_MIN]
+
+        # Player's turn. total counts aces as 11, aces is how many are still counted so
+        total = p1 + p2
+        aces = (p1 == ACE) + (p2 == ACE)
+        if total > 21:
+            total -= 10
+            aces -= 1
+        cell = (total * 2 + (aces > 0)) * 12 + up
+        cell_counts[cell] += 1
+
+        while table[(total * 2 + (aces > 0)) * 12 + up]:
+            if pos == size: # Run dry mid-round, as a deep cut can: shuffle up and carry on, like GameState's Deck
+                pos = 0
+                running = 0
+            j = pos + int(rnd() * (size - pos))
+            card = shoe[j]
+            shoe[j] = shoe[pos]
+            shoe[pos] = card
+            pos += 1
+            running += tags[card]
+            total += card
+            if card == ACE:
+                aces += 1
+            while total > 21 and aces:
+                total -= 10
+                aces -= 1
+            if total > 21:
+                break
+
+        running += tags[hole] # Turned over either way
+        if total > 21:
+            player_busts += 1
+            losses += 1
+            net -= bet
+            net_squared += bet * bet
+            cell_sums[cell] -= 1
+            cell_sums_sq[cell] += 1
+            continue
+
+        # Dealer's turn, stands on all 17s
+        dealer_total = up + hole
+        dealer_aces = (up == ACE) + (hole == ACE)
+        if dealer_total > 21:
+            dealer_total -= 10
+            dealer_aces -= 1
+
+        while dealer_total < 17:
+            if pos == size:
+                pos = 0
+                running = 0
+            j = pos + int(rnd() * (size - pos))
+            card = shoe[j]
+            shoe[j] = shoe[pos]
+            shoe[pos] = card
+            pos += 1
+            running += tags[card]
+            dealer_total += card
+            if card == ACE:
+                dealer_aces += 1
+            while dealer_total > 21 and dealer_aces:
+                dealer_total -= 10
+                dealer_aces -= 1
+
+        if dealer_total > 21:
+            dealer_busts += 1
+            wins += 1
+            net += bet
+            net_squared += bet * bet
+            cell_sums[cell] += 1
+            cell_sums_sq[cell] += 1
+        elif total > dealer_total:
+            wins += 1
+            net += bet
+            net_squared += bet * bet
+            cell_sums[cell] += 1
+            cell_sums_sq[cell] += 1
+        elif total < dealer_total:
+            losses += 1
+            net -= bet
+            net_squared += bet * bet
+            cell_sums[cell] -= 1
+            cell_sums_sq[cell] += 1
+        else:
+            pushes += 1
+
+    result.elapsed = time.perf_counter() - start
+    result.rounds = n_rounds
+    result.wins = wins
+    result.losses = losses
+    result.pushes = pushes
+    result.player_busts = player_busts
+    result.dealer_busts = dealer_busts
+    # Outcomes are whole bets, so the sums stay exact integers
+    result.net = float(net)
+    result.net_squared = float(net_squared)
+    result.wagered = wagered
+    return result
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless blackjack simulator")
+    parser.add_argument("rounds", type=int, nargs="?", default=1_000_000)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--decks", type=int, default=1)
+    parser.add_argument("--penetration", type=float, default=0.5)
+    parser.add_argument("--dealer", action="store_true", help="Mimic the dealer instead of basic strategy")
+    parser.add_argument("--count", default=None, help="Keep a count with this tag system, e.g. hi-lo")
+    parser.add_argument("--spread", type=int, default=1, help="Top of the count-based bet ramp, in units")
+    parser.add_argument("--deviations", action="store_true", help="Play the count's strategy deviations")
+    args = parser.parse_args()
+    if not args.count and (args.spread > 1 or args.deviations):
+        parser.error("--spread and --deviations need --count")
+
+    strategy = dealer_strategy if args.dealer else None
+    deviations = deviation_tables(args.count) if args.deviations else None
+    print(simulate(args.rounds, strategy, args.seed, args.decks, args.penetration,
+                   args.count, args.spread, deviations))
+
+
+if __name__ == "__main__":
+    main()
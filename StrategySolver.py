@@ -0,0 +1,240 @@
+# STRATEGY SOLVER
+#
+# Bottom-up dynamic programming over integer hand states. A state is a
+# (total, soft) pair flattened to total * 2 + soft; drawing a card always raises
+# the hand's hard count (aces as 1), so visiting states from the highest hard
+# count down guarantees every successor is solved before the state that needs it.
+# The dealer's final-total distribution (a DealerTable shared per rule set) and the
+# player's hit/stand/double EVs are each filled in a single pass into flat arrays,
+# and split EVs are built from those tables afterwards, so a query is one array
+# read. Table rules come from a RuleSet.
+
+from array import array
+
+from Rules import DEFAULT_RULES
+
+
+# ---CARDS---
+CARD_VALUES = [2, 3, 4, 5, 6, 7, 8, 9, 10, 11] # 10 covers 10/J/Q/K, 11 is the ace
+INFINITE_DECK = [1/13] * 8 + [4/13, 1/13] # Probability of each card value
+UPCARDS = CARD_VALUES
+
+
+# ---STATES---
+NUM_STATES = 22 * 2
+BUST = -1
+
+def state_index(total, soft):
+    return total * 2 + soft
+
+
+def add_card(total, soft, value):
+    # Same semantics as Blackjack.Hand.score/soft: at most one ace counts as 11
+    if value == 11:
+        if soft:
+            total += 1
+        else:
+            total += 11
+            soft = True
+    else:
+        total += value
+    if total > 21 and soft:
+        total -= 10
+        soft = False
+    return total, soft
+
+
+def _solve_order():
+    # Every reachable state, highest hard count first
+    states = [(total, False) for total in range(2, 22)] + [(total, True) for total in range(11, 22)]
+    return sorted(states, key=lambda state: state[0] - 10 * state[1], reverse=True)
+
+SOLVE_ORDER = _solve_order()
+
+
+def _transitions():
+    # NEXT[state * 10 + card] = successor state index, or BUST
+    table = array('b', [BUST]) * (NUM_STATES * len(CARD_VALUES))
+    for total, soft in SOLVE_ORDER:
+        for c, value in enumerate(CARD_VALUES):
+            new_total, new_soft = add_card(total, soft, value)
+            if new_total <= 21:
+                table[state_index(total, soft) * 10 + c] = state_index(new_total, new_soft)
+    return table
+
+NEXT = _transitions()
+
+
+# ---DEALER OUTCOMES---
+DEALER_OUTCOMES = [17, 18, 19, 20, 21, "bust"]
+DEALER_BUST = 5
+
+
+# ---RULES---
+SURRENDER_EV = -0.5
+
+ACTIONS = ['hit', 'stand', 'double', 'split', 'surrender']
+
+
+
+def _chart_order(item):
+    # Hard, then soft, then pairs; by total then upcard, matching the original chart layout
+    (player_str, dealer_str), _ = item
+    kind, total = player_str.split()
+    return ['Hard', 'Soft', 'Pair'].index(kind), int(total), int(dealer_str.split()[1])
+
+
+
+class StrategySolver:
+    def __init__(self, probabilities=INFINITE_DECK, rules=DEFAULT_RULES):
+        self.probabilities = list(probabilities)
+        self.rules = rules
+        # stand/hit/double EVs [state * 12 + upcard], split EVs [pair card value * 12 + upcard];
+        # the dealer's distributions come from the shared DealerTable for these probabilities
+        self.stand_evs = array('d', [0.0]) * (NUM_STATES * 12)
+        self.hit_evs = array('d', [0.0]) * (NUM_STATES * 12)
+        self.double_evs = array('d', [0.0]) * (NUM_STATES * 12)
+        self.split_evs = array('d', [0.0]) * (12 * 12)
+        self.solve()
+
+    def solve(self):
+        # Every action for every state in one pass: splits reuse the hit/stand/double tables
+        self._solve_dealer()
+        for up in UPCARDS:
+            self._solve_player(up)
+            self._solve_splits(up)
+
+    def _solve_dealer(self):
+        from DealerProbabilities import dealer_table # Imported here: it builds on this module's state tables
+        self.dealer = dealer_table(self.rules, self.probabilities)
+        self.dealer_dist = self.dealer.states
+        self.upcard_dist = self.dealer.stand
+
+    def _solve_player(self, up):
+        probabilities = self.probabilities
+        stand_evs = self.stand_evs
+        hit_evs = self.hit_evs
+        for total, soft in SOLVE_ORDER:
+            s = state_index(total, soft)
+            # Without a peek this charges a dealer natural, so hits, doubles and splits lose their whole stake to one
+            stand_evs[s * 12 + up] = self.dealer.stand_ev(total, up)
+            ev = 0.0
+            for c, p in enumerate(probabilities):
+                n = NEXT[s * 10 + c]
+                if n == BUST:
+                    ev -= p
+                else:
+                    ev += p * max(hit_evs[n * 12 + up], stand_evs[n * 12 + up])
+            hit_evs[s * 12 + up] = ev
+
+            # Double: one card for twice the bet
+            ev = 0.0
+            for c, p in enumerate(probabilities):
+                n = NEXT[s * 10 + c]
+                ev += -p if n == BUST else p * stand_evs[n * 12 + up]
+            self.double_evs[s * 12 + up] = 2 * ev
+
+    def _solve_splits(self, up):
+        for value in CARD_VALUES:
+            memo = {}
+            self.split_evs[value * 12 + up] = 2 * self._split_hand_ev(value, up, self.rules.max_split_hands - 2, memo)
+
+    def _split_hand_ev(self, value, up, splits_left, memo):
+        """
+        EV of one hand started from a single split card. Resplits are evaluated per
+        branch (each hand keeps its own allowance), the usual infinite-deck approximation.
+        """
+        if splits_left in memo:
+            return memo[splits_left]
+
+        rules = self.rules
+        aces = value == 11
+        start = state_index(value, aces)
+        ev = 0.0
+        for c, p in enumerate(self.probabilities):
+            i = NEXT[start * 10 + c] * 12 + up
+            if aces:
+                best = self.stand_evs[i] # Split aces get one card each
+            else:
+                best = max(self.hit_evs[i], self.stand_evs[i])
+                if rules.double_after_split:
+                    best = max(best, self.double_evs[i])
+            if CARD_VALUES[c] == value and splits_left > 0 and (rules.resplit_aces or not aces):
+                best = max(best, 2 * self._split_hand_ev(value, up, splits_left - 1, memo))
+            ev += p * best
+        memo[splits_left] = ev
+        return ev
+
+    @staticmethod
+    def dealer_state(up):
+        # A lone ace is a soft 11
+        return state_index(up, up == 11)
+
+
+    # ---QUERIES---
+    def dealer_outcomes(self, total, soft):
+        """
+        Final-total distribution for a dealer hand, in the same shape as
+        BasicStrategyBot.dealer_outcomes: {17: p, ..., 21: p, "bust": p}.
+        """
+        return self.dealer.outcomes(total, soft)
+
+    def stand_ev(self, total, soft, up):
+        return self.stand_evs[state_index(total, soft) * 12 + up]
+
+    def hit_ev(self, total, soft, up):
+        return self.hit_evs[state_index(total, soft) * 12 + up]
+
+    def double_ev(self, total, soft, up):
+        return self.double_evs[state_index(total, soft) * 12 + up]
+
+    def split_ev(self, value, up):
+        return self.split_evs[value * 12 + up]
+
+    def analyse(self, total, soft, up):
+        if total > 21:
+            return "bust", -1.0, -1.0
+        i = state_index(total, soft) * 12 + up
+        hit_ev, stand_ev = self.hit_evs[i], self.stand_evs[i]
+        return ('hit' if hit_ev > stand_ev else 'stand'), hit_ev, stand_ev
+
+    def analyse_all(self, total, soft, up, pair_value=None, can_double=True, can_surrender=True):
+        """
+        EVs of every allowed action, as (best action, {action: ev}). pair_value is the
+        card value of a splittable pair; doubling and surrender are for first decisions.
+        """
+        i = state_index(total, soft) * 12 + up
+        evs = {'hit': self.hit_evs[i], 'stand': self.stand_evs[i]}
+        if can_double:
+            evs['double'] = self.double_evs[i]
+        if pair_value is not None:
+            evs['split'] = self.split_ev(pair_value, up)
+        if can_surrender and self.rules.late_surrender:
+            evs['surrender'] = SURRENDER_EV
+        return max(evs, key=evs.get), evs
+
+    def insurance_ev(self):
+        # Per unit of insurance: pays 2:1 when the hole card is a ten
+        ten = self.probabilities[CARD_VALUES.index(10)]
+        return 2 * ten - (1 - ten)
+
+    def chart(self):
+        """
+        Decision chart keyed like basic_strategy_chart.json, e.g. ('Hard 11', 'Hard 6') or
+        ('Pair 8', 'Hard 10') -> [decision, hit_ev, stand_ev, double_ev, split_ev, surrender_ev].
+        The decision is for a two-card hand; split_ev is None except for pairs.
+        """
+        chart = {}
+        for up in UPCARDS:
+            dealer_str = f"{'Soft' if up == 11 else 'Hard'} {up}"
+            for soft, totals in ((False, range(4, 22)), (True, range(12, 22))):
+                for total in totals:
+                    decision, evs = self.analyse_all(total, soft, up)
+                    chart[(f"{'Soft' if soft else 'Hard'} {total}", dealer_str)] = [
+                        decision, evs['hit'], evs['stand'], evs['double'], None, evs.get('surrender')]
+            for value in CARD_VALUES:
+                total, soft = (12, True) if value == 11 else (2 * value, False)
+                decision, evs = self.analyse_all(total, soft, up, pair_value=value)
+                chart[(f"Pair {value}", dealer_str)] = [
+                    decision, evs['hit'], evs['stand'], evs['double'], evs['split'], evs.get('surrender')]
+        return dict(sorted(chart.items(), key=_chart_order))
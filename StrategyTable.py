@@ -0,0 +1,183 @@
+# BINARY STRATEGY TABLE
+#
+# A compact fixed-layout version of basic_strategy_chart.json. Cells are indexed by
+# integers (rule set, player total, hand kind, dealer upcard), where the kind is
+# hard, soft or pair (for pairs the "total" is the pair's card value), and the file
+# is memory-mapped on load so the arrays are read in place: no parsing, no key
+# strings, no eval.
+#
+# Layout (little-endian):
+#   header     magic b"BJST", version u32, rule sets u32, cells per rule set u32
+#   decisions  u8[rule sets * cells]     two-card decision, index into DECISIONS
+#   EVs        f64[rule sets * cells] for each action in EV_ACTIONS, in that order
+
+import ast
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+
+
+MAGIC = b"BJST"
+VERSION = 2
+HEADER = struct.Struct("<4sIII")
+HARD, SOFT, PAIR = 0, 1, 2
+KINDS = ['Hard', 'Soft', 'Pair']
+CELLS = 22 * 3 * 12 # total 0-21, kind, upcard 0-11
+DECISIONS = [None, 'hit', 'stand', 'double', 'split', 'surrender']
+EV_ACTIONS = ['hit', 'stand', 'double', 'split', 'surrender'] # Same order as the chart's EV columns
+NO_EV = float('nan') # Action not available for this cell
+
+JSON_CHART = 'basic_strategy_chart.json'
+BINARY_CHART = 'basic_strategy_chart.bin'
+
+
+def cell_index(total, kind, dealer_up, rule_set=0):
+    return ((rule_set * 22 + total) * 3 + kind) * 12 + dealer_up
+
+
+def parse_hand(hand_str):
+    # "Soft 17" -> (17, SOFT), "Pair 8" -> (8, PAIR)
+    kind, total = hand_str.split()
+    return int(total), KINDS.index(kind)
+
+
+def write_table(path, charts):
+    """
+    Writes one decision chart per rule set. Each chart maps ('Hard 12', 'Hard 10')
+    style keys to [decision, hit_ev, stand_ev, double_ev, split_ev, surrender_ev],
+    as produced by create_json; missing or None EVs are stored as NaN.
+    """
+    decisions = array('B', [0]) * (CELLS * len(charts))
+    evs = [array('d', [NO_EV]) * (CELLS * len(charts)) for _ in EV_ACTIONS]
+
+    for rule_set, chart in enumerate(charts):
+        for (player_str, dealer_str), (decision, *action_evs) in chart.items():
+            total, kind = parse_hand(player_str)
+            dealer_up, _ = parse_hand(dealer_str)
+            i = cell_index(total, kind, dealer_up, rule_set)
+            decisions[i] = DECISIONS.index(decision)
+            for column, ev in zip(evs, action_evs):
+                if ev is not None:
+                    column[i] = ev
+
+    # Written beside the target and renamed over it, so a reader never maps a half-written table
+    fd, temp_path = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(path) or '.')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, len(charts), CELLS))
+            f.write(decisions.tobytes())
+            for column in evs:
+                if sys.byteorder != 'little':
+                    column.byteswap()
+                f.write(column.tobytes())
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def table_size(rule_sets):
+    # Bytes in a table file: the header, one decision byte and an f64 per EV action for every cell
+    return HEADER.size + rule_sets * CELLS * (1 + 8 * len(EV_ACTIONS))
+
+
+def load_json_chart(path=JSON_CHART):
+    # Keys are stored as tuple reprs, e.g. "('Hard 4', 'Hard 2')"; literal_eval only accepts literals
+    with open(path, 'r') as f:
+        return {ast.literal_eval(key): value for key, value in json.load(f).items()}
+
+
+def convert_json(json_path=JSON_CHART, out_path=BINARY_CHART):
+    write_table(out_path, [load_json_chart(json_path)])
+
+
+
+class StrategyTable:
+    def __init__(self, path=BINARY_CHART):
+        with open(path, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        # Truncated or partly written files are rejected here, as ValueError like any other bad table
+        try:
+            magic, version, self.rule_sets, cells = HEADER.unpack_from(self.mm)
+        except struct.error:
+            self.mm.close()
+            raise ValueError(f"{path} is too short to be a strategy table")
+        if magic != MAGIC or version != VERSION or cells != CELLS:
+            self.mm.close()
+            raise ValueError(f"{path} is not a version {VERSION} strategy table")
+        size = len(self.mm)
+        if size != table_size(self.rule_sets):
+            self.mm.close()
+            raise ValueError(f"{path} is {size} bytes, not the {table_size(self.rule_sets)} its header describes")
+        if sys.byteorder != 'little':
+            self.mm.close()
+            raise ValueError("Strategy tables can only be mapped on little-endian machines")
+
+        # Zero-copy views straight onto the mapped file
+        n = self.rule_sets * CELLS
+        view = memoryview(self.mm)
+        start = HEADER.size
+        self.decisions = view[start:start + n]
+        start += n
+        self.evs = {}
+        for action in EV_ACTIONS:
+            self.evs[action] = view[start:start + 8 * n].cast('d')
+            start += 8 * n
+        self.hit_evs = self.evs['hit']
+        self.stand_evs = self.evs['stand']
+
+    def lookup(self, total, soft, dealer_up, rule_set=0):
+        """
+        Returns (decision, hit_ev, stand_ev) like BasicStrategyBot.analyse: hit or
+        stand, for hands past their first decision. decision is None off the chart.
+        """
+        if total > 21:
+            return "bust", -1.0, -1.0
+        i = cell_index(total, SOFT if soft else HARD, dealer_up, rule_set)
+        if not self.decisions[i]:
+            return None, 0.0, 0.0
+        hit_ev, stand_ev = self.hit_evs[i], self.stand_evs[i]
+        return ('hit' if hit_ev > stand_ev else 'stand'), hit_ev, stand_ev
+
+    def lookup_all(self, total, kind, dealer_up, rule_set=0):
+        # Two-card decision and every available action's EV, as (decision, {action: ev})
+        i = cell_index(total, kind, dealer_up, rule_set)
+        evs = {action: column[i] for action, column in self.evs.items() if column[i] == column[i]} # Skip NaN
+        return DECISIONS[self.decisions[i]], evs
+
+    def chart(self, rule_set=0):
+        # Rebuild the JSON-style decision chart, for display and the simulators
+        chart = {}
+        for total in range(22):
+            for kind in (HARD, SOFT, PAIR):
+                for dealer_up in range(12):
+                    decision, evs = self.lookup_all(total, kind, dealer_up, rule_set)
+                    if decision is None:
+                        continue
+                    player_str = f"{KINDS[kind]} {total}"
+                    dealer_str = f"{'Soft' if dealer_up == 11 else 'Hard'} {dealer_up}"
+                    chart[(player_str, dealer_str)] = [decision] + [evs.get(action) for action in EV_ACTIONS]
+        return chart
+
+    def close(self):
+        self.decisions.release()
+        for column in self.evs.values():
+            column.release()
+        self.mm.close()
+
+
+
+def main():
+    json_path = sys.argv[1] if len(sys.argv) > 1 else JSON_CHART
+    out_path = sys.argv[2] if len(sys.argv) > 2 else BINARY_CHART
+    convert_json(json_path, out_path)
+    print(f"Wrote {out_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+# VECTORISED BLACKJACK SIMULATOR
+#
+# Plays thousands of independent shoes in lockstep with NumPy. Every shoe is a row
+# of a 2-D card array with its own cursor; each round deals to all rows at once and
+# the player/dealer turns loop until every row has finished, masking rows that
+# have already stood or bust. Decisions come from the BasicStrategyBot chart
+# flattened into a (total, soft, dealer upcard) lookup array.
+
+import argparse
+import time
+
+import numpy as np
+
+from Simulator import SINGLE_DECK, RESHUFFLE_BELOW, ACE, chart_strategy, build_table, parse_hand
+
+
+HIT, STAND = 0, 1
+ACTIONS = ('hit', 'stand')
+
+
+def strategy_array(strategy=None):
+    """
+    Returns a bool array of shape (22, 2, 12) where [total, soft, dealer_up] is True to hit.
+    """
+    if strategy is None:
+        table = chart_strategy()
+    elif isinstance(strategy, (bytes, bytearray)):
+        table = strategy
+    else:
+        table = build_table(strategy)
+    return np.frombuffer(bytes(table), dtype=np.uint8).reshape(22, 2, 12).astype(bool)
+
+
+
+# ---RESULTS---
+class BatchResult:
+    """
+    Per-cell aggregates, indexed [first action, player total, soft, dealer upcard]
+    where the cell is the player's two-card hand.
+    """
+    def __init__(self):
+        shape = (2, 22, 2, 12)
+        self.counts = np.zeros(shape, dtype=np.int64)
+        self.sums = np.zeros(shape, dtype=np.int64)
+        self.sums_sq = np.zeros(shape, dtype=np.int64)
+        self.elapsed = 0.0
+
+    def add(self, action, total, soft, dealer_up, outcome):
+        flat = np.ravel_multi_index((action, total, soft, dealer_up), self.counts.shape)
+        size = self.counts.size
+        self.counts += np.bincount(flat, minlength=size).reshape(self.counts.shape)
+        self.sums += np.bincount(flat, weights=outcome, minlength=size).astype(np.int64).reshape(self.counts.shape)
+        self.sums_sq += np.bincount(flat, weights=outcome * outcome, minlength=size).astype(np.int64).reshape(self.counts.shape)
+
+    def merge(self, other):
+        self.counts += other.counts
+        self.sums += other.sums
+        self.sums_sq += other.sums_sq
+        self.elapsed += other.elapsed
+        return self
+
+    @property
+    def rounds(self):
+        return int(self.counts.sum())
+
+    @property
+    def ev(self):
+        return float(self.sums.sum()) / self.rounds if self.rounds else 0.0
+
+    def cell_ev(self):
+        # Mean outcome and its standard error per cell (NaN where a cell was never dealt)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            n = self.counts.astype(float)
+            mean = self.sums / n
+            variance = (self.sums_sq - n * mean * mean) / (n - 1)
+            stderr = np.sqrt(np.maximum(variance, 0.0) / n)
+        return mean, stderr
+
+
+
+# ---SIMULATION---
+def simulate_shoes(n_shoes, rounds_per_shoe, strategy=None, seed=None, randomise_first_action=False, result=None):
+    """
+    Plays rounds_per_shoe rounds on each of n_shoes independent shoes.
+    With randomise_first_action the first decision of every hand is a coin flip
+    between hit and stand (then the strategy takes over), which gives unbiased
+    hit and stand EV samples for every chart cell.
+    """
+    table = strategy if isinstance(strategy, np.ndarray) else strategy_array(strategy)
+    rng = np.random.default_rng(seed)
+    result = result if result is not None else BatchResult()
+
+    deck = np.array(SINGLE_DECK, dtype=np.int8)
+    shoes = rng.permuted(np.tile(deck, (n_shoes, 1)), axis=1)
+    cursor = np.zeros(n_shoes, dtype=np.int64)
+    rows = np.arange(n_shoes)
+    reshuffle_at = deck.size - RESHUFFLE_BELOW
+
+    def deal(idx):
+        cards = shoes[idx, cursor[idx]].astype(np.int64)
+        cursor[idx] += 1
+        return cards
+
+    def add_cards(hard, aces, cards, idx=rows):
+        # Hands are tracked as a hard total (aces as 1) plus an ace flag
+        hard[idx] += np.where(cards == ACE, 1, cards)
+        aces[idx] |= cards == ACE
+
+    def best_total(hard, aces):
+        soft = aces & (hard + 10 <= 21)
+        return np.where(soft, hard + 10, hard), soft
+
+    start = time.perf_counter()
+    for _ in range(rounds_per_shoe):
+        # Reshuffle the shoes that are running low
+        low = cursor > reshuffle_at
+        if low.any():
+            shoes[low] = rng.permuted(shoes[low], axis=1)
+            cursor[low] = 0
+
+        player_hard = np.zeros(n_shoes, dtype=np.int64)
+        player_aces = np.zeros(n_shoes, dtype=bool)
+        dealer_hard = np.zeros(n_shoes, dtype=np.int64)
+        dealer_aces = np.zeros(n_shoes, dtype=bool)
+
+        # Player, dealer, player, dealer (hole)
+        add_cards(player_hard, player_aces, deal(rows))
+        up = deal(rows)
+        add_cards(dealer_hard, dealer_aces, up)
+        add_cards(player_hard, player_aces, deal(rows))
+        add_cards(dealer_hard, dealer_aces, deal(rows))
+
+        first_total, first_soft = best_total(player_hard, player_aces)
+        if randomise_first_action:
+            forced_hit = rng.random(n_shoes) < 0.5
+        else:
+            forced_hit = table[first_total, first_soft.astype(np.int64), up]
+        first_action = np.where(forced_hit, HIT, STAND)
+
+        # Player's turn, in lockstep over every shoe still hitting
+        active = forced_hit.copy()
+        while active.any():
+            idx = rows[active]
+            add_cards(player_hard, player_aces, deal(idx), idx)
+            total, soft = best_total(player_hard, player_aces)
+            active[idx] = (total[idx] <= 21) & table[np.minimum(total[idx], 21), soft[idx].astype(np.int64), up[idx]]
+
+        player_total, _ = best_total(player_hard, player_aces)
+        player_bust = player_total > 21
+
+        # Dealer's turn, stands on all 17s, skipped where the player has bust
+        dealer_total, _ = best_total(dealer_hard, dealer_aces)
+        active = ~player_bust & (dealer_total < 17)
+        while active.any():
+            idx = rows[active]
+            add_cards(dealer_hard, dealer_aces, deal(idx), idx)
+            dealer_total, _ = best_total(dealer_hard, dealer_aces)
+            active &= dealer_total < 17
+
+        outcome = np.where(player_bust, -1,
+                  np.where(dealer_total > 21, 1,
+                  np.sign(player_total - dealer_total)))
+        result.add(first_action, first_total, first_soft.astype(np.int64), up, outcome)
+
+    result.elapsed += time.perf_counter() - start
+    return result
+
+
+
+# ---CHART VALIDATION---
+def validate_chart(n_shoes=10000, rounds_per_shoe=100, seed=None):
+    """
+    Compares the chart's hit/stand EVs with empirical EVs from randomised first actions.
+    Returns a list of (player_hand, dealer_hand, chart_hit, sim_hit, hit_se, chart_stand, sim_stand, stand_se).
+    Note the chart assumes an infinite deck while the simulation deals from a single
+    deck, so small composition effects are expected on top of sampling noise.
+    A stand's outcome spread is known exactly, so its standard error comes from the
+    dealer table's variance rather than the sample's.
+    """
+    from BasicStrategyBot import BasicStrategyBot
+    from DealerProbabilities import dealer_table
+    bot = BasicStrategyBot()
+    dealer = dealer_table(bot.rules)
+    table = strategy_array(build_table(bot.decision_chart))
+    result = simulate_shoes(n_shoes, rounds_per_shoe, table, seed, randomise_first_action=True)
+    mean, stderr = result.cell_ev()
+
+    rows = []
+    for (player_str, dealer_str), (decision, hit_ev, stand_ev, *_) in bot.decision_chart.items():
+        if player_str.startswith('Pair'):
+            continue
+        total, soft = parse_hand(player_str)
+        dealer_up, _ = parse_hand(dealer_str)
+        cell = (total, int(soft), dealer_up)
+        _, stand_variance = dealer.stand_moments(total, dealer_up)
+        stand_se = np.sqrt(stand_variance / result.counts[(STAND,) + cell]) if result.counts[(STAND,) + cell] else np.nan
+        rows.append((player_str, dealer_str,
+                     hit_ev, mean[(HIT,) + cell], stderr[(HIT,) + cell],
+                     stand_ev, mean[(STAND,) + cell], stand_se))
+    return rows, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vectorised blackjack simulator")
+    parser.add_argument("--shoes", type=int, default=10000)
+    parser.add_argument("--rounds", type=int, default=100, help="Rounds per shoe")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--validate", action="store_true", help="Compare the chart EVs with simulated EVs")
+    args = parser.parse_args()
+
+    if args.validate:
+        rows, result = validate_chart(args.shoes, args.rounds, args.seed)
+        print(f"{'Player':>8} {'Dealer':>8} | {'chart hit':>9} {'sim hit':>14} | {'chart stand':>11} {'sim stand':>14}")
+        for player_str, dealer_str, chart_hit, sim_hit, hit_se, chart_stand, sim_stand, stand_se in rows:
+            print(f"{player_str:>8} {dealer_str:>8} | {chart_hit:+9.3f} {sim_hit:+7.3f} ±{1.96 * hit_se:.3f} | "
+                  f"{chart_stand:+11.3f} {sim_stand:+7.3f} ±{1.96 * stand_se:.3f}")
+    else:
+        result = simulate_shoes(args.shoes, args.rounds, seed=args.seed)
+
+    print(f"\nRounds: {result.rounds} | EV per round: {result.ev:+.4f} | "
+          f"Speed: {result.rounds / result.elapsed:,.0f} rounds/sec")
+
+
+if __name__ == "__main__":
+    main()
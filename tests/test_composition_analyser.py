@@ -0,0 +1,19 @@
+# Composition-dependent stand EVs against the exact finite-shoe dealer table
+
+import pytest
+
+from CompositionAnalyser import CompositionAnalyser, pack
+from DealerProbabilities import ShoeDealerTable
+from Rules import RuleSet
+
+
+@pytest.mark.parametrize("peek", [False, True])
+def test_stand_ev_matches_shoe_table(peek):
+    rules = RuleSet(num_decks=2, dealer_peek=peek)
+    counts = [8] * 8 + [32, 8]
+    counts[8] -= 5 # Some tens gone
+    analyser = CompositionAnalyser(rules=rules)
+    table = ShoeDealerTable(counts, rules)
+    for up in range(2, 12):
+        for total in (16, 17, 19, 21):
+            assert analyser.stand_ev(pack(counts), total, up) == pytest.approx(table.stand_ev(total, up), abs=1e-12)
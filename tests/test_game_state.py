@@ -0,0 +1,222 @@
+# Settlement and round flow of GameState, on hands built card by card
+
+import pytest
+
+from Cards import Card, Hand
+from CardCounter import CardCounter
+from CompositionAnalyser import CompositionAnalyser, pack
+from GameState import GameState, Deck, SETTLE
+from HandHistory import RecordedShoe
+from Shoe import encode
+from Rules import RuleSet
+from StrategySolver import StrategySolver, CARD_VALUES, INFINITE_DECK
+
+
+def hand(*ranks):
+    h = Hand()
+    for rank in ranks:
+        h.add_card(Card.from_rank('spades', rank))
+    return h
+
+
+def settled(player, dealer, rules=RuleSet(blackjack_payout=1.5)):
+    # A one-seat table settled with these hands, player being one hand or a seat's list of hands
+    state = GameState(rules)
+    state.seats = [player if isinstance(player, list) else [player]]
+    state.dealer_hand = dealer
+    state.phase = SETTLE
+    return state
+
+
+def rank(value):
+    return {10: 'K', 11: 'A'}.get(value, str(value))
+
+
+def rigged(ranks, rules=RuleSet(), num_seats=1):
+    # A table dealing these ranks in order: the seats and dealer in turn, then any draws
+    deck = Deck(rules.num_decks)
+    deck.shoe = RecordedShoe([encode('hearts', rank) for rank in ranks])
+    return GameState(rules, deck, num_seats)
+
+
+def outcome(state):
+    hands = state.seats[0]
+    return state.hand_result(hands[0], hands), state.seat_nets()[0]
+
+
+# ---NATURALS---
+@pytest.mark.parametrize("player, dealer, result, net", [
+    (('A', 'K'), ('7', '4', '10'), "Blackjack!", 1.5), # Against a three-card 21
+    (('A', 'K'), ('A', 'Q'), "Push!", 0),
+    (('A', 'K'), ('10', '9'), "Blackjack!", 1.5),
+    (('7', '4', '10'), ('A', 'Q'), "Dealer Wins!", -1), # No peek: a three-card 21 loses to a natural
+    (('10', '9'), ('A', 'Q'), "Dealer Wins!", -1),
+    (('7', '4', '10'), ('7', '4', '10'), "Push!", 0),
+    (('10', '6', '9'), ('A', 'Q'), "Player Busts!", -1),
+])
+def test_naturals(player, dealer, result, net):
+    state = settled(hand(*player), hand(*dealer))
+    assert outcome(state) == (result, net)
+    assert state.hand_net(state.seats[0][0], state.seats[0]) == net
+
+
+def test_split_21_is_not_a_natural():
+    state = settled([hand('A', 'K'), hand('A', '9')], hand('7', '4', '10'))
+    assert [state.hand_net(h, state.seats[0]) for h in state.seats[0]] == [0, -1]
+    assert state.seat_nets() == [-1]
+
+
+def test_insurance_against_a_natural():
+    state = settled(hand('10', '9'), hand('A', 'Q'))
+    state.insurances = [0.5]
+    assert state.seat_nets() == [0] # Loses the hand, insurance pays 2:1
+
+
+# ---ROUND FLOW---
+def test_hole_card_counted_when_every_seat_busts():
+    counter = CardCounter('hi-lo', 1)
+    state = GameState(deck=Deck(1, counter=counter, seed=7), num_seats=2)
+    while state.phase != SETTLE:
+        state.step('hit') # Hits until every hand busts, so the dealer never plays
+    assert all(hand.score() > 21 for hands in state.seats for hand in hands)
+    assert all(card.visible for card in state.dealer_hand.cards)
+    assert counter.seen == sum(len(hands[0].cards) for hands in state.seats) + len(state.dealer_hand.cards)
+
+
+def test_resplit_aces():
+    state = rigged(['A', '9', 'A', '7', 'A', '5', '6', '3', '10'], RuleSet(resplit_aces=True))
+    for _ in range(4):
+        state.step()
+    state.step('split') # A A | A 5: the first hand is a pair of aces again
+    assert state.active_hand == 0 and state.available_actions() == ['stand', 'split']
+    state.step('split') # A 6 | A 3 | A 5, all finished with their one card
+    assert [hand.total for hand in state.seats[0]] == [17, 14, 16]
+    assert state.phase != 'player'
+
+
+def test_split_aces_without_resplit():
+    state = rigged(['A', '9', 'A', '7', 'A', '5', '10'])
+    for _ in range(4):
+        state.step()
+    state.step('split')
+    assert [len(hand.cards) for hand in state.seats[0]] == [2, 2]
+    assert state.phase != 'player'
+
+
+def test_kept_aces_finish_the_other_split_hands():
+    state = rigged(['A', '9', 'A', '7', 'A', '5', '10'], RuleSet(resplit_aces=True))
+    for _ in range(4):
+        state.step()
+    state.step('split')
+    state.step('stand') # Keeps A A; A 5 takes no more cards
+    assert state.phase != 'player'
+
+
+def test_insurance_offered_to_every_seat_before_the_peek():
+    # Three seats against A up with a ten in the hole: everyone decides before the peek ends the round
+    state = rigged(['9', '9', '9', 'A', '7', '7', '7', 'K'], RuleSet(dealer_peek=True), num_seats=3)
+    for _ in range(8):
+        state.step()
+    for seat, action in enumerate(['insurance', 'decline', 'insurance']):
+        assert state.active_seat == seat and state.available_actions() == ['insurance', 'decline']
+        state.step(action)
+    assert state.phase == SETTLE
+    assert state.seat_nets() == [0, -1, 0]
+
+
+def test_no_insurance_after_the_peek():
+    state = rigged(['9', '9', 'A', '7', '7', '6'], RuleSet(dealer_peek=True), num_seats=2)
+    for _ in range(6):
+        state.step()
+    state.step('decline')
+    state.step('decline')
+    assert state.peeked and state.phase == 'player'
+    assert 'insurance' not in state.available_actions()
+
+
+def test_hand_copy_keeps_the_subclass():
+    class LaidOutHand(Hand):
+        __slots__ = ('x',)
+
+    original = LaidOutHand()
+    original.add_card(Card.from_rank('hearts', 'A'))
+    original.x = 40
+    copy = original.copy()
+    assert type(copy) is LaidOutHand and copy.x == 40 and copy.total == 11
+    copy.add_card(Card.from_rank('hearts', '9'))
+    assert len(original.cards) == 1
+
+
+# ---NO PEEK---
+# The EV engines against the table's own settlement, enumerated exactly: without a peek a dealer
+# natural takes the whole stake of every other hand, 21s, doubles and split hands included
+def draws(counts):
+    # (value, probability, counts left) for the next card; counts None is the infinite deck
+    if counts is None:
+        return [(value, p, None) for value, p in zip(CARD_VALUES, INFINITE_DECK)]
+    remaining = sum(counts)
+    return [(value, n / remaining, counts[:i] + [n - 1] + counts[i + 1:])
+            for i, (value, n) in enumerate(zip(CARD_VALUES, counts)) if n]
+
+
+def with_card(h, value):
+    h = h.copy()
+    h.add_card(Card.from_rank('spades', rank(value)))
+    return h
+
+
+def dealer_finishes(up, counts):
+    # One dealer hand per way the dealer can finish (a total, bust or a natural), with its probability
+    finishes = {}
+
+    def play(dealer, p, counts):
+        score = dealer.score()
+        if score < 17:
+            for value, q, left in draws(counts):
+                play(with_card(dealer, value), p * q, left)
+            return
+        finish = finishes.setdefault((min(score, 22), len(dealer.cards) == 2 and score == 21), [dealer, 0.0])
+        finish[1] += p
+
+    play(hand(rank(up)), 1.0, counts)
+    return finishes.values()
+
+
+def expected_net(seat, up, counts=None):
+    return sum(p * settled(seat, dealer).seat_nets()[0] for dealer, p in dealer_finishes(up, counts))
+
+
+def doubled(h):
+    h.bet, h.doubled = 2, True
+    return h
+
+
+def shoe_without(*values):
+    counts = [4] * 8 + [16, 4]
+    for value in values:
+        counts[value - 2] -= 1
+    return counts
+
+
+@pytest.mark.parametrize("up", [10, 11])
+def test_no_peek_stand_on_21(up):
+    player = hand('7', '4', 'K')
+    assert StrategySolver().stand_ev(21, False, up) == pytest.approx(expected_net([player], up), abs=1e-9)
+    counts = shoe_without(7, 4, 10, up)
+    assert CompositionAnalyser().stand_ev(pack(counts), 21, up) == pytest.approx(expected_net([player], up, counts), abs=1e-9)
+
+
+def test_no_peek_double():
+    ev = sum(p * expected_net([doubled(with_card(hand('6', '5'), value))], 10) for value, p, _ in draws(None))
+    assert StrategySolver().double_ev(11, False, 10) == pytest.approx(ev, abs=1e-9)
+    counts = shoe_without(6, 5, 10)
+    ev = sum(p * expected_net([doubled(with_card(hand('6', '5'), value))], 10, left) for value, p, left in draws(counts))
+    assert CompositionAnalyser().double_ev(pack(counts), 11, False, 10) == pytest.approx(ev, abs=1e-9)
+
+
+def test_no_peek_split_aces():
+    # One card to each ace, so both hands just stand; the dealer draws from the infinite deck either way
+    finishes = list(dealer_finishes(10, None))
+    ev = sum(p * q * r * settled([with_card(hand('A'), first), with_card(hand('A'), second)], dealer).seat_nets()[0]
+             for first, p, _ in draws(None) for second, q, _ in draws(None) for dealer, r in finishes)
+    assert StrategySolver().split_ev(11, 10) == pytest.approx(ev, abs=1e-9)
@@ -0,0 +1,50 @@
+# Replaying recorded rounds in the game, offscreen on pygame's dummy drivers
+
+import os
+
+import pytest
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+pygame = pytest.importorskip("pygame")
+
+from BasicStrategyBot import BasicStrategyBot
+from GameState import GameState, Deck, bot_advisor, play_round
+from HandHistory import HandHistory, HandHistoryWriter
+
+
+@pytest.fixture
+def history(tmp_path):
+    path = str(tmp_path / "history.bin")
+    advise = bot_advisor(BasicStrategyBot())
+    state = GameState(deck=Deck(1, seed=3))
+    with HandHistoryWriter(path, advisor=advise) as writer:
+        state.history = writer
+        writer.begin(state)
+        for _ in range(5):
+            play_round(state, lambda state: advise(state)[0])
+    history = HandHistory(path)
+    yield history
+    history.close()
+
+
+@pytest.fixture
+def game(monkeypatch):
+    Blackjack = pytest.importorskip("Blackjack")
+    monkeypatch.setattr(Blackjack.BlackjackGame, "show_reshuffle_screen", lambda self: None)
+    return Blackjack, Blackjack.BlackjackGame(seats=['bot'])
+
+
+def test_replay_leaves_the_live_count_alone(history, game):
+    Blackjack, game = game
+    while game.phase != Blackjack.SETTLE:
+        game.step(game.bot_play(game) if game.phase == Blackjack.PLAYER else None)
+    before = (game.counter.running, game.counter.seen, len(game.deck))
+
+    for index in range(len(history)):
+        game.start_replay(history, index)
+        while game.phase != Blackjack.SETTLE:
+            game.step(game.replay_action() if game.phase == Blackjack.PLAYER else None)
+        assert game.seat_nets() == pytest.approx(history[index].nets)
+    game.stop_replay() # Back to the live shoe, its next round not dealt yet
+    assert (game.counter.running, game.counter.seen, len(game.deck)) == before